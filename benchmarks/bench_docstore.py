@@ -0,0 +1,113 @@
+"""Compare load time and memory of the pickled and packed FAISS docstores.
+
+Each format is loaded in a fresh subprocess so resident memory is measured in
+isolation. `--scale` replicates the corpus to show how both formats grow.
+
+Run with:
+    python benchmarks/bench_docstore.py --folder notebooks/faiss_index --scale 20
+"""
+
+import argparse
+import os
+import pickle
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+
+
+def _rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss is a high-water mark, reported in KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _child(docstore_format: str, folder: str) -> None:
+    from shared.docstore import PackedDocstore
+
+    baseline = _rss_mb()
+    start = time.perf_counter()
+    if docstore_format == "pickle":
+        with open(os.path.join(folder, "index.pkl"), "rb") as f:
+            docstore, index_to_docstore_id = pickle.load(f)
+        fetch = lambda row: docstore.search(index_to_docstore_id[row])  # noqa: E731
+        count = len(index_to_docstore_id)
+    else:
+        docstore = PackedDocstore(os.path.join(folder, "index.docs"))
+        fetch = docstore.search
+        count = len(docstore)
+    load_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for row in range(0, count, max(count // 10, 1)):
+        fetch(row)
+    fetch_ms = (time.perf_counter() - start) * 1000
+    print(f"{docstore_format},{count},{load_s:.4f},{_rss_mb() - baseline:.1f},{fetch_ms:.3f}")
+
+
+def _scaled_copy(folder: str, scale: int, dest: str) -> None:
+    with open(os.path.join(folder, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+    docs, ids = {}, {}
+    for copy in range(scale):
+        for row, doc_id in index_to_docstore_id.items():
+            new_id = f"{doc_id}-{copy}"
+            doc = docstore.search(doc_id)
+            docs[new_id] = Document(
+                page_content=f"{doc.page_content} [{copy}]", metadata=dict(doc.metadata)
+            )
+            ids[copy * len(index_to_docstore_id) + row] = new_id
+    with open(os.path.join(dest, "index.pkl"), "wb") as f:
+        pickle.dump((InMemoryDocstore(docs), ids), f)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--folder", default="notebooks/faiss_index")
+    parser.add_argument("--scale", type=int, default=1)
+    parser.add_argument("--child", nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        _child(*args.child)
+        return
+
+    from shared.docstore import convert_pickle_docstore
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.scale > 1:
+            _scaled_copy(args.folder, args.scale, tmp)
+        else:
+            shutil.copy(os.path.join(args.folder, "index.pkl"), tmp)
+        convert_pickle_docstore(tmp)
+        sizes = {
+            "pickle": os.path.getsize(os.path.join(tmp, "index.pkl")),
+            "packed": os.path.getsize(os.path.join(tmp, "index.docs")),
+        }
+        print("format   docs     file_MB  load_s   rss_MB   fetch_10_ms")
+        for docstore_format in ("pickle", "packed"):
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", docstore_format, tmp],
+                check=True,
+                capture_output=True,
+                text=True,
+            ).stdout.strip()
+            name, count, load_s, rss, fetch_ms = out.splitlines()[-1].split(",")
+            print(
+                f"{name:<8} {count:<8} {sizes[name] / 2**20:<8.2f} "
+                f"{load_s:<8} {rss:<8} {fetch_ms}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Recall and latency of approximate FAISS index types against the flat index.
+
+Builds every index type from the same vectors with `index_graph.build_index`, then
+reports recall@k against exact search plus p50/p99 single-query latency for a sweep
+of `nprobe` / `efSearch` values.
+
+Run with:
+    python benchmarks/bench_index_types.py --n 100000 --dim 256
+    python benchmarks/bench_index_types.py --folder notebooks/faiss_index
+"""
+
+import argparse
+import os
+import time
+
+import faiss
+import numpy as np
+
+from index_graph.build_index import build_faiss_index
+from shared.retrieval import tune_faiss_index
+
+
+def _synthetic_vectors(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors, closer to real embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(n // 500, 1), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), n)]
+    vectors += 0.3 * rng.standard_normal((n, dim)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def _search_latencies(index, queries: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+    # Single-query latency with one thread, as served per retrieval.
+    threads = faiss.omp_get_max_threads()
+    faiss.omp_set_num_threads(1)
+    latencies, results = [], []
+    for query in queries:
+        start = time.perf_counter()
+        _, ids = index.search(query[None, :], k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        results.append(ids[0])
+    faiss.omp_set_num_threads(threads)
+    return np.asarray(results), np.asarray(latencies)
+
+
+def _recall(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--folder", help="Use the vectors of an existing flat index.")
+    parser.add_argument("--n", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nlist", type=int, default=1024)
+    parser.add_argument("--pq-m", type=int, default=32)
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    args = parser.parse_args()
+
+    if args.folder:
+        source = faiss.read_index(os.path.join(args.folder, "index.faiss"))
+        vectors = source.reconstruct_n(0, source.ntotal)
+        metric = source.metric_type
+    else:
+        vectors = _synthetic_vectors(args.n, args.dim)
+        metric = faiss.METRIC_INNER_PRODUCT
+
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(0, len(vectors), args.queries)].copy()
+    queries += 0.05 * rng.standard_normal(queries.shape).astype(np.float32)
+
+    flat = build_faiss_index(vectors, "flat", metric=metric)
+    truth, flat_latency = _search_latencies(flat, queries, args.k)
+
+    print(f"{len(vectors)} vectors, dim {vectors.shape[1]}, {args.queries} queries, k={args.k}")
+    print(f"{'index':<10} {'param':<14} {'build_s':>8} {'size_MB':>8} {'recall':>7} {'p50_ms':>8} {'p99_ms':>8}")
+    flat_size = faiss.serialize_index(flat).nbytes / 2**20
+    print(
+        f"{'flat':<10} {'-':<14} {0:>8.2f} {flat_size:>8.1f} {1:>7.3f} "
+        f"{np.percentile(flat_latency, 50):>8.3f} {np.percentile(flat_latency, 99):>8.3f}"
+    )
+
+    sweeps = {
+        "ivf_flat": ("nprobe", [1, 4, 16, 64]),
+        "ivf_pq": ("nprobe", [1, 4, 16, 64]),
+        "hnsw": ("efSearch", [16, 32, 64, 128]),
+    }
+    for index_type, (param, values) in sweeps.items():
+        start = time.perf_counter()
+        index = build_faiss_index(
+            vectors,
+            index_type,
+            metric=metric,
+            nlist=args.nlist,
+            pq_m=args.pq_m,
+            hnsw_m=args.hnsw_m,
+        )
+        build_s = time.perf_counter() - start
+        size_mb = faiss.serialize_index(index).nbytes / 2**20
+        for value in values:
+            tune_faiss_index(index, {param: value})
+            found, latency = _search_latencies(index, queries, args.k)
+            print(
+                f"{index_type:<10} {f'{param}={value}':<14} {build_s:>8.2f} {size_mb:>8.1f} "
+                f"{_recall(found, truth):>7.3f} {np.percentile(latency, 50):>8.3f} "
+                f"{np.percentile(latency, 99):>8.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
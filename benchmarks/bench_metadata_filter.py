@@ -0,0 +1,83 @@
+"""Latency of metadata-filtered search with and without the pre-filter index.
+
+For growing corpora split over many companies, times a `{"company": ...}` filtered
+search through `FaissStore` (metadata index + restricted search) against LangChain's
+post-filtering over `fetch_k` hits, and reports how many of the k results each
+returned. Post-filtering is run with the same `fetch_k` for a fair latency comparison.
+
+Run with:
+    python benchmarks/bench_metadata_filter.py --dim 768 --companies 500
+"""
+
+import argparse
+import time
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import FakeEmbeddings
+
+from shared.faiss_store import FaissStore
+
+
+def _p50(fn, queries: np.ndarray) -> tuple[float, float]:
+    latencies, found = [], []
+    for query in queries:
+        start = time.perf_counter()
+        hits = fn(query.tolist())
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(len(hits))
+    return float(np.percentile(latencies, 50)), float(np.mean(found))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--companies", type=int, default=500)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--fetch-k", type=int, default=50)
+    parser.add_argument("--queries", type=int, default=30)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    print(f"{'n':>8} {'prefilter_ms':>13} {'found':>6} {'postfilter_ms':>14} {'found':>6}")
+    for n in (10_000, 50_000, 200_000):
+        vectors = rng.standard_normal((n, args.dim)).astype(np.float32)
+        faiss.normalize_L2(vectors)
+        index = faiss.IndexFlatIP(args.dim)
+        index.add(vectors)
+        ids = {i: str(i) for i in range(n)}
+        docstore = InMemoryDocstore(
+            {
+                str(i): Document(
+                    page_content=f"doc {i}", metadata={"company": f"C{i % args.companies}"}
+                )
+                for i in range(n)
+            }
+        )
+        embeddings = FakeEmbeddings(size=args.dim)
+        store = FaissStore(embeddings, index, docstore, ids)
+        reference = FAISS(embeddings, index, docstore, ids)
+        store.get_metadata_index()
+        queries = vectors[rng.integers(0, n, args.queries)]
+        filter = {"company": "C7"}
+
+        pre = _p50(
+            lambda q: store.similarity_search_with_score_by_vector(
+                q, k=args.k, filter=filter, fetch_k=args.fetch_k
+            ),
+            queries,
+        )
+        post = _p50(
+            lambda q: reference.similarity_search_with_score_by_vector(
+                q, k=args.k, filter=filter, fetch_k=args.fetch_k
+            ),
+            queries,
+        )
+        print(f"{n:>8} {pre[0]:>13.3f} {pre[1]:>6.1f} {post[0]:>14.3f} {post[1]:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""Overhead of vectorized MMR over plain similarity search.
+
+Times, per query, `similarity_search_with_score_by_vector(k)` against the vectorized
+MMR in `shared.faiss_store.FaissStore` and LangChain's reference MMR, over a grid of
+k and fetch_k values. All three include the docstore lookups of the returned hits.
+
+Run with:
+    python benchmarks/bench_mmr.py --n 50000 --dim 1536
+"""
+
+import argparse
+import time
+
+import faiss
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import FakeEmbeddings
+
+from shared.faiss_store import FaissStore
+
+
+def _p50_ms(fn, queries: np.ndarray) -> float:
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        fn(query.tolist())
+        latencies.append((time.perf_counter() - start) * 1000)
+    return float(np.percentile(latencies, 50))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--n", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--reference", action="store_true", help="Also time LangChain's MMR.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((args.n, args.dim)).astype(np.float32)
+    faiss.normalize_L2(vectors)
+    index = faiss.IndexFlatIP(args.dim)
+    index.add(vectors)
+    ids = {i: str(i) for i in range(args.n)}
+    docstore = InMemoryDocstore({str(i): Document(page_content=f"doc {i}") for i in range(args.n)})
+    embeddings = FakeEmbeddings(size=args.dim)
+    store = FaissStore(embeddings, index, docstore, ids)
+    reference = FAISS(embeddings, index, docstore, ids)
+    queries = vectors[rng.integers(0, args.n, args.queries)]
+
+    header = f"{'k':>3} {'fetch_k':>8} {'similarity_ms':>14} {'mmr_ms':>8} {'overhead_ms':>12}"
+    print(header + (f" {'langchain_mmr_ms':>17}" if args.reference else ""))
+    for k in (3, 5, 10, 20):
+        similarity = _p50_ms(
+            lambda q: store.similarity_search_with_score_by_vector(q, k=k), queries
+        )
+        for fetch_k in (20, 50, 100, 200, 400):
+            mmr = _p50_ms(
+                lambda q: store.max_marginal_relevance_search_with_score_by_vector(
+                    q, k=k, fetch_k=fetch_k
+                ),
+                queries,
+            )
+            line = f"{k:>3} {fetch_k:>8} {similarity:>14.3f} {mmr:>8.3f} {mmr - similarity:>12.3f}"
+            if args.reference:
+                reference_mmr = _p50_ms(
+                    lambda q: reference.max_marginal_relevance_search_with_score_by_vector(
+                        q, k=k, fetch_k=fetch_k
+                    ),
+                    queries,
+                )
+                line += f" {reference_mmr:>17.3f}"
+            print(line)
+
+
+if __name__ == "__main__":
+    main()
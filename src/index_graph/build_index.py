@@ -0,0 +1,155 @@
+"""Offline build of approximate FAISS indexes from an existing flat index.
+
+The index graph writes an exact `IndexFlat`, whose search cost and memory grow
+linearly with the corpus. This module reads the stored embeddings back out of that
+index and rebuilds them as IVF-Flat, IVF-PQ or HNSW. Rows keep their order, so the
+docstore files next to the source index are copied over unchanged.
+
+HNSW indexes cannot remove vectors, so they are rebuild-only: a store loaded from one
+refuses writes, and changes are made by re-indexing into a flat index and running
+this build again.
+
+Run with:
+    python -m index_graph.build_index notebooks/faiss_index notebooks/faiss_index_ivf --index-type ivf_flat
+"""
+
+import os
+import shutil
+from typing import Any
+
+import faiss
+import numpy as np
+
+from index_graph.configuration import IndexConfiguration
+
+INDEX_FACTORY_KEYS = {
+    "flat": "Flat",
+    "ivf_flat": "IVF{nlist},Flat",
+    "ivf_pq": "IVF{nlist},PQ{pq_m}",
+    "hnsw": "HNSW{hnsw_m},Flat",
+}
+
+# faiss warns when a cluster gets fewer training points than this.
+_MIN_POINTS_PER_CENTROID = 39
+
+# Bits per PQ code in "PQ{m}"; each sub-quantizer trains 2**_PQ_NBITS centroids.
+_PQ_NBITS = 8
+
+
+def build_faiss_index(
+    vectors: np.ndarray,
+    index_type: str,
+    *,
+    metric: int = faiss.METRIC_INNER_PRODUCT,
+    nlist: int = 1024,
+    pq_m: int = 64,
+    hnsw_m: int = 32,
+) -> Any:
+    """Build and fill a FAISS index of `index_type` from a matrix of embeddings.
+
+    Args:
+        vectors (np.ndarray): float32 matrix of shape (n, d), one row per document.
+        index_type (str): One of 'flat', 'ivf_flat', 'ivf_pq' or 'hnsw'.
+        metric (int): FAISS metric, normally taken from the source index.
+        nlist (int): IVF cluster count, clamped to the number of training vectors.
+        pq_m (int): PQ sub-quantizers for 'ivf_pq'.
+        hnsw_m (int): Graph degree for 'hnsw'.
+
+    Returns:
+        faiss.Index: The trained index with every vector added in row order.
+
+    Raises:
+        ValueError: If `index_type` is unknown, or 'ivf_pq' is asked for with a
+            `pq_m` that does not divide the dimension or too few vectors to train on.
+    """
+    if index_type not in INDEX_FACTORY_KEYS:
+        raise ValueError(
+            f"Unknown index_type {index_type!r}. "
+            f"Expected one of: {', '.join(INDEX_FACTORY_KEYS)}"
+        )
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    n, d = vectors.shape
+    if index_type == "ivf_pq":
+        if d % pq_m:
+            raise ValueError(
+                f"pq_m={pq_m} must divide the embedding dimension {d} for 'ivf_pq'"
+            )
+        if n < 2**_PQ_NBITS:
+            raise ValueError(
+                f"'ivf_pq' needs at least {2**_PQ_NBITS} vectors to train its codebooks, "
+                f"got {n}; use 'ivf_flat' or 'flat' for a corpus this small"
+            )
+    nlist = max(1, min(nlist, n // _MIN_POINTS_PER_CENTROID))
+    factory_key = INDEX_FACTORY_KEYS[index_type].format(
+        nlist=nlist, pq_m=pq_m, hnsw_m=hnsw_m
+    )
+    index = faiss.index_factory(d, factory_key, metric)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def build_index_folder(
+    source_folder: str,
+    dest_folder: str,
+    configuration: IndexConfiguration,
+    index_name: str = "index",
+) -> Any:
+    """Rebuild the flat index in `source_folder` as `configuration.faiss_index_type`.
+
+    Writes `<index_name>.faiss` to `dest_folder` and copies the docstore files
+    (`.pkl`, and `.docs` if present) so the folder can be served directly.
+    """
+    source = faiss.read_index(os.path.join(source_folder, f"{index_name}.faiss"))
+    vectors = source.reconstruct_n(0, source.ntotal)
+    index = build_faiss_index(
+        vectors,
+        configuration.faiss_index_type,
+        metric=source.metric_type,
+        nlist=configuration.faiss_nlist,
+        pq_m=configuration.faiss_pq_m,
+        hnsw_m=configuration.faiss_hnsw_m,
+    )
+
+    os.makedirs(dest_folder, exist_ok=True)
+    tmp_path = os.path.join(dest_folder, f"{index_name}.faiss.tmp")
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, os.path.join(dest_folder, f"{index_name}.faiss"))
+    for ext in ("pkl", "docs"):
+        path = os.path.join(source_folder, f"{index_name}.{ext}")
+        if os.path.exists(path):
+            shutil.copy2(path, os.path.join(dest_folder, f"{index_name}.{ext}"))
+    return index
+
+
+if __name__ == "__main__":
+    import argparse
+
+    defaults = IndexConfiguration()
+    parser = argparse.ArgumentParser(
+        description="Build an approximate FAISS index from an existing flat index."
+    )
+    parser.add_argument("source_folder")
+    parser.add_argument("dest_folder")
+    parser.add_argument(
+        "--index-type",
+        default=defaults.faiss_index_type,
+        choices=list(INDEX_FACTORY_KEYS),
+    )
+    parser.add_argument("--nlist", type=int, default=defaults.faiss_nlist)
+    parser.add_argument("--pq-m", type=int, default=defaults.faiss_pq_m)
+    parser.add_argument("--hnsw-m", type=int, default=defaults.faiss_hnsw_m)
+    args = parser.parse_args()
+
+    built = build_index_folder(
+        args.source_folder,
+        args.dest_folder,
+        IndexConfiguration(
+            faiss_index_type=args.index_type,
+            faiss_nlist=args.nlist,
+            faiss_pq_m=args.pq_m,
+            faiss_hnsw_m=args.hnsw_m,
+        ),
+    )
+    print(f"Wrote {args.index_type} index with {built.ntotal} vectors to {args.dest_folder}")
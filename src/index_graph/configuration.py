@@ -3,6 +3,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
+from typing import Literal, Optional
 
 from shared.configuration import BaseConfiguration
 
@@ -26,3 +27,67 @@ class IndexConfiguration(BaseConfiguration):
             "description": "Path to a JSON file containing default documents to index."
         },
     )
+
+    chunking_version: str = field(
+        default="1",
+        metadata={
+            "description": "Version of the chunking that produced docs_file. Changing it, or embedding_model, re-embeds every document on the next indexing run."
+        },
+    )
+
+    index_manifest_path: Optional[str] = field(
+        default=None,
+        metadata={
+            "description": "Manifest of already indexed documents, used to skip unchanged ones. Defaults to index.manifest.json in faiss_index_path."
+        },
+    )
+
+    ingest_mode: Literal["batch", "streaming"] = field(
+        default="batch",
+        metadata={
+            "description": "How docs_file is indexed. 'batch' loads it whole; 'streaming' reads JSON arrays or JSONL incrementally and embeds token-bounded batches concurrently (see index_graph.ingest)."
+        },
+    )
+
+    ingest_batch_tokens: int = field(
+        default=20_000,
+        metadata={"description": "Token budget of a streaming ingestion batch."},
+    )
+
+    ingest_batch_docs: int = field(
+        default=256,
+        metadata={"description": "Document limit of a streaming ingestion batch."},
+    )
+
+    ingest_max_concurrency: int = field(
+        default=4,
+        metadata={
+            "description": "Streaming ingestion batches embedded at the same time; reading pauses while this many are in flight."
+        },
+    )
+
+    faiss_index_type: Literal["flat", "ivf_flat", "ivf_pq", "hnsw"] = field(
+        default="flat",
+        metadata={
+            "description": "FAISS index type produced by `python -m index_graph.build_index`. 'flat' is exact search; the others trade recall for speed and memory. 'hnsw' cannot delete documents, so it is rebuild-only; 'ivf_pq' needs at least 256 vectors and a faiss_pq_m that divides the dimension."
+        },
+    )
+
+    faiss_nlist: int = field(
+        default=1024,
+        metadata={
+            "description": "Number of IVF clusters for 'ivf_flat' and 'ivf_pq'. Clamped so every cluster has enough training vectors."
+        },
+    )
+
+    faiss_pq_m: int = field(
+        default=64,
+        metadata={
+            "description": "Number of PQ sub-quantizers for 'ivf_pq'. Must divide the embedding dimension."
+        },
+    )
+
+    faiss_hnsw_m: int = field(
+        default=32,
+        metadata={"description": "Neighbours per node of the 'hnsw' graph."},
+    )
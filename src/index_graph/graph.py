@@ -1,16 +1,31 @@
 """This "graph" simply exposes an endpoint for a user to upload docs to be indexed."""
 
 import json
+import logging
+import os
 from typing import Optional
 
 from langchain_core.runnables import RunnableConfig
+from langchain_core.vectorstores import VectorStoreRetriever
 from langgraph.graph import END, START, StateGraph
 
 from index_graph.configuration import IndexConfiguration
+from index_graph.ingest import iter_documents, stream_ingest
+from index_graph.manifest import (
+    MANIFEST_NAME,
+    ManifestUpdate,
+    load_manifest,
+    plan_index_update,
+    save_manifest,
+)
 from index_graph.state import IndexState
 from shared import retrieval
+from shared.embedding_batcher import AdaptiveEmbeddingBatcher
+from shared.hybrid import HybridRetriever
 from shared.state import reduce_docs
 
+logger = logging.getLogger(__name__)
+
 
 async def index_docs(
     state: IndexState, *, config: Optional[RunnableConfig] = None
@@ -19,10 +34,16 @@ async def index_docs(
 
     This function takes the documents from the state, ensures they have a user ID,
     adds them to the retriever's index, and then signals for the documents to be
-    deleted from the state.
+    deleted from the state. With the local FAISS providers the added documents are
+    persisted through the index's write-ahead log as they are added.
 
     If docs are not provided in the state, they will be loaded
-    from the configuration.docs_file JSON file.
+    from the configuration.docs_file JSON file, or streamed from it in token-bounded,
+    concurrently embedded batches when `ingest_mode` is "streaming".
+
+    Only documents that are new or changed since the last run, according to the
+    index manifest, are embedded. When indexing the whole docs_file, documents that
+    have disappeared from it are deleted from the index.
 
     Args:
         state (IndexState): The current state containing documents and retriever.
@@ -32,14 +53,70 @@ async def index_docs(
         raise ValueError("Configuration required to run index_docs.")
 
     configuration = IndexConfiguration.from_runnable_config(config)
+    manifest_path = configuration.index_manifest_path or os.path.join(
+        configuration.faiss_index_path, MANIFEST_NAME
+    )
     docs = state.docs
+    if not docs and configuration.ingest_mode == "streaming":
+        update = ManifestUpdate(
+            load_manifest(manifest_path),
+            embedding_model=configuration.embedding_model,
+            chunking_version=configuration.chunking_version,
+        )
+        with retrieval.make_retriever(config, writable=True) as retriever:
+            if not isinstance(retriever, (VectorStoreRetriever, HybridRetriever)):
+                raise ValueError("Indexing needs a vector store retriever.")
+            stats = await stream_ingest(
+                iter_documents(configuration.docs_file),
+                retriever,
+                update=update,
+                max_tokens=configuration.ingest_batch_tokens,
+                max_docs=configuration.ingest_batch_docs,
+                max_concurrency=configuration.ingest_max_concurrency,
+            )
+            embeddings = retriever.vectorstore.embeddings
+            if isinstance(embeddings, AdaptiveEmbeddingBatcher):
+                logger.info("Embedding batcher: %s", embeddings.metrics())
+        save_manifest(manifest_path, update.manifest)
+        logger.info(
+            "Indexed %d docs (%d unchanged, %d deleted) in %.1fs, %.1f docs/s, %.0f tokens/s",
+            stats.documents,
+            stats.skipped,
+            stats.deleted,
+            stats.seconds,
+            stats.docs_per_second,
+            stats.tokens_per_second,
+        )
+        return {"docs": "delete"}
+
     if not docs:
         with open(configuration.docs_file) as f:
             serialized_docs = json.load(f)
             docs = reduce_docs([], serialized_docs)
 
-    with retrieval.make_retriever(config) as retriever:
-        await retriever.aadd_documents(docs)
+    plan = plan_index_update(
+        load_manifest(manifest_path),
+        docs,
+        embedding_model=configuration.embedding_model,
+        chunking_version=configuration.chunking_version,
+        prune=not state.docs,
+    )
+
+    if plan.add or plan.delete:
+        with retrieval.make_retriever(config, writable=True) as retriever:
+            if not isinstance(retriever, (VectorStoreRetriever, HybridRetriever)):
+                raise ValueError("Indexing needs a vector store retriever.")
+            vstore = retriever.vectorstore
+            # Ids being added may already be present if a previous run stopped before
+            # saving the manifest; replace them rather than failing on duplicates.
+            ids = plan.delete + [doc.id for doc in plan.add if doc.id is not None]
+            present = [doc.id for doc in vstore.get_by_ids(ids) if doc.id is not None]
+            if present:
+                deleter = retriever if hasattr(retriever, "adelete") else vstore
+                await deleter.adelete(present)
+            if plan.add:
+                await retriever.aadd_documents(plan.add)
+    save_manifest(manifest_path, plan.manifest)
 
     return {"docs": "delete"}
 
@@ -0,0 +1,281 @@
+"""Streaming, bounded-concurrency ingestion of large document dumps.
+
+The default indexing path loads the whole `docs_file` with `json.load` and embeds it
+in one `aadd_documents` call. `stream_ingest` instead reads the file incrementally
+(JSONL, or a JSON array split into elements without parsing the whole array),
+decodes each document with msgspec, packs documents into batches bounded by token
+count, embeds up to `max_concurrency` batches at a time and writes each batch to the
+store as soon as its embeddings arrive. Reading pauses while the maximum number of
+batches is in flight, so memory stays bounded by the batches being embedded.
+"""
+
+import asyncio
+import itertools
+import re
+import time
+from collections.abc import AsyncIterator, Iterable, Iterator
+from dataclasses import dataclass
+from typing import Any, Optional, Union
+
+import msgspec
+from langchain_core.documents import Document
+
+from index_graph.manifest import ManifestUpdate
+from shared.state import _generate_uuid
+from shared.tokens import count_tokens
+
+_STRUCTURAL = re.compile(rb'[\[\]{}"\\]')
+
+
+class _RawDocument(msgspec.Struct):
+    page_content: str = ""
+    metadata: dict[str, Any] = msgspec.field(default_factory=dict)
+
+
+_decoder = msgspec.json.Decoder(Union[str, _RawDocument])
+
+
+def _to_document(raw: Union[str, _RawDocument]) -> Document:
+    # Mirrors `reduce_docs`: every document carries a content-derived uuid.
+    if isinstance(raw, str):
+        return Document(page_content=raw, metadata={"uuid": _generate_uuid(raw)})
+    uuid = raw.metadata.get("uuid") or _generate_uuid(raw.page_content)
+    return Document(page_content=raw.page_content, metadata={**raw.metadata, "uuid": uuid})
+
+
+def iter_json_array(chunks: Iterable[bytes]) -> Iterator[bytes]:
+    """Split a JSON array, read in `chunks`, into the raw bytes of its elements.
+
+    Only the structural characters are visited, so the array is never parsed as a
+    whole. String and object elements are supported.
+    """
+    buffer = b""
+    depth = 0
+    in_string = False
+    start: Optional[int] = None
+    pos = 0
+    for chunk in chunks:
+        buffer += chunk
+        for match in _STRUCTURAL.finditer(buffer, pos):
+            i = match.start()
+            if i < pos:
+                continue
+            char = buffer[i : i + 1]
+            if in_string:
+                if char == b"\\":
+                    pos = i + 2  # skip the escaped character
+                    continue
+                if char == b'"':
+                    in_string = False
+                    if depth == 1 and start is not None:
+                        yield buffer[start : i + 1]
+                        start = None
+            elif char == b'"':
+                in_string = True
+                if depth == 1:
+                    start = i
+            elif char in b"[{":
+                if depth == 1:
+                    start = i
+                depth += 1
+            else:
+                depth -= 1
+                if depth == 1 and start is not None:
+                    yield buffer[start : i + 1]
+                    start = None
+            pos = i + 1
+        # Drop what has been consumed, keeping a partial element and any pending
+        # escape (pos may point one past the end of the buffer).
+        keep = min(pos, len(buffer)) if start is None else start
+        buffer = buffer[keep:]
+        pos -= keep
+        if start is not None:
+            start = 0
+
+
+def iter_documents(path: str, chunk_size: int = 1 << 20) -> Iterator[Document]:
+    """Stream the documents of a JSON array or JSONL file at `path`.
+
+    Elements are either strings or {"page_content", "metadata"} objects, as accepted
+    by `reduce_docs`.
+    """
+    with open(path, "rb") as f:
+        first = f.read(chunk_size)
+        if first.lstrip()[:1] == b"[":
+            chunks = itertools.chain([first], iter(lambda: f.read(chunk_size), b""))
+            for element in iter_json_array(chunks):
+                yield _to_document(_decoder.decode(element))
+            return
+        f.seek(0)
+        for line in f:
+            if line.strip():
+                yield _to_document(_decoder.decode(line))
+
+
+def batch_by_tokens(
+    docs: Iterable[Document], max_tokens: int, max_docs: int
+) -> Iterator[tuple[list[Document], int]]:
+    """Group `docs` into batches of at most `max_tokens` tokens and `max_docs` documents.
+
+    A document larger than `max_tokens` forms a batch of its own.
+
+    Yields:
+        tuple[list[Document], int]: Each batch and its token count.
+    """
+    batch: list[Document] = []
+    tokens = 0
+    for doc in docs:
+        doc_tokens = count_tokens(doc.page_content)
+        if batch and (tokens + doc_tokens > max_tokens or len(batch) >= max_docs):
+            yield batch, tokens
+            batch, tokens = [], 0
+        batch.append(doc)
+        tokens += doc_tokens
+    if batch:
+        yield batch, tokens
+
+
+@dataclass
+class IngestStats:
+    """Throughput of an ingestion run."""
+
+    documents: int = 0
+    """Documents embedded and written."""
+    tokens: int = 0
+    batches: int = 0
+    skipped: int = 0
+    """Documents left alone because the manifest shows them unchanged."""
+    deleted: int = 0
+    """Documents removed because they vanished from the source."""
+    seconds: float = 0.0
+
+    @property
+    def docs_per_second(self) -> float:
+        """Documents written per second of wall time."""
+        return self.documents / self.seconds if self.seconds else 0.0
+
+    @property
+    def tokens_per_second(self) -> float:
+        """Tokens embedded per second of wall time."""
+        return self.tokens / self.seconds if self.seconds else 0.0
+
+
+def _pending_changes(
+    docs: Iterable[Document], update: Optional[ManifestUpdate], stats: IngestStats
+) -> Iterator[Document]:
+    """Yield each new or changed document once, with `id` set to its UUID."""
+    seen: set[str] = set()
+    for doc in docs:
+        uuid = doc.metadata["uuid"]
+        if uuid in seen:
+            continue
+        seen.add(uuid)
+        if update is None:
+            yield Document(id=uuid, page_content=doc.page_content, metadata=doc.metadata)
+            continue
+        to_add, _ = update.check(doc)
+        if to_add is None:
+            stats.skipped += 1
+        else:
+            yield to_add
+
+
+async def _iterate_in_thread(iterator: Iterator[Any]) -> AsyncIterator[Any]:
+    """Advance a blocking iterator (file reads, decoding) off the event loop."""
+    done = object()
+    while True:
+        item = await asyncio.to_thread(next, iterator, done)
+        if item is done:
+            return
+        yield item
+
+
+async def stream_ingest(
+    docs: Iterable[Document],
+    retriever: Any,
+    *,
+    update: Optional[ManifestUpdate] = None,
+    max_tokens: int = 20_000,
+    max_docs: int = 256,
+    max_concurrency: int = 4,
+) -> IngestStats:
+    """Embed and write `docs` in token-bounded batches, several at a time.
+
+    Stores that accept precomputed embeddings (`add_embeddings`) are written under a
+    lock as each batch's embeddings arrive, so embedding overlaps with writing. Other
+    retrievers get one `aadd_documents` call per batch.
+
+    Args:
+        docs (Iterable[Document]): Documents to ingest, e.g. from `iter_documents`.
+        retriever (Any): A writable retriever from `make_retriever`.
+        update (Optional[ManifestUpdate]): Skip documents the manifest shows as
+            unchanged, replace changed ones and delete vanished ones.
+        max_tokens (int): Token budget of a batch.
+        max_docs (int): Document limit of a batch.
+        max_concurrency (int): Batches embedded at the same time.
+
+    Returns:
+        IngestStats: Counts and elapsed time of the run.
+    """
+    stats = IngestStats()
+    start = time.perf_counter()
+    vstore = retriever.vectorstore
+    writer = retriever if hasattr(retriever, "add_embeddings") else vstore
+    embed_then_write = hasattr(writer, "add_embeddings")
+    deleter = retriever if hasattr(retriever, "adelete") else vstore
+    write_lock = asyncio.Lock()
+    slots = asyncio.Semaphore(max_concurrency)
+
+    async def replace_existing(ids: list[str]) -> None:
+        # Changed documents, or ones left by an interrupted run, are replaced.
+        present = [doc.id for doc in await vstore.aget_by_ids(ids)]
+        if present:
+            await deleter.adelete(present)
+
+    async def ingest(batch: list[Document], tokens: int) -> None:
+        try:
+            texts = [doc.page_content for doc in batch]
+            ids = [doc.id for doc in batch if doc.id is not None]
+            assert len(ids) == len(batch), "_pending_changes sets every document id"
+            if embed_then_write:
+                vectors = await vstore.embeddings.aembed_documents(texts)
+                async with write_lock:
+                    await replace_existing(ids)
+                    await asyncio.to_thread(
+                        writer.add_embeddings,
+                        list(zip(texts, vectors)),
+                        metadatas=[doc.metadata for doc in batch],
+                        ids=ids,
+                    )
+            else:
+                await replace_existing(ids)
+                await retriever.aadd_documents(batch)
+            stats.documents += len(batch)
+            stats.tokens += tokens
+            stats.batches += 1
+        finally:
+            slots.release()
+
+    tasks: set[asyncio.Task[None]] = set()
+    try:
+        batches = batch_by_tokens(_pending_changes(docs, update, stats), max_tokens, max_docs)
+        async for batch, tokens in _iterate_in_thread(batches):
+            await slots.acquire()  # backpressure: wait for a free slot before reading on
+            for finished in [task for task in tasks if task.done()]:
+                tasks.discard(finished)
+                finished.result()  # surface a failed batch right away
+            tasks.add(asyncio.create_task(ingest(batch, tokens)))
+        await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    if update is not None:
+        vanished = update.finish()
+        if vanished:
+            async with write_lock:
+                await replace_existing(vanished)
+            stats.deleted = len(vanished)
+    stats.seconds = time.perf_counter() - start
+    return stats
@@ -0,0 +1,186 @@
+"""Content-hash manifest of the documents already in the index.
+
+`index_docs` used to embed every document of `docs_file` on every run. The manifest,
+kept next to the index, records each indexed document's UUID (see
+`shared.state._generate_uuid`) with a fingerprint of its content and metadata,
+stamped with the embedding model and chunking version that produced the vectors.
+Comparing it with the incoming documents yields the minimal update: embed only new
+or changed documents and delete the vectors of changed or vanished ones. A different
+embedding model or chunking version invalidates every entry.
+"""
+
+import hashlib
+import os
+from dataclasses import dataclass, field
+from typing import Optional
+
+import msgspec
+from langchain_core.documents import Document
+
+from shared.state import _generate_uuid
+
+MANIFEST_NAME = "index.manifest.json"
+
+
+class IndexManifest(msgspec.Struct):
+    """Contents of the manifest file."""
+
+    version: int = 1
+    embedding_model: str = ""
+    chunking_version: str = ""
+    documents: dict[str, str] = msgspec.field(default_factory=dict)
+    """Document UUID → content fingerprint."""
+
+
+def document_uuid(doc: Document) -> str:
+    """Return the UUID `reduce_docs` assigned to `doc`, deriving it if missing."""
+    return doc.metadata.get("uuid") or _generate_uuid(doc.page_content)
+
+
+def document_fingerprint(doc: Document) -> str:
+    """Hash the content and metadata of `doc`, independent of metadata key order."""
+    payload = msgspec.json.encode([doc.page_content, doc.metadata], order="sorted")
+    return hashlib.sha256(payload).hexdigest()
+
+
+def load_manifest(path: str) -> IndexManifest:
+    """Read the manifest at `path`, or return an empty one if there is none."""
+    if not os.path.exists(path):
+        return IndexManifest()
+    with open(path, "rb") as f:
+        return msgspec.json.decode(f.read(), type=IndexManifest)
+
+
+def save_manifest(path: str, manifest: IndexManifest) -> None:
+    """Write `manifest` to `path` atomically."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(msgspec.json.encode(manifest))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class ManifestUpdate:
+    """Compare documents with a manifest one at a time, as they stream in.
+
+    `check` is called for every incoming document; `finish` returns the documents
+    that never showed up. `manifest` describes the index once all of them are applied.
+    """
+
+    def __init__(
+        self,
+        manifest: IndexManifest,
+        *,
+        embedding_model: str,
+        chunking_version: str,
+        prune: bool = True,
+    ) -> None:
+        """Start an update of `manifest`.
+
+        Args:
+            manifest (IndexManifest): What the index currently holds.
+            embedding_model (str): Embedding model used for new vectors.
+            chunking_version (str): Version of the chunking that produced the documents.
+            prune (bool): Delete documents that are not checked. Set it only when the
+                documents are the complete corpus rather than a partial upload.
+        """
+        self.prune = prune
+        self.indexed = manifest.documents
+        self.stale: dict[str, None] = {}
+        if (manifest.embedding_model, manifest.chunking_version) != (
+            embedding_model,
+            chunking_version,
+        ):
+            # Vectors from another model or chunking cannot be reused.
+            self.stale = dict.fromkeys(self.indexed)
+            self.indexed = {}
+        self.manifest = IndexManifest(
+            embedding_model=embedding_model,
+            chunking_version=chunking_version,
+            documents={} if prune else dict(self.indexed),
+        )
+        self.unchanged = 0
+
+    def check(self, doc: Document) -> tuple[Optional[Document], Optional[str]]:
+        """Record `doc` and decide what to do with it.
+
+        Returns:
+            tuple[Optional[Document], Optional[str]]: The document to embed, with `id`
+                set to its UUID (None if unchanged), and the UUID whose old vector must
+                be deleted first (None unless the document changed).
+        """
+        doc_id = document_uuid(doc)
+        fingerprint = document_fingerprint(doc)
+        self.manifest.documents[doc_id] = fingerprint
+        previous = self.indexed.get(doc_id)
+        if previous == fingerprint:
+            self.unchanged += 1
+            return None, None
+        replaced = previous is not None or doc_id in self.stale
+        return (
+            Document(id=doc_id, page_content=doc.page_content, metadata=doc.metadata),
+            doc_id if replaced else None,
+        )
+
+    def finish(self) -> list[str]:
+        """Return UUIDs to delete that were not replaced by a checked document."""
+        stale = [doc_id for doc_id in self.stale if doc_id not in self.manifest.documents]
+        vanished = (
+            [doc_id for doc_id in self.indexed if doc_id not in self.manifest.documents]
+            if self.prune
+            else []
+        )
+        return stale + vanished
+
+
+@dataclass
+class IndexPlan:
+    """The writes that bring the index in line with a set of documents."""
+
+    add: list[Document] = field(default_factory=list)
+    """New or changed documents, with `id` set to their UUID."""
+    delete: list[str] = field(default_factory=list)
+    """UUIDs of changed or vanished documents whose vectors must go."""
+    unchanged: int = 0
+    manifest: IndexManifest = field(default_factory=IndexManifest)
+    """The manifest describing the index once the plan is applied."""
+
+
+def plan_index_update(
+    manifest: IndexManifest,
+    docs: list[Document],
+    *,
+    embedding_model: str,
+    chunking_version: str,
+    prune: bool = True,
+) -> IndexPlan:
+    """Compare `docs` with `manifest` and list the writes needed.
+
+    Args:
+        manifest (IndexManifest): What the index currently holds.
+        docs (list[Document]): The documents the index should hold.
+        embedding_model (str): Embedding model used for new vectors.
+        chunking_version (str): Version of the chunking that produced `docs`.
+        prune (bool): Delete documents missing from `docs`. Set it only when `docs`
+            is the complete corpus rather than a partial upload.
+
+    Returns:
+        IndexPlan: Documents to add, UUIDs to delete and the updated manifest.
+    """
+    update = ManifestUpdate(
+        manifest,
+        embedding_model=embedding_model,
+        chunking_version=chunking_version,
+        prune=prune,
+    )
+    plan = IndexPlan(manifest=update.manifest)
+    for doc in docs:
+        to_add, to_delete = update.check(doc)
+        if to_add is not None:
+            plan.add.append(to_add)
+        if to_delete is not None:
+            plan.delete.append(to_delete)
+    plan.delete.extend(update.finish())
+    plan.unchanged = update.unchanged
+    return plan
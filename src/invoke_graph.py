@@ -2,15 +2,19 @@
 Script to invoke the retrieval graph for answering questions.
 run in terminal using:
 - python src/invoke_graph.py
+- python src/invoke_graph.py --stream   (print progress and the answer as it is generated)
 """
+import argparse
 import asyncio
 from typing import Dict, Any
 from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableConfig
 from dataclasses import asdict
 from retrieval_graph.configuration import AgentConfiguration
-from retrieval_graph.graph import graph
+from retrieval_graph.graph import graph, warm_up
+from retrieval_graph.streaming import astream_answer
 
-async def main(question: str) -> None:
+async def main(question: str, stream: bool = False) -> None:
     # Create a configuration with your preferred models
     config = AgentConfiguration(
         query_model="azure-openai/gpt-4o-mini",  
@@ -28,6 +32,10 @@ async def main(question: str) -> None:
     # langgraph library expects the config parameter to be a dictionary-like object, not an instance of a custom class like AgentConfiguration
 
     config_dict = asdict(config)
+    if stream:
+        stream_config: RunnableConfig = {"recursion_limit": 10, "configurable": config_dict}
+        await stream_main(question, input_data, stream_config)
+        return
     result = await graph.ainvoke(input_data,
                                 config = {"recursion_limit": 10, # this is standalone config key 
                                           "configurable": config_dict # this contains user defined config settings  
@@ -40,8 +48,31 @@ async def main(question: str) -> None:
     print("\nResponse:", result["messages"][-1].content)
 
 
-async def run_interactive_session():
+async def stream_main(question: str, input_data: Dict[str, Any], config: RunnableConfig) -> None:
+    """Print node progress while the graph runs, then the answer token by token."""
+    print("\nQuestion:", question)
+    answering = False
+    async for update in astream_answer(graph, input_data, config):
+        if update.kind == "node" and not answering:
+            print(f"[{update.elapsed:6.2f}s] {update.node}")
+        elif update.kind == "token":
+            if not answering:
+                print("\nResponse: ", end="", flush=True)
+                answering = True
+            print(update.text, end="", flush=True)
+        elif update.kind == "end":
+            if not answering:
+                print("\nResponse:", update.text, end="")
+            timing = update.timing
+            if timing is not None:
+                ttft = f"{timing.first_token:.2f}s" if timing.first_token is not None else "n/a"
+                print(f"\n\nSTREAM TIMING::: first token {ttft}, total {timing.total:.2f}s, {timing.tokens} chunks")
+
+
+async def run_interactive_session(stream: bool = False) -> None:
     """Run an interactive session that properly handles the event loop."""
+    # build the chat model clients once, before the first question
+    warm_up({"configurable": asdict(AgentConfiguration())})
     while True:
         question = input("Enter your question (or 'exit' to quit): ")
         if question.lower() in ['exit', 'bye']:
@@ -49,8 +80,11 @@ async def run_interactive_session():
             break
 
         # Call the main function with the user input
-        await main(question)
+        await main(question, stream=stream)
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--stream", action="store_true", help="stream progress and answer tokens")
+    args = parser.parse_args()
     # Use a single event loop for the entire session
-    asyncio.run(run_interactive_session())
\ No newline at end of file
+    asyncio.run(run_interactive_session(stream=args.stream))
\ No newline at end of file
@@ -0,0 +1,191 @@
+"""Semantic cache of final answers, consulted before the graph does any work.
+
+Analysts keep asking practically the same question, and each time the router, the
+planner, the researchers and the responder ran again. The cache maps the embedding
+of a conversation's opening question to the answer and documents the graph produced
+for it. A new question whose embedding is within `threshold` cosine similarity of a
+cached one, recorded against the same index version and younger than `ttl_seconds`,
+is answered from the cache. Entries are evicted least recently used first, and the
+whole cache is dropped when the index it was computed from changes.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Hashable, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+
+@dataclass
+class CachedAnswer:
+    """An answer the graph produced, with the documents it was based on."""
+
+    question: str
+    answer: str
+    documents: list[Document]
+    created: float
+    hits: int = 0
+
+
+@dataclass
+class AnswerCacheStats:
+    """Counters describing the effectiveness of the answer cache."""
+
+    hits: int = 0
+    misses: int = 0
+    expired: int = 0
+    evictions: int = 0
+    invalidations: int = 0
+    """Times the cache was dropped because the index changed."""
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups answered from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class SemanticAnswerCache:
+    """Bounded, TTL-limited nearest-neighbour cache of answers."""
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: float = 3600.0,
+        threshold: float = 0.95,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Create an empty cache.
+
+        Args:
+            max_entries (int): Answers kept before the least recently used is evicted.
+            ttl_seconds (float): Age after which an answer is no longer served.
+            threshold (float): Minimum cosine similarity between questions for a hit.
+            clock (Callable[[], float]): Monotonic clock, replaceable in tests.
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.threshold = threshold
+        self.clock = clock
+        self.stats = AnswerCacheStats()
+        self._vectors: Optional[np.ndarray] = None
+        self._entries: OrderedDict[int, CachedAnswer] = OrderedDict()
+        """Slot → entry, least recently used first."""
+        self._version: Optional[Hashable] = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        """Return the number of cached answers."""
+        return len(self._entries)
+
+    def _check_version(self, version: Optional[Hashable]) -> None:
+        if version != self._version:
+            if self._entries:
+                self.stats.invalidations += 1
+            self._entries.clear()
+            self._version = version
+
+    def _purge_expired(self) -> None:
+        now = self.clock()
+        expired = [
+            slot
+            for slot, entry in self._entries.items()
+            if now - entry.created > self.ttl_seconds
+        ]
+        for slot in expired:
+            del self._entries[slot]
+        self.stats.expired += len(expired)
+
+    @staticmethod
+    def _normalize(vector: list[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(array))
+        return array / norm if norm else array
+
+    def lookup(
+        self, vector: list[float], version: Optional[Hashable] = None
+    ) -> Optional[CachedAnswer]:
+        """Return the cached answer closest to `vector`, if it is close and fresh enough.
+
+        Args:
+            vector (list[float]): Embedding of the question.
+            version (Optional[Hashable]): Current index version; a different version
+                from the one the cache holds drops every entry.
+        """
+        query = self._normalize(vector)
+        with self._lock:
+            self._check_version(version)
+            self._purge_expired()
+            if not self._entries or self._vectors is None:
+                self.stats.misses += 1
+                return None
+            slots = np.fromiter(self._entries, dtype=np.int64, count=len(self._entries))
+            similarities = self._vectors[slots] @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.stats.misses += 1
+                return None
+            slot = int(slots[best])
+            entry = self._entries[slot]
+            self._entries.move_to_end(slot)
+            entry.hits += 1
+            self.stats.hits += 1
+            return entry
+
+    def store(
+        self,
+        vector: list[float],
+        question: str,
+        answer: str,
+        documents: list[Document],
+        version: Optional[Hashable] = None,
+    ) -> None:
+        """Cache `answer` and `documents` for the question embedded as `vector`."""
+        row = self._normalize(vector)
+        with self._lock:
+            self._check_version(version)
+            self._purge_expired()
+            if self._vectors is None or self._vectors.shape[1] != row.shape[0]:
+                self._vectors = np.zeros((self.max_entries, row.shape[0]), dtype=np.float32)
+                self._entries.clear()
+            if len(self._entries) < self.max_entries:
+                used = set(self._entries)
+                slot = next(i for i in range(self.max_entries) if i not in used)
+            else:
+                slot, _ = self._entries.popitem(last=False)
+                self.stats.evictions += 1
+            self._vectors[slot] = row
+            self._entries[slot] = CachedAnswer(
+                question=question,
+                answer=answer,
+                documents=list(documents),
+                created=self.clock(),
+            )
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._entries.clear()
+
+
+_caches: dict[Hashable, SemanticAnswerCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_answer_cache(
+    key: Hashable, *, max_entries: int, ttl_seconds: float, threshold: float
+) -> SemanticAnswerCache:
+    """Return the process-wide answer cache for `key`, creating it once.
+
+    `key` should identify everything an answer depends on besides the question,
+    such as the embedding model, index and models.
+    """
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = SemanticAnswerCache(max_entries, ttl_seconds, threshold)
+        cache.ttl_seconds, cache.threshold = ttl_seconds, threshold
+        return cache
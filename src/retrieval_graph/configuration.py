@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Annotated
+from typing import Annotated, Literal, Optional
 import os 
 from retrieval_graph import prompts
 from shared.configuration import BaseConfiguration
@@ -12,7 +12,7 @@ import uuid
 
 load_dotenv(find_dotenv())
 
-OPENAI_API_VERSION = os.environ["OPENAI_API_VERSION"]
+OPENAI_API_VERSION = os.environ.get("OPENAI_API_VERSION")
 
 @dataclass (kw_only=True)
 class AgentConfiguration(BaseConfiguration):
@@ -36,6 +36,118 @@ class AgentConfiguration(BaseConfiguration):
         },
     )
 
+    retrieval_mode: Literal["parallel", "batched"] = field(
+        default="parallel",
+        metadata={
+            "description": "How the researcher retrieves documents for its queries. 'parallel' runs one retrieval per query; 'batched' embeds all queries in a single call and runs one matrix search."
+        },
+    )
+
+    research_mode: Literal["sequential", "parallel"] = field(
+        default="sequential",
+        metadata={
+            "description": "How the research plan is executed. 'sequential' researches one step per graph iteration; 'parallel' fans the steps out at once (see research_max_concurrency) so a plan takes about as long as its slowest step."
+        },
+    )
+
+    research_max_concurrency: int = field(
+        default=3,
+        metadata={
+            "description": "In 'parallel' research mode, the most plan steps researched at the same time. Extra steps queue behind the earlier ones."
+        },
+    )
+
+    extract_metadata_filters: bool = field(
+        default=False,
+        metadata={
+            "description": "Have the query generator also extract company, fiscal_year and form_type from the research step. They are merged into the retriever's metadata filter, which restricts the vector search to matching filings."
+        },
+    )
+
+    fast_router: bool = field(
+        default=False,
+        metadata={
+            "description": "Route obvious opening questions ('general' or 'sec-filings') with a local nearest-centroid classifier over embedded examples, calling the LLM router otherwise (see retrieval_graph.fast_router)."
+        },
+    )
+
+    fast_router_threshold: float = field(
+        default=0.1,
+        metadata={
+            "description": "Margin in cosine similarity by which the best route must beat the runner-up for the fast router to decide. Higher is more conservative."
+        },
+    )
+
+    fast_router_min_similarity: float = field(
+        default=0.5,
+        metadata={
+            "description": "Minimum cosine similarity between the question and the best route's example centroid for the fast router to decide."
+        },
+    )
+
+    fast_router_examples_path: Optional[str] = field(
+        default=None,
+        metadata={
+            "description": "JSON file mapping each route ('general', 'sec-filings', 'more-info') to example questions. Defaults to the built-in examples."
+        },
+    )
+
+    route_and_plan: bool = field(
+        default=False,
+        metadata={
+            "description": "Classify the question and, for SEC filing questions, plan the research in a single structured call instead of two, skipping create_research_plan."
+        },
+    )
+
+    context_max_tokens: int = field(
+        default=6000,
+        metadata={
+            "description": "Token budget for the documents in the response prompt. The most relevant distinct documents are packed until it is reached (see shared.context)."
+        },
+    )
+
+    context_metadata_fields: list[str] = field(
+        default_factory=lambda: ["company", "fiscal_year", "form_type", "source", "page"],
+        metadata={
+            "description": "Document metadata fields rendered in the response prompt; other fields are left out."
+        },
+    )
+
+    context_dedupe_threshold: float = field(
+        default=0.9,
+        metadata={
+            "description": "Word-trigram Jaccard similarity at which a document is dropped from the response prompt as a near-duplicate of a more relevant one."
+        },
+    )
+
+    answer_cache: bool = field(
+        default=False,
+        metadata={
+            "description": "Answer a conversation's opening question from the semantic answer cache when a close enough question was answered before (see retrieval_graph.answer_cache)."
+        },
+    )
+
+    answer_cache_threshold: float = field(
+        default=0.95,
+        metadata={
+            "description": "Minimum cosine similarity between two questions' embeddings for a cached answer to be reused."
+        },
+    )
+
+    answer_cache_ttl_seconds: float = field(
+        default=3600.0,
+        metadata={
+            "description": "Age in seconds after which a cached answer is no longer served."
+        },
+    )
+
+    answer_cache_size: int = field(
+        default=1024,
+        metadata={
+            "description": "Answers kept in the semantic answer cache before the least recently used is evicted."
+        },
+    )
+
     thread_id: str = field(
         default=uuid.uuid4().hex[:8],  # Generate a random thread ID
         metadata={
@@ -73,6 +185,13 @@ class AgentConfiguration(BaseConfiguration):
         },
     )
 
+    route_and_plan_system_prompt: str = field(
+        default=prompts.ROUTE_AND_PLAN_SYSTEM_PROMPT,
+        metadata={
+            "description": "The system prompt used to classify the question and plan its research in one call when route_and_plan is enabled."
+        },
+    )
+
     generate_queries_system_prompt: str = field(
         default=prompts.GENERATE_QUERIES_SYSTEM_PROMPT,
         metadata={
@@ -0,0 +1,195 @@
+"""Local pre-classifier that routes obvious questions without an LLM call.
+
+`analyze_and_route_query` asked the query model to classify every turn, including
+greetings and unmistakable filing questions. `FastRouter` embeds a few labelled
+examples per route once, keeps the normalized centroid of each route, and classifies
+a question by cosine similarity to those centroids. When the best route is at least
+`min_similarity` close and beats the runner-up by at least `threshold`, that route is
+used directly; otherwise the LLM router decides.
+
+Only routes listed in `FAST_ROUTES` are ever decided locally. A question closest to
+the "more-info" examples still goes to the LLM, whose reasoning about what is missing
+is what the follow-up question is written from. The graph uses the fast path for a
+conversation's opening question only, since follow-ups depend on earlier turns.
+"""
+
+import json
+import threading
+from dataclasses import dataclass, field
+from typing import Hashable, Optional, get_args, get_type_hints
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from retrieval_graph.state import Router
+
+ROUTER_EXAMPLES: dict[str, list[str]] = {
+    "general": [
+        "hi",
+        "hello there",
+        "thanks, that's all",
+        "thank you!",
+        "good morning",
+        "how are you?",
+        "what's the weather like today?",
+        "tell me a joke",
+    ],
+    "sec-filings": [
+        "What was Apple's revenue in fiscal year 2023?",
+        "Summarize the risk factors in Tesla's latest 10-K.",
+        "How did Microsoft's operating margin change between 2022 and 2023?",
+        "What does Amazon's 10-Q say about free cash flow?",
+        "List the segments reported in Alphabet's annual report.",
+        "What legal proceedings does Meta disclose in its 10-K?",
+        "Compare Nvidia's R&D expenses over the last three fiscal years.",
+        "What was the net income reported in the company's quarterly filing?",
+    ],
+    "more-info": [
+        "What was the revenue?",
+        "Tell me about the company.",
+        "How did they do last year?",
+        "What are the risks?",
+        "Compare the two.",
+        "What about the filing?",
+    ],
+}
+"""Labelled examples per route; override with `fast_router_examples_path`."""
+
+FAST_ROUTES: dict[str, str] = {
+    "general": "The user is greeting, thanking or making small talk, not asking about SEC filings.",
+    "sec-filings": "The user asks about information found in SEC 10-K/10-Q filings.",
+}
+"""Routes the fast path may decide, with the logic handed on to the answering prompts."""
+
+
+@dataclass
+class FastRouterStats:
+    """How often the fast path decided the route."""
+
+    decided: dict[str, int] = field(default_factory=dict)
+    """Fast-path decisions per route."""
+    fallbacks: int = 0
+    """Questions left to the LLM router."""
+
+    @property
+    def fast_path_rate(self) -> float:
+        """Fraction of questions routed without an LLM call."""
+        fast = sum(self.decided.values())
+        total = fast + self.fallbacks
+        return fast / total if total else 0.0
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class FastRouter:
+    """Nearest-centroid classifier over embeddings of labelled examples."""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        examples: dict[str, list[str]],
+        threshold: float = 0.1,
+        min_similarity: float = 0.5,
+    ) -> None:
+        """Create a router; the examples are embedded on first use.
+
+        Args:
+            embeddings (Embeddings): Encoder shared with retrieval.
+            examples (dict[str, list[str]]): Route → example questions.
+            threshold (float): Margin by which the best route's similarity must beat
+                the runner-up's for the fast path to decide.
+            min_similarity (float): Minimum cosine similarity between the question and
+                the best route's centroid for the fast path to decide.
+        """
+        self.embeddings = embeddings
+        self.examples = examples
+        self.threshold = threshold
+        self.min_similarity = min_similarity
+        self.labels = list(examples)
+        self.stats = FastRouterStats()
+        self._centroids: Optional[np.ndarray] = None
+
+    async def centroids(self) -> np.ndarray:
+        """Return the normalized centroid of each route, embedding the examples once."""
+        if self._centroids is None:
+            texts = [text for label in self.labels for text in self.examples[label]]
+            vectors = _normalize(
+                np.asarray(await self.embeddings.aembed_documents(texts), dtype=np.float32)
+            )
+            centroids, start = [], 0
+            for label in self.labels:
+                end = start + len(self.examples[label])
+                centroids.append(vectors[start:end].mean(axis=0))
+                start = end
+            self._centroids = _normalize(np.stack(centroids))
+        return self._centroids
+
+    async def classify(self, question: str) -> Optional[Router]:
+        """Return the route of `question`, or None when the LLM should decide."""
+        centroids = await self.centroids()
+        query = _normalize(
+            np.asarray(await self.embeddings.aembed_query(question), dtype=np.float32)
+        )
+        similarities = centroids @ query
+        order = np.argsort(similarities)[::-1]
+        best = int(order[0])
+        margin = float(similarities[best] - similarities[order[1]]) if len(order) > 1 else 1.0
+        label = self.labels[best]
+        if (
+            label not in FAST_ROUTES
+            or similarities[best] < self.min_similarity
+            or margin < self.threshold
+        ):
+            self.stats.fallbacks += 1
+            return None
+        self.stats.decided[label] = self.stats.decided.get(label, 0) + 1
+        return Router(type=label, logic=FAST_ROUTES[label])  # type: ignore[typeddict-item]
+
+
+_routers: dict[Hashable, FastRouter] = {}
+_routers_lock = threading.Lock()
+
+
+def load_examples(path: Optional[str]) -> dict[str, list[str]]:
+    """Read route examples from a JSON object at `path`, or return the built-in ones.
+
+    Raises:
+        ValueError: If a label is not a `Router` type or a route has no examples.
+    """
+    if path is None:
+        return ROUTER_EXAMPLES
+    with open(path) as f:
+        examples: dict[str, list[str]] = json.load(f)
+    routes = get_args(get_type_hints(Router)["type"])
+    unknown = sorted(set(examples) - set(routes))
+    if unknown:
+        raise ValueError(
+            f"Unknown routes {unknown} in {path}; expected a subset of {list(routes)}"
+        )
+    empty = sorted(label for label, texts in examples.items() if not texts)
+    if empty:
+        raise ValueError(f"Routes {empty} in {path} have no examples")
+    return examples
+
+
+def get_fast_router(
+    embeddings: Embeddings,
+    embedding_model: str,
+    *,
+    examples_path: Optional[str] = None,
+    threshold: float = 0.1,
+    min_similarity: float = 0.5,
+) -> FastRouter:
+    """Return the process-wide fast router for an embedding model and example set."""
+    key = (embedding_model, examples_path)
+    with _routers_lock:
+        router = _routers.get(key)
+        if router is None:
+            router = _routers[key] = FastRouter(
+                embeddings, load_examples(examples_path), threshold, min_similarity
+            )
+        router.threshold, router.min_similarity = threshold, min_similarity
+        return router
@@ -5,66 +5,203 @@ retrieval graph. It includes the main graph definition, state management,
 and key functions for processing & routing user queries, generating research plans to answer user questions, conducting research, and formulating responses.
 """
 
-from typing import Any, Literal, TypedDict, cast
+import logging
+import os
+from typing import Any, Literal, Optional, Union, cast
 
-from langchain_core.messages import BaseMessage
+from langchain_core.messages import AIMessage, BaseMessage
 from langchain_core.runnables import RunnableConfig
 from langgraph.graph import END, START, StateGraph
+from langgraph.types import Send
 
+from retrieval_graph.answer_cache import SemanticAnswerCache, get_answer_cache
 from retrieval_graph.configuration import AgentConfiguration
-from retrieval_graph.researcher_graph.researcher_graph import researcher_graph
-from retrieval_graph.state import AgentState, InputState, Router
-from shared.utils import format_docs, load_chat_model
+from retrieval_graph.fast_router import get_fast_router
+from retrieval_graph.researcher_graph.researcher_graph import (
+    FilteredResponse,
+    Response,
+    researcher_graph,
+)
+from retrieval_graph.state import (
+    AgentState,
+    InputState,
+    Plan,
+    ResearchLaneState,
+    Router,
+    RouterWithPlan,
+)
+from shared import retrieval
+from shared.model_registry import chat_models
+from shared.context import assemble_context
+from shared.utils import load_chat_model, load_structured_model
+
+logger = logging.getLogger(__name__)
+
+def _answer_cache(configuration: AgentConfiguration) -> SemanticAnswerCache:
+    return get_answer_cache(
+        (
+            configuration.embedding_model,
+            configuration.retriever_provider,
+            os.path.abspath(configuration.faiss_index_path),
+            configuration.query_model,
+            configuration.response_model,
+        ),
+        max_entries=configuration.answer_cache_size,
+        ttl_seconds=configuration.answer_cache_ttl_seconds,
+        threshold=configuration.answer_cache_threshold,
+    )
+
+
+def _opening_question(state: AgentState) -> Optional[str]:
+    # Only a conversation's first question stands on its own; follow-ups depend on
+    # the earlier turns, so they are never cached.
+    questions = [m for m in state.messages if m.type == "human"]
+    return str(questions[0].content) if len(questions) == 1 else None
+
+
+async def check_answer_cache(
+    state: AgentState, *, config: RunnableConfig
+) -> dict[str, Any]:
+    """Answer the opening question from the semantic answer cache if possible.
+
+    Args:
+        state (AgentState): The current state of the agent, including conversation history.
+        config (RunnableConfig): Configuration enabling the cache and selecting its limits.
+
+    Returns:
+        dict[str, Any]: On a hit, the cached answer as a message and its documents;
+            'answered_from_cache' tells `route_cached` where to go next.
+    """
+    configuration = AgentConfiguration.from_runnable_config(config)
+    question = _opening_question(state)
+    if not configuration.answer_cache or question is None:
+        return {"answered_from_cache": False}
+
+    cache = _answer_cache(configuration)
+    embeddings = retrieval.make_configured_encoder(configuration)
+    cached = cache.lookup(
+        await embeddings.aembed_query(question), retrieval.index_version(configuration)
+    )
+    if cached is None:
+        return {"answered_from_cache": False}
+    return {
+        "messages": [AIMessage(content=cached.answer)],
+        "documents": cached.documents,
+        "answered_from_cache": True,
+    }
+
+
+def route_cached(state: AgentState) -> Literal["analyze_and_route_query", "__end__"]:
+    """End the turn after a cache hit, otherwise run the full pipeline."""
+    # "__end__" is END; spelled out so the return matches the Literal annotation.
+    return "__end__" if state.answered_from_cache else "analyze_and_route_query"
+
 
 async def analyze_and_route_query(
     state: AgentState, *, config: RunnableConfig
-) -> dict[str, Router]:
+) -> dict[str, Any]:
     """Analyze the user's query and determine the appropriate routing.
 
     This function uses a language model to classify the user's query and decide how to route it within the conversation flow.
+    With `route_and_plan` enabled the same call also returns the research plan of SEC
+    filing questions, so `create_research_plan` is skipped.
 
     Args:
         state (AgentState): The current state of the agent, including conversation history.
         config (RunnableConfig): Configuration with the model used for query analysis.
 
     Returns:
-        dict[str, Router]: A dictionary containing the 'router' key with the classification result (classification type and logic).
+        dict[str, Any]: A dictionary containing the 'router' key with the classification result (classification type and logic),
+            and the 'steps' of the plan, empty unless it was produced in the same call.
     """
     print("\n--- ANALYZING QUERY ---")
 
     configuration = AgentConfiguration.from_runnable_config(config)
-    model = load_chat_model(configuration.query_model)
+    # Like the answer cache, the fast path only sees questions that stand on their own.
+    question = _opening_question(state)
+    if configuration.fast_router and question is not None:
+        fast_router = get_fast_router(
+            retrieval.make_configured_encoder(configuration),
+            configuration.embedding_model,
+            examples_path=configuration.fast_router_examples_path,
+            threshold=configuration.fast_router_threshold,
+            min_similarity=configuration.fast_router_min_similarity,
+        )
+        routed = await fast_router.classify(question)
+        if routed is not None:
+            return {"router": routed, "steps": []}
+
+    if configuration.route_and_plan:
+        return await _route_and_plan(state, configuration)
+
+    model = load_structured_model(configuration.query_model, Router)
         
     messages = [
         {"role": "system", "content": configuration.router_system_prompt}
     ] + state.messages
-    response = cast(
-        Router, await model.with_structured_output(Router).ainvoke(messages)
-    )
+    response = cast(Router, await model.ainvoke(messages))
 
     print("Routing Decision:")
     print(f"Type: {response['type']}")
     print(f"Logic: {response['logic']}\n")
 
-    return {"router": response}
+    return {"router": response, "steps": []}
+
+
+async def _route_and_plan(
+    state: AgentState, configuration: AgentConfiguration
+) -> dict[str, Any]:
+    model = load_structured_model(configuration.query_model, RouterWithPlan)
+    messages = [
+        {"role": "system", "content": configuration.route_and_plan_system_prompt}
+    ] + state.messages
+    response = cast(RouterWithPlan, await model.ainvoke(messages))
+    router = Router(type=response["type"], logic=response["logic"])
+
+    print("Routing Decision:")
+    print(f"Type: {router['type']}")
+    print(f"Logic: {router['logic']}\n")
+
+    if router["type"] != "sec-filings" or not response["steps"]:
+        # Without a plan, `create_research_plan` still runs for filing questions.
+        return {"router": router, "steps": []}
+
+    print("Research Plan:")
+    for i, step in enumerate(response["steps"], start=1):
+        print(f"Step {i}: {step}")
+    return {"router": router, "steps": response["steps"], "documents": "delete"}
 
 
 def route_query(
-    state: AgentState,
-) -> Literal["create_research_plan", "ask_for_more_info", "respond_to_general_query"]:
+    state: AgentState, *, config: RunnableConfig
+) -> Union[
+    list[Send],
+    Literal[
+        "create_research_plan",
+        "conduct_research",
+        "ask_for_more_info",
+        "respond_to_general_query",
+    ],
+]:
     """Determine the next step based on the query classification.
 
+    SEC filing questions whose plan came with the routing decision go straight to
+    research, as `dispatch_research` would send them after `create_research_plan`.
+
     Args:
         state (AgentState): The current state of the agent, including the router's classification.
+        config (RunnableConfig): Configuration selecting the research mode.
 
     Returns:
-        Literal["create_research_plan", "ask_for_more_info", "respond_to_general_query"]: The next step to take.
+        Union[list[Send], Literal[...]]: The next step to take.
 
     Raises:
         ValueError: If an unknown router type is encountered.
     """
     _type = state.router["type"]
     if _type == "sec-filings":
+        if state.steps:
+            return dispatch_research(state, config=config)
         return "create_research_plan"
     elif _type == "more-info":
         return "ask_for_more_info"
@@ -137,15 +274,9 @@ async def create_research_plan(
     Returns:
         dict[str, list[str]]: A dictionary with a 'steps' key containing the list of research steps.
     """
-
-    class Plan(TypedDict):
-        """Generate research plan."""
-
-        steps: list[str]
-
     configuration = AgentConfiguration.from_runnable_config(config)
 
-    model = load_chat_model(configuration.query_model).with_structured_output(Plan)
+    model = load_structured_model(configuration.query_model, Plan)
 
     messages = [
         {"role": "system", "content": configuration.research_plan_system_prompt}
@@ -190,6 +321,53 @@ async def conduct_research(state: AgentState) -> dict[str, Any]:
     return {"documents": result["documents"], "steps": state.steps[1:]}
 
 
+def dispatch_research(
+    state: AgentState, *, config: RunnableConfig
+) -> Union[list[Send], Literal["conduct_research"]]:
+    """Start researching the plan, one step at a time or all at once.
+
+    In "parallel" research mode the steps are dealt round-robin onto at most
+    `research_max_concurrency` lanes, each sent to `research_lane`, so the lanes run
+    concurrently and every lane researches its steps in order.
+
+    Args:
+        state (AgentState): The current state of the agent, including the research plan steps.
+        config (RunnableConfig): Configuration selecting the research mode.
+
+    Returns:
+        Union[list[Send], Literal["conduct_research"]]: One Send per lane, or the
+            sequential `conduct_research` node.
+    """
+    configuration = AgentConfiguration.from_runnable_config(config)
+    if configuration.research_mode != "parallel" or len(state.steps) <= 1:
+        return "conduct_research"
+    lanes = max(1, min(configuration.research_max_concurrency, len(state.steps)))
+    logger.debug("Researching %d plan steps in %d lanes", len(state.steps), lanes)
+    return [
+        Send("research_lane", ResearchLaneState(steps=state.steps[lane::lanes]))
+        for lane in range(lanes)
+    ]
+
+
+async def research_lane(state: ResearchLaneState) -> dict[str, Any]:
+    """Research the steps of one lane in order and return their documents.
+
+    The documents of all lanes are merged by the `reduce_docs` reducer of
+    `AgentState.documents`.
+
+    Args:
+        state (ResearchLaneState): The plan steps assigned to this lane.
+
+    Returns:
+        dict[str, Any]: A dictionary with 'documents' containing the research results.
+    """
+    documents = []
+    for step in state.steps:
+        result = await researcher_graph.ainvoke({"question": step})
+        documents.extend(result["documents"])
+    return {"documents": documents}
+
+
 def check_finished(state: AgentState) -> Literal["respond", "conduct_research"]:
     """Determine if the research process is complete or if more research is needed.
 
@@ -213,6 +391,8 @@ async def respond(
     """Generate a final response to the user's query based on the conducted research.
 
     This function formulates a comprehensive answer using the conversation history and the documents retrieved by the researcher.
+    The documents are deduplicated, ordered by relevance to the latest question, and
+    packed into `context_max_tokens`, so the prompt does not grow with the plan.
 
     Args:
         state (AgentState): The current state of the agent, including retrieved documents and conversation history.
@@ -223,29 +403,93 @@ async def respond(
     """
     configuration = AgentConfiguration.from_runnable_config(config)
     model = load_chat_model(configuration.response_model)
-    context = format_docs(state.documents)
+    latest_question = next(
+        (str(m.content) for m in reversed(state.messages) if m.type == "human"), ""
+    )
+    context, stats = assemble_context(
+        state.documents,
+        latest_question,
+        max_tokens=configuration.context_max_tokens,
+        metadata_fields=configuration.context_metadata_fields,
+        dedupe_threshold=configuration.context_dedupe_threshold,
+    )
+    logger.debug("Response context: %s", stats)
     prompt = configuration.response_system_prompt.format(context=context)
     
     messages = [{"role": "system", "content": prompt}] + state.messages
 
     response = await model.ainvoke(messages)
-    
+
+    question = _opening_question(state)
+    if configuration.answer_cache and question is not None:
+        embeddings = retrieval.make_configured_encoder(configuration)
+        _answer_cache(configuration).store(
+            await embeddings.aembed_query(question),
+            question,
+            str(response.content),
+            state.documents,
+            retrieval.index_version(configuration),
+        )
+
     return {"messages": [response]}
 
 
+def warm_up(config: Optional[RunnableConfig] = None) -> None:
+    """Construct every chat model and structured-output runnable the graph uses.
+
+    Call it once at startup so the first request does not pay for building SDK
+    clients; later node invocations fetch them from the registry.
+
+    Args:
+        config (Optional[RunnableConfig]): Configuration selecting the models.
+    """
+    configuration = AgentConfiguration.from_runnable_config(config)
+    queries_schema = (
+        FilteredResponse if configuration.extract_metadata_filters else Response
+    )
+    chat_models.warm_up(
+        [
+            (configuration.query_model, None),
+            (configuration.query_model, Router),
+            (configuration.query_model, Plan),
+            (configuration.query_model, RouterWithPlan),
+            (configuration.query_model, queries_schema),
+            (configuration.response_model, None),
+        ]
+    )
+
+
 # Define the graph
 builder = StateGraph(AgentState, input=InputState, config_schema=AgentConfiguration)
+builder.add_node(check_answer_cache)
 builder.add_node(analyze_and_route_query)
 builder.add_node(ask_for_more_info)
 builder.add_node(respond_to_general_query)
 builder.add_node(conduct_research)
+builder.add_node(research_lane)
 builder.add_node(create_research_plan)
 builder.add_node(respond)
 
-builder.add_edge(START, "analyze_and_route_query") 
-builder.add_conditional_edges("analyze_and_route_query", route_query) # router type
-
-builder.add_edge("create_research_plan", "conduct_research")    # research plan
+builder.add_edge(START, "check_answer_cache")
+builder.add_conditional_edges("check_answer_cache", route_cached) # cached answer or full pipeline
+builder.add_conditional_edges(   # router type, or research when the plan came with it
+    "analyze_and_route_query",
+    route_query,
+    path_map=[
+        "create_research_plan",
+        "conduct_research",
+        "research_lane",
+        "ask_for_more_info",
+        "respond_to_general_query",
+    ],
+)
+
+builder.add_conditional_edges(   # research plan, step by step or all steps at once
+    "create_research_plan",
+    dispatch_research,
+    path_map=["conduct_research", "research_lane"],
+)
+builder.add_edge("research_lane", "respond")   # respond once every lane is done
 
 builder.add_conditional_edges("conduct_research", check_finished) # check if research is finished
 builder.add_edge("ask_for_more_info", END)          # ask for more info and END
@@ -51,6 +51,21 @@ You have access to the following documentation sources:
 You do not need to specify where you want to research for all steps of the plan, but it's sometimes helpful."""
 
 
+ROUTE_AND_PLAN_SYSTEM_PROMPT = ROUTER_SYSTEM_PROMPT + """
+
+## Research plan
+If you classify the inquiry as `sec-filings`, also generate a plan for how you will research the answer to it, \
+in `steps`. The plan should generally not be more than 3 steps long, it can be as short as one. The length of the plan depends on the question.
+
+You have access to the following documentation sources:
+- Company 10K filings (annual reports)
+- Company 10Q filings (quarterly reports)
+
+You do not need to specify where you want to research for all steps of the plan, but it's sometimes helpful.
+
+For `more-info` and `general` inquiries, leave `steps` empty."""
+
+
 RESPONSE_SYSTEM_PROMPT = """\
 You are an expert financial analyst and SEC filing specialist, tasked with answering any question \
 about 10K and 10Q SEC filings.
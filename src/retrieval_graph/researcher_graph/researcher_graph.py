@@ -4,7 +4,7 @@ This module defines the core structure and functionality of the researcher graph
 which is responsible for generating search queries and retrieving relevant documents.
 """
 
-from typing import TypedDict, cast
+from typing import Any, Literal, TypedDict, Union, cast
 
 from langchain_core.documents import Document
 from langchain_core.runnables import RunnableConfig
@@ -14,12 +14,37 @@ from langgraph.types import Send
 from retrieval_graph.configuration import AgentConfiguration
 from retrieval_graph.researcher_graph.state import QueryState, ResearcherState
 from shared import retrieval
-from shared.utils import load_chat_model
+from shared.utils import load_structured_model
+
+
+class MetadataFilters(TypedDict, total=False):
+    """Metadata the research step is scoped to; omitted keys are not filtered on."""
+
+    company: str
+    fiscal_year: str
+    form_type: str
+
+
+class Response(TypedDict):
+    """Search queries generated for one research step."""
+
+    queries: list[str]
+
+
+class FilteredResponse(Response, total=False):
+    """Search queries, and the metadata the step is scoped to."""
+
+    filters: MetadataFilters
+
+
+FILTERS_PROMPT = """
+If the question is clearly scoped to one company, fiscal year or SEC form type (e.g. 10-K, 10-Q), also return them in `filters`, exactly as they would appear in the filing metadata. Leave out anything the question does not pin down.
+"""
 
 
 async def generate_queries(
     state: ResearcherState, *, config: RunnableConfig
-) -> dict[str, list[str]]:
+) -> dict[str, Any]:
     """Generate search queries based on the question (a step in the research plan).
 
     This function uses a language model to generate diverse search queries to help answer the question.
@@ -29,23 +54,27 @@ async def generate_queries(
         config (RunnableConfig): Configuration with the model used to generate queries.
 
     Returns:
-        dict[str, list[str]]: A dictionary with a 'queries' key containing the list of generated search queries.
+        dict[str, Any]: A dictionary with a 'queries' key containing the list of generated search queries,
+            and a 'filters' key with the extracted metadata filters when `extract_metadata_filters` is set.
     """
-
-    class Response(TypedDict):
-        queries: list[str]
-
     configuration = AgentConfiguration.from_runnable_config(config)
-    model = load_chat_model(configuration.query_model).with_structured_output(Response)
+    system_prompt = configuration.generate_queries_system_prompt
+    schema: type = Response
+    if configuration.extract_metadata_filters:
+        system_prompt += FILTERS_PROMPT
+        schema = FilteredResponse
+    model = load_structured_model(configuration.query_model, schema)
     messages = [
-        {"role": "system", "content": configuration.generate_queries_system_prompt},
+        {"role": "system", "content": system_prompt},
         {"role": "human", "content": state.question},
     ]
-    response = cast(Response, await model.ainvoke(messages))
+    response = cast(FilteredResponse, await model.ainvoke(messages))
 
     print("GENERATED QUERIES:::", response["queries"]) 
     # apparently the step info is also passed to this fcn so the queries made are relevant to the research step in progress.
 
+    if configuration.extract_metadata_filters:
+        return {"queries": response["queries"], "filters": response.get("filters") or {}}
     return {"queries": response["queries"]}
 
 
@@ -63,6 +92,7 @@ async def retrieve_documents(
     Returns:
         dict[str, list[Document]]: A dictionary with a 'documents' key containing the list of retrieved documents.
     """
+    config = retrieval.with_metadata_filter(config, state.filters)
     with retrieval.make_retriever(config) as retriever:
 
         response = await retriever.ainvoke(state.query, config)
@@ -70,26 +100,57 @@ async def retrieve_documents(
         return {"documents": response}
 
 
-def retrieve_in_parallel(state: ResearcherState) -> list[Send]:
+async def retrieve_documents_batched(
+    state: ResearcherState, *, config: RunnableConfig
+) -> dict[str, list[Document]]:
+    """Retrieve documents for all generated queries in one batch.
+
+    All queries are embedded in a single call and searched as one matrix, instead of
+    one retriever, embedding call and k-NN search per query.
+
+    Args:
+        state (ResearcherState): The current state of the researcher, including the generated queries.
+        config (RunnableConfig): Configuration with the retriever used to fetch documents.
+
+    Returns:
+        dict[str, list[Document]]: A dictionary with a 'documents' key containing the documents of every query.
+    """
+    config = retrieval.with_metadata_filter(config, state.filters)
+    results = await retrieval.aretrieve_batch(config, state.queries)
+    return {"documents": [doc for docs in results for doc in docs]}
+
+
+def retrieve_in_parallel(
+    state: ResearcherState, *, config: RunnableConfig
+) -> Union[list[Send], Literal["retrieve_documents_batched"]]:
     """Create parallel retrieval tasks for each generated query.
 
-    This function prepares parallel document retrieval tasks for each query in the researcher's state.
+    This function prepares parallel document retrieval tasks for each query in the researcher's state,
+    unless the configuration selects the batched retrieval mode.
 
     Args:
         state (ResearcherState): The current state of the researcher, including the generated queries.
+        config (RunnableConfig): Configuration selecting the retrieval mode.
 
     Returns:
-        Literal["retrieve_documents"]: A list of Send objects, each representing a document retrieval task.
+        Union[list[Send], Literal["retrieve_documents_batched"]]: A list of Send objects, each representing
+            a document retrieval task, or the batched retrieval node.
 
     Behavior:
-        - Creates a Send object for each query in the state.
+        - In "batched" mode, routes to the single "retrieve_documents_batched" node.
+        - Otherwise creates a Send object for each query in the state.
         - Each Send object targets the "retrieve_documents" node with the corresponding query.
     """
+    configuration = AgentConfiguration.from_runnable_config(config)
+    if configuration.retrieval_mode == "batched":
+        return "retrieve_documents_batched"
+
     # Send – A message or packet to send to a specific node in the graph.
     # sending multiple inputs returns result for each.
 
     return [
-        Send("retrieve_documents", QueryState(query=query)) for query in state.queries
+        Send("retrieve_documents", QueryState(query=query, filters=state.filters))
+        for query in state.queries
     ]
 
 
@@ -97,13 +158,15 @@ def retrieve_in_parallel(state: ResearcherState) -> list[Send]:
 builder = StateGraph(ResearcherState)
 builder.add_node(generate_queries)
 builder.add_node(retrieve_documents)
+builder.add_node(retrieve_documents_batched)
 builder.add_edge(START, "generate_queries")
 builder.add_conditional_edges(
     "generate_queries",
     retrieve_in_parallel,  # type: ignore
-    path_map=["retrieve_documents"],
+    path_map=["retrieve_documents", "retrieve_documents_batched"],
 )
 builder.add_edge("retrieve_documents", END)
+builder.add_edge("retrieve_documents_batched", END)
 # Compile into a graph object that you can invoke and deploy.
 researcher_graph = builder.compile()
 researcher_graph.name = "ResearcherGraph"
@@ -4,7 +4,7 @@ This module defines the state structures used in the researcher graph.
 """
 
 from dataclasses import dataclass, field
-from typing import Annotated
+from typing import Annotated, Any
 
 from langchain_core.documents import Document
 
@@ -16,6 +16,8 @@ class QueryState:
     """Private state for the retrieve_documents node in the researcher graph."""
 
     query: str
+    filters: dict[str, Any] = field(default_factory=dict)
+    """Metadata filters extracted from the research step, applied to the search."""
 
 
 @dataclass#(kw_only=True)
@@ -26,6 +28,8 @@ class ResearcherState:
     """A step in the research plan generated by the retriever agent."""
     queries: list[str] = field(default_factory=list)
     """A list of search queries based on the question that the researcher generates."""
+    filters: dict[str, Any] = field(default_factory=dict)
+    """Metadata filters (company, fiscal_year, form_type) extracted from the question."""
     documents: Annotated[list[Document], reduce_docs] = field(default_factory=list)
     """Populated by the retriever. This is a list of documents that the agent can reference."""
 
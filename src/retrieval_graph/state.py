@@ -62,7 +62,21 @@ class Router(TypedDict):
     """Classify user query."""
 
     logic: str
-    type: Literal["more-info", "langchain", "general"]
+    type: Literal["more-info", "sec-filings", "general"]
+
+
+class Plan(TypedDict):
+    """Generate research plan."""
+
+    steps: list[str]
+
+
+class RouterWithPlan(TypedDict):
+    """Classify user query and, for SEC filing questions, plan the research."""
+
+    logic: str
+    type: Literal["more-info", "sec-filings", "general"]
+    steps: list[str]
 
 
 # This is the primary state of your agent, where you can store any information
@@ -78,6 +92,16 @@ class AgentState(InputState):
     """A list of steps in the research plan."""
     documents: Annotated[list[Document], reduce_docs] = field(default_factory=list)
     """Populated by the retriever. This is a list of documents that the agent can reference."""
+    answered_from_cache: bool = False
+    """Whether this turn was answered by the semantic answer cache."""
 
     # Feel free to add additional attributes to your state as needed.
     # Common examples include retrieved documents, extracted entities, API connections, etc.
+
+
+@dataclass(kw_only=True)
+class ResearchLaneState:
+    """Private state of one `research_lane` task in the parallel research mode."""
+
+    steps: list[str]
+    """Research plan steps this lane works through, in order."""
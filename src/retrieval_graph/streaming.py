@@ -0,0 +1,89 @@
+"""Stream node progress and answer tokens out of the retrieval graph.
+
+`graph.ainvoke` returns only once the whole pipeline is done, so nothing reached the
+user until the final answer was complete. `astream_answer` runs the graph through
+`astream_events` and yields an update when a graph node starts and for every token
+the answering nodes generate, then a final update with the timing of the turn. The
+time to first token, rather than the total, is what the user perceives as latency.
+"""
+
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Literal, Optional
+
+from langchain_core.runnables import Runnable, RunnableConfig
+
+ANSWER_NODES = frozenset({"respond", "respond_to_general_query", "ask_for_more_info"})
+"""Nodes whose chat model output is the answer shown to the user."""
+
+
+@dataclass
+class AnswerTiming:
+    """Latency of one streamed turn, in seconds since the graph was started."""
+
+    first_token: Optional[float] = None
+    """Time to the first answer token, None if the answer was not streamed."""
+    total: float = 0.0
+    tokens: int = 0
+    """Answer chunks streamed."""
+
+
+@dataclass
+class StreamUpdate:
+    """One update from `astream_answer`.
+
+    - "node": `node` started.
+    - "token": `text` is the next piece of the answer, generated by `node`.
+    - "end": the turn is done; `text` is the full answer and `timing` is set.
+    """
+
+    kind: Literal["node", "token", "end"]
+    node: str = ""
+    text: str = ""
+    elapsed: float = 0.0
+    timing: Optional[AnswerTiming] = None
+
+
+def _final_answer(output: Any) -> str:
+    messages = output.get("messages") if isinstance(output, dict) else None
+    return str(messages[-1].content) if messages else ""
+
+
+async def astream_answer(
+    graph: Runnable[Any, Any], input: Any, config: Optional[RunnableConfig] = None
+) -> AsyncIterator[StreamUpdate]:
+    """Run `graph` on `input`, yielding node progress and answer tokens as they happen.
+
+    Args:
+        graph (Runnable): The compiled retrieval graph.
+        input (Any): Graph input, e.g. {"messages": [...]}.
+        config (Optional[RunnableConfig]): Graph configuration.
+
+    Yields:
+        StreamUpdate: Node starts and answer tokens, then one "end" update.
+    """
+    start = time.perf_counter()
+    timing = AnswerTiming()
+    streamed: list[str] = []
+    answer = ""
+    async for event in graph.astream_events(input, config, version="v2"):
+        kind = event["event"]
+        node = event.get("metadata", {}).get("langgraph_node", "")
+        if kind == "on_chain_start" and event["name"] == node:
+            yield StreamUpdate("node", node, elapsed=time.perf_counter() - start)
+        elif kind == "on_chat_model_stream" and node in ANSWER_NODES:
+            text = event["data"]["chunk"].content
+            if not isinstance(text, str) or not text:
+                continue
+            elapsed = time.perf_counter() - start
+            if timing.first_token is None:
+                timing.first_token = elapsed
+            timing.tokens += 1
+            streamed.append(text)
+            yield StreamUpdate("token", node, text, elapsed)
+        elif kind == "on_chain_end" and not event.get("parent_ids"):
+            answer = _final_answer(event["data"].get("output"))
+    timing.total = time.perf_counter() - start
+    yield StreamUpdate(
+        "end", text="".join(streamed) or answer, elapsed=timing.total, timing=timing
+    )
@@ -27,13 +27,195 @@ class BaseConfiguration:
         },
     )
 
+    embedding_max_connections: int = field(
+        default=20,
+        metadata={
+            "description": "Maximum open HTTP connections of the pooled embedding client."
+        },
+    )
+
+    embedding_max_keepalive_connections: int = field(
+        default=10,
+        metadata={
+            "description": "Idle HTTP connections the pooled embedding client keeps open for reuse."
+        },
+    )
+
+    embedding_cache_size: int = field(
+        default=1024,
+        metadata={
+            "description": "Number of query embeddings kept in the in-memory LRU cache. Set to 0 to disable caching."
+        },
+    )
+
+    embedding_cache_path: Optional[str] = field(
+        default=None,
+        metadata={
+            "description": "Optional SQLite file backing the embedding cache so it survives restarts."
+        },
+    )
+
+    embedding_adaptive_batching: bool = field(
+        default=True,
+        metadata={
+            "description": "Send indexing embeddings through the adaptive batcher, which packs requests by tokens, respects the RPM/TPM limits and resizes batches on 429s and slow responses."
+        },
+    )
+
+    embedding_batch_tokens: int = field(
+        default=100_000,
+        metadata={
+            "description": "Token budget of one embedding request sent by the adaptive batcher."
+        },
+    )
+
+    embedding_max_batch_size: int = field(
+        default=256,
+        metadata={
+            "description": "Upper bound on the inputs per embedding request; the adaptive batcher grows towards it while requests succeed quickly."
+        },
+    )
+
+    embedding_requests_per_minute: Optional[int] = field(
+        default=None,
+        metadata={
+            "description": "Requests-per-minute quota of the embedding deployment, or None if unknown."
+        },
+    )
+
+    embedding_tokens_per_minute: Optional[int] = field(
+        default=None,
+        metadata={
+            "description": "Tokens-per-minute quota of the embedding deployment, or None if unknown."
+        },
+    )
+
+    embedding_target_latency: float = field(
+        default=5.0,
+        metadata={
+            "description": "Embedding requests slower than this many seconds shrink the adaptive batch size."
+        },
+    )
+
     retriever_provider: Annotated[
-        Literal["mongodb", "faiss"],	
+        Literal["mongodb", "faiss", "hybrid"],	
         {"__template_metadata__": {"kind": "retriever"}},
     ] = field(
         default="faiss",
         metadata={
-            "description": "The vector store provider to use for retrieval. Options are 'mongodb', 'faiss'."
+            "description": "The vector store provider to use for retrieval. Options are 'mongodb', 'faiss', 'hybrid'. 'hybrid' fuses the local FAISS store with a BM25 index (rrf_k in search_kwargs)."
+        },
+    )
+
+    faiss_index_path: str = field(
+        default="./notebooks/faiss_index",
+        metadata={
+            "description": "Folder containing the local FAISS index (index.faiss and index.pkl)."
+        },
+    )
+
+    faiss_load_mode: Literal["memory", "mmap"] = field(
+        default="memory",
+        metadata={
+            "description": "How the FAISS vector index is opened. 'mmap' maps it read-only so worker processes share one copy through the OS page cache."
+        },
+    )
+
+    faiss_prefetch: bool = field(
+        default=False,
+        metadata={
+            "description": "Read the memory-mapped FAISS index once when it is loaded so the first searches do not fault pages in from disk."
+        },
+    )
+
+    faiss_docstore: Literal["pickle", "packed"] = field(
+        default="pickle",
+        metadata={
+            "description": "Docstore format read next to the FAISS index. 'packed' reads index.docs (see shared.docstore) and decodes only the documents a search returns."
+        },
+    )
+
+    faiss_wal_compact_bytes: int = field(
+        default=64 * 1024 * 1024,
+        metadata={
+            "description": "Size at which the write-ahead log of a writable FAISS store (index.wal, see shared.faiss_wal) is compacted into index.faiss and index.pkl."
+        },
+    )
+
+    faiss_shard_threads: int = field(
+        default=8,
+        metadata={
+            "description": "Threads searching the shards of a sharded FAISS index (a faiss_index_path holding shards.json, see shared.sharding) concurrently."
+        },
+    )
+
+    search_threads: int = field(
+        default=8,
+        metadata={
+            "description": "Threads of the dedicated pool that runs blocking vector searches and docstore decoding for async callers."
+        },
+    )
+
+    search_max_in_flight: int = field(
+        default=32,
+        metadata={
+            "description": "Searches admitted to the search pool at once; further async searches wait without blocking the event loop."
+        },
+    )
+
+    metadata_filter_fields: list[str] = field(
+        default_factory=lambda: ["company", "fiscal_year", "form_type"],
+        metadata={
+            "description": "Metadata fields indexed next to the FAISS index (index.meta.npz). A `filter` in search_kwargs over only these fields restricts the vector search to matching documents instead of filtering its results."
+        },
+    )
+
+    mongodb_uri: Optional[str] = field(
+        default=None,
+        metadata={
+            "description": "MongoDB connection string. Defaults to the MONGODB_URI environment variable."
+        },
+    )
+
+    mongodb_namespace: str = field(
+        default="langgraph_retrieval_agent.default",
+        metadata={
+            "description": "Database and collection holding the documents, as 'db.collection'."
+        },
+    )
+
+    mongodb_index_name: str = field(
+        default="vector_index",
+        metadata={
+            "description": "Name of the Atlas Vector Search index on the collection."
+        },
+    )
+
+    mongodb_max_pool_size: int = field(
+        default=50,
+        metadata={
+            "description": "Connections the shared MongoClient may open per server."
+        },
+    )
+
+    mongodb_min_pool_size: int = field(
+        default=5,
+        metadata={
+            "description": "Connections the shared MongoClient keeps open while idle, so bursts of queries do not wait for new connections."
+        },
+    )
+
+    mongodb_max_idle_time_ms: Optional[int] = field(
+        default=300_000,
+        metadata={
+            "description": "Idle pooled MongoDB connections above the minimum are closed after this many milliseconds."
+        },
+    )
+
+    search_type: Literal["similarity", "mmr"] = field(
+        default="similarity",
+        metadata={
+            "description": "Search performed by the retriever. 'mmr' fetches `fetch_k` candidates and picks `k` of them by maximal marginal relevance (`lambda_mult` in search_kwargs) to avoid near-duplicate chunks."
         },
     )
 
@@ -42,6 +224,8 @@ class BaseConfiguration:
             "k": 3,   #no. of docs to return. 
             "fetch_k": 10,  #no of docs to fetch before filtering. default is 20. 
             # "score_threshold": 0.2
+            "nprobe": 16,  #IVF clusters visited per query. ignored by flat/hnsw indexes.
+            "efSearch": 64,  #HNSW candidate list size. ignored by flat/ivf indexes.
         },
         metadata={
             "description": "Additional keyword arguments to pass to the search function of the retriever."
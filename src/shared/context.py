@@ -0,0 +1,156 @@
+"""Token-budgeted assembly of the response prompt's context.
+
+`respond` used to render every document the research steps accumulated with
+`format_docs`, repr of all metadata included, so the prompt grew with the length of
+the plan. `assemble_context` bounds it:
+
+1. Documents are ordered by relevance: a `relevance_score` (or `score`) in their
+   metadata when the retriever supplied one, otherwise BM25 against the question over
+   the documents at hand. Ties keep retrieval order.
+2. Near-identical chunks, whose word-trigram Jaccard similarity to a document already
+   kept reaches `dedupe_threshold`, are dropped.
+3. Only whitelisted metadata fields are rendered.
+4. Documents are packed in that order while they fit in `max_tokens`; one that does
+   not fit is skipped in favour of smaller, less relevant ones.
+
+Token counts of rendered documents are cached, since the same chunks come back turn
+after turn.
+"""
+
+import math
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Iterable, Optional, Sequence, Union
+
+from langchain_core.documents import Document
+
+from shared.lexical import tokenize
+from shared.tokens import count_tokens
+
+_SCORE_KEYS = ("relevance_score", "score")
+
+_Shingle = Union[str, tuple[str, str, str]]
+"""A word trigram, or a single word for documents shorter than three words."""
+
+
+@dataclass
+class ContextStats:
+    """What `assemble_context` kept and dropped."""
+
+    candidates: int = 0
+    duplicates: int = 0
+    over_budget: int = 0
+    """Documents that did not fit in the token budget."""
+    included: int = 0
+    tokens: int = 0
+    """Tokens of the rendered documents, excluding the enclosing tags."""
+
+
+@lru_cache(maxsize=4096)
+def _cached_tokens(text: str) -> int:
+    return count_tokens(text)
+
+
+def _render(doc: Document, fields: Sequence[str]) -> str:
+    metadata = doc.metadata or {}
+    meta = "".join(f" {k}={metadata[k]!r}" for k in fields if metadata.get(k) is not None)
+    return f"<document{meta}>\n{doc.page_content}\n</document>"
+
+
+def _shingles(tokens: list[str]) -> frozenset[_Shingle]:
+    if len(tokens) < 3:
+        return frozenset(tokens)
+    return frozenset(zip(tokens, tokens[1:], tokens[2:]))
+
+
+def _metadata_score(doc: Document) -> Optional[float]:
+    for key in _SCORE_KEYS:
+        value = (doc.metadata or {}).get(key)
+        if isinstance(value, (int, float)):
+            return float(value)
+    return None
+
+
+def _bm25(
+    docs_tokens: list[list[str]], query: Iterable[str], k1: float = 1.5, b: float = 0.75
+) -> list[float]:
+    n = len(docs_tokens)
+    mean_length = sum(map(len, docs_tokens)) / n or 1.0
+    frequencies = [Counter(tokens) for tokens in docs_tokens]
+    document_frequency = Counter(term for counts in frequencies for term in counts)
+    terms = set(query)
+    scores = []
+    for tokens, counts in zip(docs_tokens, frequencies):
+        score = 0.0
+        norm = k1 * (1 - b + b * len(tokens) / mean_length)
+        for term in terms & counts.keys():
+            df = document_frequency[term]
+            idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+            score += idf * counts[term] * (k1 + 1) / (counts[term] + norm)
+        scores.append(score)
+    return scores
+
+
+def rank_documents(docs: Sequence[Document], query: str) -> list[int]:
+    """Return the positions of `docs`, most relevant first.
+
+    Documents with a score in their metadata rank by it; the others rank below them
+    by BM25 against `query`.
+    """
+    docs_tokens = [tokenize(doc.page_content) for doc in docs]
+    lexical = _bm25(docs_tokens, tokenize(query)) if docs else []
+    keys = []
+    for i, doc in enumerate(docs):
+        score = _metadata_score(doc)
+        keys.append((score is None, -(score if score is not None else lexical[i]), i))
+    return [i for *_, i in sorted(keys)]
+
+
+def assemble_context(
+    docs: Optional[Sequence[Document]],
+    query: str = "",
+    *,
+    max_tokens: int = 6000,
+    metadata_fields: Sequence[str] = (),
+    dedupe_threshold: float = 0.9,
+) -> tuple[str, ContextStats]:
+    """Render the most relevant distinct documents that fit in `max_tokens`.
+
+    Args:
+        docs (Optional[Sequence[Document]]): Documents gathered by the research steps.
+        query (str): Text the documents should be relevant to, usually the question.
+        max_tokens (int): Token budget for the rendered documents.
+        metadata_fields (Sequence[str]): Metadata fields rendered as attributes.
+        dedupe_threshold (float): Word-trigram Jaccard similarity at which a document
+            counts as a duplicate of a more relevant one.
+
+    Returns:
+        tuple[str, ContextStats]: The documents as XML, as `format_docs` renders them,
+            and what was kept.
+    """
+    docs = list(docs or [])
+    stats = ContextStats(candidates=len(docs))
+    kept: list[frozenset[_Shingle]] = []
+    rendered: list[str] = []
+    for i in rank_documents(docs, query):
+        shingles = _shingles(tokenize(docs[i].page_content))
+        if any(
+            len(shingles & other) >= dedupe_threshold * len(shingles | other)
+            for other in kept
+        ):
+            stats.duplicates += 1
+            continue
+        text = _render(docs[i], metadata_fields)
+        tokens = _cached_tokens(text)
+        if stats.tokens + tokens > max_tokens:
+            # Not kept, so a near-duplicate that fits can still stand in for it.
+            stats.over_budget += 1
+            continue
+        kept.append(shingles)
+        stats.tokens += tokens
+        stats.included += 1
+        rendered.append(text)
+    if not rendered:
+        return "<documents></documents>", stats
+    return "<documents>\n" + "\n".join(rendered) + "\n</documents>", stats
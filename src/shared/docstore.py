@@ -0,0 +1,193 @@
+"""Compact, lazily decoded on-disk docstore for FAISS indexes.
+
+The docstore LangChain writes next to a FAISS index (`index.pkl`) is a pickle of every
+`Document`, so loading it deserializes the whole corpus and requires trusting the
+file. The packed format stores the same documents as msgpack records behind an offset
+table. Opening it maps the file and reads the header only; a document is decoded when a
+search actually returns it.
+
+File layout (all integers little-endian)::
+
+    header   magic (8 bytes) | format version (uint32) | reserved (uint32) | count (uint64)
+    offsets  (count + 1) x uint64, byte offsets of each record relative to the blob
+    blob     concatenated msgpack records [id, page_content, metadata]
+"""
+
+import mmap
+import os
+import pickle
+import struct
+from collections.abc import Iterable, Iterator, Mapping
+from typing import Any, Optional, Union
+
+import msgspec
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+MAGIC = b"RAGDOCS\0"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<8sIIQ")
+
+
+class _Record(msgspec.Struct, array_like=True):
+    id: str
+    page_content: str
+    metadata: dict[str, Any]
+
+
+class _RecordId(msgspec.Struct, array_like=True):
+    id: str
+
+
+def write_packed_docstore(path: str, docs: Iterable[tuple[str, Document]]) -> int:
+    """Write (docstore id, document) pairs to `path` in the packed format.
+
+    Rows are written in iteration order, so row `i` must correspond to vector `i` of
+    the FAISS index. The file is written next to `path` and renamed into place.
+
+    Returns:
+        int: The number of documents written.
+    """
+    encoder = msgspec.msgpack.Encoder()
+    offsets = [0]
+    records = []
+    for doc_id, doc in docs:
+        record = encoder.encode(_Record(doc_id, doc.page_content, doc.metadata or {}))
+        records.append(record)
+        offsets.append(offsets[-1] + len(record))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(records)))
+        f.write(np.asarray(offsets, dtype="<u8").tobytes())
+        for record in records:
+            f.write(record)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+    return len(records)
+
+
+class RowIds(Mapping[int, int]):
+    """`index_to_docstore_id` for a packed docstore: FAISS row `i` is docstore row `i`."""
+
+    def __init__(self, count: int) -> None:
+        """Map rows 0..count-1 onto themselves."""
+        self.count = count
+
+    def __getitem__(self, row: int) -> int:
+        """Return `row` as a plain int, validating its range."""
+        row = int(row)
+        if not 0 <= row < self.count:
+            raise KeyError(row)
+        return row
+
+    def __iter__(self) -> Iterator[int]:
+        """Iterate over all row numbers."""
+        return iter(range(self.count))
+
+    def __len__(self) -> int:
+        """Return the number of rows."""
+        return self.count
+
+
+class PackedDocstore(Docstore):
+    """Read-only docstore that decodes documents from a memory-mapped packed file."""
+
+    def __init__(self, path: str) -> None:
+        """Map the packed docstore at `path` and validate its header."""
+        self.path = path
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, count = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a packed docstore.")
+        if version != FORMAT_VERSION:
+            raise ValueError(
+                f"Unsupported packed docstore version {version} in {path}; "
+                f"expected {FORMAT_VERSION}."
+            )
+        self.count = int(count)
+        self._offsets = np.frombuffer(
+            self._mm, dtype="<u8", count=count + 1, offset=_HEADER.size
+        )
+        self._blob_start = _HEADER.size + self._offsets.nbytes
+        self._decoder = msgspec.msgpack.Decoder(_Record)
+        self._id_to_row: Optional[dict[str, int]] = None
+
+    def _slice(self, row: int) -> memoryview:
+        start = self._blob_start + int(self._offsets[row])
+        end = self._blob_start + int(self._offsets[row + 1])
+        return memoryview(self._mm)[start:end]
+
+    def get_row(self, row: int) -> Document:
+        """Decode the document stored at `row`."""
+        record = self._decoder.decode(self._slice(row))
+        return Document(
+            id=record.id, page_content=record.page_content, metadata=record.metadata
+        )
+
+    def row_ids(self) -> RowIds:
+        """Return the `index_to_docstore_id` mapping for this docstore."""
+        return RowIds(self.count)
+
+    def search(self, search: Union[str, int]) -> Union[str, Document]:
+        """Return the document at a row number, or with a docstore id.
+
+        Lookups by id build an id → row table on first use by decoding only the ids.
+        """
+        if isinstance(search, str):
+            if self._id_to_row is None:
+                id_decoder = msgspec.msgpack.Decoder(_RecordId)
+                self._id_to_row = {
+                    id_decoder.decode(self._slice(row)).id: row
+                    for row in range(self.count)
+                }
+            row = self._id_to_row.get(search)
+            if row is None:
+                return f"ID {search} not found."
+            return self.get_row(row)
+        if not 0 <= int(search) < self.count:
+            return f"Row {search} not found."
+        return self.get_row(int(search))
+
+    def __len__(self) -> int:
+        """Return the number of stored documents."""
+        return self.count
+
+
+def convert_pickle_docstore(folder_path: str, index_name: str = "index") -> str:
+    """Convert `<index_name>.pkl` in `folder_path` to a packed `<index_name>.docs`.
+
+    Only run this on pickles you created yourself: reading one executes arbitrary code.
+
+    Returns:
+        str: Path of the written packed docstore.
+    """
+    with open(os.path.join(folder_path, f"{index_name}.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)  # noqa: S301
+
+    def rows() -> Iterator[tuple[str, Document]]:
+        for row in range(len(index_to_docstore_id)):
+            doc_id = index_to_docstore_id[row]
+            doc = docstore.search(doc_id)
+            if not isinstance(doc, Document):
+                raise ValueError(f"Could not find document for id {doc_id}, got {doc}")
+            yield doc_id, doc
+
+    path = os.path.join(folder_path, f"{index_name}.docs")
+    write_packed_docstore(path, rows())
+    return path
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Convert a FAISS index.pkl docstore to the packed format."
+    )
+    parser.add_argument("folder_path", help="Folder containing the FAISS index.")
+    parser.add_argument("--index-name", default="index")
+    args = parser.parse_args()
+    print("Wrote", convert_pickle_docstore(args.folder_path, args.index_name))
@@ -0,0 +1,338 @@
+"""Token-aware, rate-limited batching of embedding requests.
+
+Bulk indexing used to send fixed 16-input requests and leave 429s to the client's
+blind retries. `AdaptiveEmbeddingBatcher` packs inputs into requests bounded by a
+token budget and a batch size, keeps sliding one-minute windows of requests and
+tokens so it never sends past the configured RPM/TPM limits, and adapts the batch
+size: it grows additively while requests succeed within the target latency, and is
+cut multiplicatively on a 429 or a slow response. Rate-limited and transient failures
+are retried here, honouring `Retry-After`; everything else is raised.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from shared.tokens import count_tokens
+
+
+class SlidingWindow:
+    """Amounts (requests or tokens) spent over the last `period` seconds."""
+
+    def __init__(self, limit: Optional[int], period: float = 60.0) -> None:
+        """Allow at most `limit` per `period`; None means unlimited."""
+        self.limit = limit
+        self.period = period
+        self._events: deque[tuple[float, int]] = deque()
+        self.total = 0
+
+    def _expire(self, now: float) -> None:
+        while self._events and self._events[0][0] <= now - self.period:
+            self.total -= self._events.popleft()[1]
+
+    def used(self, now: float) -> int:
+        """Return the amount spent in the window ending at `now`."""
+        self._expire(now)
+        return self.total
+
+    def delay(self, amount: int, now: float) -> float:
+        """Seconds to wait before `amount` more fits in the window."""
+        self._expire(now)
+        if self.limit is None or self.total + amount <= self.limit:
+            return 0.0
+        # Wait for enough of the oldest events to expire.
+        remaining = self.total
+        for timestamp, spent in self._events:
+            remaining -= spent
+            if remaining + amount <= self.limit:
+                return timestamp + self.period - now
+        return self._events[-1][0] + self.period - now if self._events else 0.0
+
+    def add(self, amount: int, now: float) -> None:
+        """Record `amount` spent at `now`."""
+        self._events.append((now, amount))
+        self.total += amount
+
+
+@dataclass
+class BatcherMetrics:
+    """Snapshot of an embedding batcher's state and counters."""
+
+    batch_size: int
+    """Current maximum number of inputs per request."""
+    requests: int = 0
+    inputs: int = 0
+    tokens: int = 0
+    throttled: int = 0
+    """Requests rejected with a 429."""
+    retries: int = 0
+    latency: float = 0.0
+    """Exponentially weighted request latency, in seconds."""
+    requests_last_minute: int = 0
+    tokens_last_minute: int = 0
+
+
+def retry_delay(exc: BaseException) -> Optional[tuple[bool, Optional[float]]]:
+    """Classify an embedding error.
+
+    Returns:
+        Optional[tuple[bool, Optional[float]]]: None if the error must not be retried,
+            otherwise (rate limited, seconds from a `Retry-After` header if any).
+    """
+    response = getattr(exc, "response", None)
+    status = getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+    name = type(exc).__name__
+    throttled = status == 429 or name == "RateLimitError"
+    transient = (isinstance(status, int) and status >= 500) or name in (
+        "APIConnectionError",
+        "APITimeoutError",
+        "ConnectError",
+        "ReadTimeout",
+    )
+    if not (throttled or transient):
+        return None
+    headers = getattr(response, "headers", None) or {}
+    for header, scale in (("retry-after-ms", 0.001), ("retry-after", 1.0)):
+        value = headers.get(header)
+        if value is not None:
+            try:
+                return throttled, float(value) * scale
+            except ValueError:
+                pass
+    return throttled, None
+
+
+class AdaptiveEmbeddingBatcher(Embeddings):
+    """Embed documents in adaptively sized, rate-limited requests."""
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        *,
+        max_batch_tokens: int = 100_000,
+        max_batch_size: int = 256,
+        min_batch_size: int = 1,
+        requests_per_minute: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        target_latency: float = 5.0,
+        max_retries: int = 6,
+        max_concurrency: int = 4,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Wrap `underlying`, which should send one request per call and not retry.
+
+        Args:
+            underlying (Embeddings): Model called with each packed batch.
+            max_batch_tokens (int): Token budget of one request.
+            max_batch_size (int): Upper bound of the adaptive batch size.
+            min_batch_size (int): Lower bound of the adaptive batch size.
+            requests_per_minute (Optional[int]): RPM limit, None for unlimited.
+            tokens_per_minute (Optional[int]): TPM limit, None for unlimited.
+            target_latency (float): Requests slower than this shrink the batch size.
+            max_retries (int): Retries of a rate-limited or transiently failing request.
+            max_concurrency (int): Requests in flight at once for async calls.
+            clock (Callable[[], float]): Monotonic clock, replaceable in tests.
+        """
+        self.underlying = underlying
+        self.max_batch_tokens = max_batch_tokens
+        self.max_batch_size = max_batch_size
+        self.min_batch_size = min_batch_size
+        self.target_latency = target_latency
+        self.max_retries = max_retries
+        self.max_concurrency = max_concurrency
+        self.clock = clock
+        self.batch_size = max(min_batch_size, min(16, max_batch_size))
+        self._requests = SlidingWindow(requests_per_minute)
+        self._tokens = SlidingWindow(tokens_per_minute)
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+        self._metrics = BatcherMetrics(batch_size=self.batch_size)
+
+    def metrics(self) -> BatcherMetrics:
+        """Return a snapshot of the current batch size, windows and counters."""
+        with self._lock:
+            now = self.clock()
+            return BatcherMetrics(
+                **{
+                    **self._metrics.__dict__,
+                    "batch_size": self.batch_size,
+                    "requests_last_minute": self._requests.used(now),
+                    "tokens_last_minute": self._tokens.used(now),
+                }
+            )
+
+    ## Batch sizing
+
+    def _take(self, token_counts: list[int], start: int) -> int:
+        """Return the end of the batch starting at `start` under the current limits."""
+        with self._lock:
+            size = self.batch_size
+        end, tokens = start, 0
+        while end < len(token_counts) and end - start < size:
+            if end > start and tokens + token_counts[end] > self.max_batch_tokens:
+                break
+            tokens += token_counts[end]
+            end += 1
+        return end
+
+    def _on_success(self, latency: float, inputs: int, tokens: int) -> None:
+        with self._lock:
+            m = self._metrics
+            m.requests += 1
+            m.inputs += inputs
+            m.tokens += tokens
+            m.latency = latency if m.requests == 1 else 0.8 * m.latency + 0.2 * latency
+            if latency > self.target_latency:
+                self.batch_size = max(self.min_batch_size, int(self.batch_size * 0.75))
+            elif 4 * inputs >= 3 * self.batch_size:
+                # Only a (nearly) full batch is evidence that a larger one would help;
+                # "nearly" leaves room for batches sized before a concurrent increase.
+                self.batch_size = min(self.max_batch_size, self.batch_size + max(1, self.batch_size // 4))
+
+    def _on_failure(self, throttled: bool, delay: Optional[float], attempt: int) -> None:
+        with self._lock:
+            self._metrics.retries += 1
+            if throttled:
+                self._metrics.throttled += 1
+                self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+            backoff = delay if delay is not None else min(60.0, 0.5 * 2**attempt)
+            self._blocked_until = max(self._blocked_until, self.clock() + backoff)
+
+    def _reservation_delay(self, tokens: int) -> float:
+        """Reserve a request of `tokens` now, or return how long to wait first."""
+        with self._lock:
+            now = self.clock()
+            delay = max(
+                self._blocked_until - now,
+                self._requests.delay(1, now),
+                self._tokens.delay(tokens, now),
+            )
+            if delay <= 0:
+                self._requests.add(1, now)
+                self._tokens.add(tokens, now)
+            return delay
+
+    ## Sending
+    #
+    # `_send` and `_asend` may embed only a prefix of `texts` when a 429 shrinks the
+    # batch size; callers continue from the number of vectors returned.
+
+    def _send(self, texts: list[str], counts: list[int]) -> list[list[float]]:
+        for attempt in range(self.max_retries + 1):
+            tokens = sum(counts)
+            while (delay := self._reservation_delay(tokens)) > 0:
+                time.sleep(delay)
+            start = self.clock()
+            try:
+                vectors = self.underlying.embed_documents(texts)
+            except Exception as exc:
+                retry = retry_delay(exc)
+                if retry is None or attempt == self.max_retries:
+                    raise
+                self._on_failure(*retry, attempt)
+                # Retry only what fits the reduced batch size; the caller sends the rest.
+                end = self._take(counts, 0)
+                texts, counts = texts[:end], counts[:end]
+                continue
+            self._on_success(self.clock() - start, len(texts), tokens)
+            return vectors
+        raise AssertionError("unreachable")
+
+    async def _asend(self, texts: list[str], counts: list[int]) -> list[list[float]]:
+        for attempt in range(self.max_retries + 1):
+            tokens = sum(counts)
+            while (delay := self._reservation_delay(tokens)) > 0:
+                await asyncio.sleep(delay)
+            start = self.clock()
+            try:
+                vectors = await self.underlying.aembed_documents(texts)
+            except Exception as exc:
+                retry = retry_delay(exc)
+                if retry is None or attempt == self.max_retries:
+                    raise
+                self._on_failure(*retry, attempt)
+                # Retry only what fits the reduced batch size; the caller sends the rest.
+                end = self._take(counts, 0)
+                texts, counts = texts[:end], counts[:end]
+                continue
+            self._on_success(self.clock() - start, len(texts), tokens)
+            return vectors
+        raise AssertionError("unreachable")
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed `texts` in packed requests, one at a time."""
+        counts = [count_tokens(text) for text in texts]
+        vectors: list[list[float]] = []
+        start = 0
+        while start < len(texts):
+            end = self._take(counts, start)
+            vectors.extend(self._send(texts[start:end], counts[start:end]))
+            start = len(vectors)
+        return vectors
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed `texts` in packed requests, up to `max_concurrency` in flight.
+
+        Each batch is sized when it is dispatched, so later batches already use the
+        size learned from earlier responses.
+        """
+        counts = [count_tokens(text) for text in texts]
+        vectors: list[Any] = [None] * len(texts)
+        slots = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(start: int, end: int) -> None:
+            try:
+                while start < end:
+                    part = await self._asend(texts[start:end], counts[start:end])
+                    vectors[start : start + len(part)] = part
+                    start += len(part)
+            finally:
+                slots.release()
+
+        tasks = []
+        start = 0
+        try:
+            while start < len(texts):
+                await slots.acquire()
+                end = self._take(counts, start)
+                tasks.append(asyncio.create_task(run(start, end)))
+                start = end
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+        return vectors
+
+    def embed_query(self, text: str) -> list[float]:
+        """Embed a single query as a one-input request."""
+        return self._send([text], [count_tokens(text)])[0]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        """Asynchronously embed a single query as a one-input request."""
+        return (await self._asend([text], [count_tokens(text)]))[0]
+
+
+_batchers: dict[tuple[str, tuple[tuple[str, Any], ...]], AdaptiveEmbeddingBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def get_embedding_batcher(
+    underlying: Embeddings, model: str, **options: Any
+) -> AdaptiveEmbeddingBatcher:
+    """Return the process-wide batcher for `model` and `options`, creating it once.
+
+    Sharing one batcher per model keeps a single view of the provider's rate limits
+    across concurrent indexing runs.
+    """
+    key = (model, tuple(sorted(options.items())))
+    with _batchers_lock:
+        batcher = _batchers.get(key)
+        if batcher is None:
+            batcher = _batchers[key] = AdaptiveEmbeddingBatcher(underlying, **options)
+        return batcher
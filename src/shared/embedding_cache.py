@@ -0,0 +1,239 @@
+"""Caching wrapper for embedding models.
+
+Research plans frequently generate the same search strings, and every one of them
+used to be embedded again before the vector search. `CachedEmbeddings` keys vectors by
+(model, query or document, normalized text), keeps the most recently used ones in a bounded in-memory LRU
+and can back that with a SQLite file so the cache survives restarts.
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+import unicodedata
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Literal, Optional
+
+from langchain_core.embeddings import Embeddings
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Normalize text so trivially different strings share one cache entry.
+
+    Applies NFKC unicode normalization and collapses runs of whitespace. Case is
+    preserved because tickers and line-item names are case-sensitive signals.
+    """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip()
+
+
+def _cache_key(model: str, kind: Literal["query", "document"], text: str) -> str:
+    # Some models embed queries and documents differently, so they never share entries.
+    digest = hashlib.sha256(normalize_text(text).encode()).hexdigest()
+    return f"{model}:{kind}:{digest}"
+
+
+@dataclass
+class CacheStats:
+    """Counters describing the effectiveness of an embedding cache."""
+
+    hits: int = 0
+    disk_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served without calling the embedding model."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class SqliteVectorStore:
+    """Persistent key → float32 vector table used as the cache's second tier."""
+
+    def __init__(self, path: str) -> None:
+        """Open (or create) the SQLite file at `path`."""
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB)"
+        )
+        self._conn.commit()
+
+    def get_many(self, keys: list[str]) -> dict[str, "array[float]"]:
+        """Return the stored vectors for whichever of `keys` are present."""
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})",
+                keys,
+            ).fetchall()
+        found = {}
+        for key, blob in rows:
+            vector = array("f")
+            vector.frombytes(blob)
+            found[key] = vector
+        return found
+
+    def put_many(self, items: dict[str, "array[float]"]) -> None:
+        """Store `items`, replacing existing vectors for the same keys."""
+        if not items:
+            return
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector) VALUES (?, ?)",
+                [(key, vector.tobytes()) for key, vector in items.items()],
+            )
+            self._conn.commit()
+
+    def close(self) -> None:
+        """Close the underlying connection."""
+        with self._lock:
+            self._conn.close()
+
+
+class CachedEmbeddings(Embeddings):
+    """Serve repeated texts from a cache instead of the wrapped embedding model."""
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        model: str,
+        *,
+        maxsize: int = 1024,
+        path: Optional[str] = None,
+    ) -> None:
+        """Wrap `underlying`.
+
+        Args:
+            underlying (Embeddings): The embedding model to call on a cache miss.
+            model (str): Model name, part of the cache key so models never share vectors.
+            maxsize (int): Number of vectors kept in the in-memory LRU.
+            path (Optional[str]): SQLite file for the persistent tier, if any.
+        """
+        self.underlying = underlying
+        self.model = model
+        self.maxsize = maxsize
+        self.disk = SqliteVectorStore(path) if path else None
+        self.stats = CacheStats()
+        self._lru: OrderedDict[str, "array[float]"] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _remember(self, key: str, vector: "array[float]") -> None:
+        with self._lock:
+            self._lru[key] = vector
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.maxsize:
+                self._lru.popitem(last=False)
+                self.stats.evictions += 1
+
+    def _lookup(self, keys: list[str]) -> dict[str, "array[float]"]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._lru.get(key)
+                if vector is not None:
+                    self._lru.move_to_end(key)
+                    found[key] = vector
+        if self.disk is not None:
+            from_disk = self.disk.get_many([key for key in keys if key not in found])
+            self.stats.disk_hits += len(from_disk)
+            for key, vector in from_disk.items():
+                self._remember(key, vector)
+            found.update(from_disk)
+        return found
+
+    def _store(self, computed: dict[str, "array[float]"]) -> None:
+        for key, vector in computed.items():
+            self._remember(key, vector)
+        if self.disk is not None:
+            self.disk.put_many(computed)
+
+    def _prepare(
+        self, texts: list[str], kind: Literal["query", "document"]
+    ) -> tuple[list[str], dict[str, "array[float]"], list[str]]:
+        keys = [_cache_key(self.model, kind, text) for text in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+        missing: dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key in found:
+                self.stats.hits += 1
+            else:
+                self.stats.misses += 1
+                missing.setdefault(key, text)
+        return keys, found, list(missing)
+
+    def _finish(
+        self,
+        keys: list[str],
+        found: dict[str, "array[float]"],
+        missing_keys: list[str],
+        vectors: list[list[float]],
+    ) -> list[list[float]]:
+        computed = {key: array("f", vector) for key, vector in zip(missing_keys, vectors)}
+        self._store(computed)
+        found.update(computed)
+        return [found[key].tolist() for key in keys]
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed `texts`, calling the wrapped model once for all cache misses."""
+        keys, found, missing_keys = self._prepare(texts, "document")
+        by_key = dict(zip(keys, texts))
+        vectors = (
+            self.underlying.embed_documents([by_key[key] for key in missing_keys])
+            if missing_keys
+            else []
+        )
+        return self._finish(keys, found, missing_keys, vectors)
+
+    def embed_query(self, text: str) -> list[float]:
+        """Embed a single query, skipping the model call on a cache hit."""
+        keys, found, missing_keys = self._prepare([text], "query")
+        vectors = [self.underlying.embed_query(text)] if missing_keys else []
+        return self._finish(keys, found, missing_keys, vectors)[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Asynchronously embed `texts`, calling the wrapped model once for all misses."""
+        keys, found, missing_keys = self._prepare(texts, "document")
+        by_key = dict(zip(keys, texts))
+        vectors = (
+            await self.underlying.aembed_documents([by_key[key] for key in missing_keys])
+            if missing_keys
+            else []
+        )
+        return self._finish(keys, found, missing_keys, vectors)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        """Asynchronously embed a single query, skipping the model call on a hit."""
+        keys, found, missing_keys = self._prepare([text], "query")
+        vectors = [await self.underlying.aembed_query(text)] if missing_keys else []
+        return self._finish(keys, found, missing_keys, vectors)[0]
+
+
+_caches: dict[tuple[int, str, int, Optional[str]], CachedEmbeddings] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cached_embeddings(
+    underlying: Embeddings, model: str, *, maxsize: int, path: Optional[str] = None
+) -> CachedEmbeddings:
+    """Return the process-wide cache for (underlying, model, maxsize, path), creating it once.
+
+    Each encoder instance, and so each client configuration, gets its own cache; the
+    cache keeps a reference to `underlying`, so its id is not reused while registered.
+    """
+    key = (id(underlying), model, maxsize, path)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = _caches[key] = CachedEmbeddings(
+                underlying, model, maxsize=maxsize, path=path
+            )
+        return cache
@@ -0,0 +1,161 @@
+"""Process-scoped pool of long-lived embedding clients.
+
+Building an embeddings client per retrieval also builds a fresh HTTP client, so every
+query embedding pays for TCP and TLS setup. The pool keeps one embeddings instance per
+(provider, model, endpoint) key, backed by shared sync and async `httpx` clients with
+keep-alive, and counts how many requests reused a pooled connection.
+"""
+
+import asyncio
+import atexit
+import threading
+from contextlib import suppress
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable
+
+import httpx
+from langchain_core.embeddings import Embeddings
+
+_NEW_CONNECTION_EVENT = "connection.connect_tcp.started"
+
+
+@dataclass
+class ConnectionStats:
+    """Counters for requests sent through a pooled HTTP client pair."""
+
+    requests: int = 0
+    new_connections: int = 0
+
+    @property
+    def reused_connections(self) -> int:
+        """Requests that were served on an already open keep-alive connection."""
+        return max(self.requests - self.new_connections, 0)
+
+
+@dataclass
+class HttpClients:
+    """A sync/async `httpx` client pair sharing one set of connection counters."""
+
+    sync_client: httpx.Client
+    async_client: httpx.AsyncClient
+    stats: ConnectionStats
+
+    def close(self) -> None:
+        """Close both clients, tolerating an async client bound to a closed loop."""
+        self.sync_client.close()
+        if not self.async_client.is_closed:
+            with suppress(Exception):
+                asyncio.run(self.async_client.aclose())
+
+    async def aclose(self) -> None:
+        """Close both clients from a running event loop."""
+        self.sync_client.close()
+        await self.async_client.aclose()
+
+
+def make_http_clients(
+    max_connections: int = 20,
+    max_keepalive_connections: int = 10,
+    keepalive_expiry: float = 30.0,
+) -> HttpClients:
+    """Create keep-alive `httpx` clients that record connection reuse.
+
+    Args:
+        max_connections (int): Upper bound on open connections per client.
+        max_keepalive_connections (int): Idle connections kept open for reuse.
+        keepalive_expiry (float): Seconds an idle connection is kept before closing.
+    """
+    stats = ConnectionStats()
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive_connections,
+        keepalive_expiry=keepalive_expiry,
+    )
+
+    def trace(event_name: str, info: dict[str, Any]) -> None:
+        if event_name == _NEW_CONNECTION_EVENT:
+            stats.new_connections += 1
+
+    async def atrace(event_name: str, info: dict[str, Any]) -> None:
+        trace(event_name, info)
+
+    def on_request(request: httpx.Request) -> None:
+        stats.requests += 1
+        request.extensions["trace"] = trace
+
+    async def on_async_request(request: httpx.Request) -> None:
+        stats.requests += 1
+        request.extensions["trace"] = atrace
+
+    return HttpClients(
+        sync_client=httpx.Client(limits=limits, event_hooks={"request": [on_request]}),
+        async_client=httpx.AsyncClient(
+            limits=limits, event_hooks={"request": [on_async_request]}
+        ),
+        stats=stats,
+    )
+
+
+@dataclass
+class _PooledEncoder:
+    encoder: Embeddings
+    clients: HttpClients
+
+
+@dataclass
+class EncoderPool:
+    """Hand out one shared embeddings client per key for the life of the process."""
+
+    _encoders: dict[Hashable, _PooledEncoder] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def get(
+        self,
+        key: Hashable,
+        factory: Callable[[HttpClients], Embeddings],
+        **limits: Any,
+    ) -> Embeddings:
+        """Return the pooled encoder for `key`, creating it on first use.
+
+        Args:
+            key (Hashable): Identifies the encoder, e.g. (provider, model, endpoint).
+            factory (Callable[[HttpClients], Embeddings]): Builds the encoder around
+                the pooled HTTP clients.
+            **limits: Connection limits passed to `make_http_clients` on creation.
+        """
+        pooled = self._encoders.get(key)
+        if pooled is not None:
+            return pooled.encoder
+        with self._lock:
+            pooled = self._encoders.get(key)
+            if pooled is None:
+                clients = make_http_clients(**limits)
+                pooled = _PooledEncoder(encoder=factory(clients), clients=clients)
+                self._encoders[key] = pooled
+            return pooled.encoder
+
+    def stats(self) -> dict[Hashable, ConnectionStats]:
+        """Return the connection counters of every pooled encoder."""
+        return {key: pooled.clients.stats for key, pooled in self._encoders.items()}
+
+    def close(self) -> None:
+        """Close every pooled HTTP client and empty the pool."""
+        with self._lock:
+            pooled_encoders = list(self._encoders.values())
+            self._encoders.clear()
+        for pooled in pooled_encoders:
+            pooled.clients.close()
+
+    async def aclose(self) -> None:
+        """Close every pooled HTTP client from a running event loop."""
+        with self._lock:
+            pooled_encoders = list(self._encoders.values())
+            self._encoders.clear()
+        for pooled in pooled_encoders:
+            await pooled.clients.aclose()
+
+
+encoders = EncoderPool()
+"""Pool shared by every retriever in the process."""
+
+atexit.register(encoders.close)
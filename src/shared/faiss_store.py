@@ -0,0 +1,598 @@
+"""FAISS vector store used by the `faiss` retriever provider.
+
+`FaissStore` is LangChain's `FAISS` store with the search paths this agent relies on
+replaced by vectorized versions. Everything else, including loading, saving and
+adding documents, is inherited unchanged.
+
+Metadata filters over the fields of a `MetadataIndex` are applied before the vector
+search rather than after it: the filter is resolved to the matching FAISS rows, and
+only those rows are searched.
+
+Writable stores can log their adds and deletes to a write-ahead log (see
+`shared.faiss_wal`) so that writes persist without rewriting the index.
+"""
+
+import operator
+import os
+import threading
+from typing import Any, Callable, Iterable, Mapping, Optional, Union, cast
+
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import DistanceStrategy
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+from shared import faiss_wal
+from shared.metadata_index import DEFAULT_FIELDS, MetadataIndex, is_prefilterable
+from shared.mmr import mmr_select_batch
+from shared.search_pool import SearchPool
+
+MetadataFilter = Callable[[dict[str, Any]], bool]
+"""A filter called with a document's metadata, as LangChain's FAISS store accepts."""
+
+EXACT_SEARCH_MAX_ROWS = 20_000
+"""Candidate sets up to this size are searched exactly on a temporary flat index."""
+
+_metadata_lock = threading.Lock()
+
+
+def search_and_reconstruct(
+    index: Any, queries: np.ndarray, fetch_k: int
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Search `index` and return the stored vectors of the hits alongside.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray, np.ndarray]: Scores and ids of shape
+            (q, fetch_k), and candidate vectors of shape (q, fetch_k, d).
+    """
+    try:
+        return cast(
+            tuple[np.ndarray, np.ndarray, np.ndarray],
+            index.search_and_reconstruct(queries, fetch_k),
+        )
+    except RuntimeError:
+        # Index types without search_and_reconstruct fall back to a batched reconstruct.
+        scores, ids = index.search(queries, fetch_k)
+        vectors = np.zeros((*ids.shape, index.d), dtype=np.float32)
+        valid = ids >= 0
+        vectors[valid] = index.reconstruct_batch(ids[valid])
+        return scores, ids, vectors
+
+
+def supports_removal(index: Any) -> bool:
+    """Whether `index` can remove vectors; HNSW graphs cannot."""
+    return not hasattr(index, "hnsw")
+
+
+def search_rows(
+    index: Any, queries: np.ndarray, k: int, rows: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """Search only the given `rows` of `index`.
+
+    Small candidate sets are copied into a flat index and searched exactly. Larger
+    ones, and indexes that cannot reconstruct their vectors, are searched in place
+    with an id selector; IVF indexes then probe every list for small sets so no
+    candidate is missed.
+
+    Returns:
+        tuple[np.ndarray, np.ndarray]: Scores and FAISS rows of shape (q, k), padded
+            with -1 rows like `index.search`.
+    """
+    import faiss
+
+    scores = np.full((len(queries), k), -1, dtype=np.float32)
+    ids = np.full((len(queries), k), -1, dtype=np.int64)
+    if not len(rows):
+        return scores, ids
+
+    rows = np.asarray(rows, dtype=np.int64)
+    if len(rows) <= EXACT_SEARCH_MAX_ROWS:
+        try:
+            vectors = index.reconstruct_batch(rows)
+        except RuntimeError:
+            vectors = None
+        if vectors is not None:
+            exact = faiss.IndexFlat(index.d, index.metric_type)
+            exact.add(vectors)
+            found_scores, positions = exact.search(queries, min(k, len(rows)))
+            width = positions.shape[1]
+            scores[:, :width] = found_scores
+            ids[:, :width] = np.where(positions >= 0, rows[positions], -1)
+            return scores, ids
+
+    selector = faiss.IDSelectorBatch(rows)
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        ivf = None
+    params: faiss.SearchParameters
+    if ivf is not None:
+        ivf_params = faiss.SearchParametersIVF()
+        ivf_params.nprobe = ivf.nlist if len(rows) <= EXACT_SEARCH_MAX_ROWS else ivf.nprobe
+        params = ivf_params
+    elif hasattr(index, "hnsw"):
+        # SearchParametersHNSW is missing from faiss's type stubs.
+        hnsw_params = faiss.SearchParametersHNSW()  # type: ignore[attr-defined]
+        hnsw_params.efSearch = index.hnsw.efSearch
+        params = hnsw_params
+    else:
+        params = faiss.SearchParameters()
+    params.sel = selector
+    return cast(tuple[np.ndarray, np.ndarray], index.search(queries, k, params=params))
+
+
+class FaissStore(FAISS):
+    """LangChain FAISS store with vectorized MMR and metadata pre-filtering."""
+
+    metadata_fields: tuple[str, ...] = DEFAULT_FIELDS
+    metadata_index_path: Optional[str] = None
+    """Where the metadata index is persisted; None keeps it in memory only."""
+    metadata_source_path: Optional[str] = None
+    _metadata_index: Optional[MetadataIndex] = None
+    wal: Optional[faiss_wal.WriteAheadLog] = None
+    """Log every add and delete is appended to, if persistence is enabled."""
+    wal_compact_bytes: Optional[int] = None
+    _wal_location: Optional[tuple[str, str]] = None
+    _wal_end: int = 0
+    """Offset in the log up to which its records are reflected in this store."""
+    _base_signature: Optional[faiss_wal.BaseSignature] = None
+    """`faiss_wal.base_signature` of the base files this store was loaded from."""
+    search_pool: Optional[SearchPool] = None
+    """Pool the async search methods run on; None uses the default executor."""
+
+    def __init__(
+        self,
+        embedding_function: Union[Callable[[str], list[float]], Embeddings],
+        index: Any,
+        docstore: Docstore,
+        index_to_docstore_id: Mapping[int, Union[str, int]],
+        **kwargs: Any,
+    ) -> None:
+        """Create the store over `index` and `docstore`.
+
+        `index_to_docstore_id` is any mapping from FAISS rows to docstore ids, including
+        the `RowIds` of a packed docstore, whose ids are its own row numbers.
+        """
+        super().__init__(
+            embedding_function,
+            index,
+            docstore,
+            cast(dict[int, str], index_to_docstore_id),
+            **kwargs,
+        )
+
+    def use_metadata_index(
+        self,
+        fields: tuple[str, ...],
+        path: Optional[str] = None,
+        source_path: Optional[str] = None,
+    ) -> None:
+        """Pre-filter searches on `fields`, persisting the index at `path`.
+
+        A persisted index is reused while it covers the same rows and is newer than
+        `source_path`, the FAISS index file it was built from; otherwise it is rebuilt
+        on first use.
+        """
+        self.metadata_fields = tuple(fields)
+        self.metadata_index_path = path
+        self.metadata_source_path = source_path
+        self._metadata_index = None
+
+    def use_write_ahead_log(
+        self,
+        folder_path: str,
+        index_name: str,
+        compact_bytes: Optional[int] = None,
+        wal_end: int = 0,
+    ) -> None:
+        """Persist later writes to the log of `index_name` in `folder_path`.
+
+        Call it under the exclusive `faiss_wal.index_lock`, with the store holding the
+        base files plus the records of the log up to `wal_end`. Once the log reaches
+        `compact_bytes`, it is compacted into the base files.
+        """
+        self.wal = faiss_wal.WriteAheadLog(faiss_wal.wal_path(folder_path, index_name))
+        self.wal.cut(wal_end)
+        self.wal_compact_bytes = compact_bytes
+        self._wal_location = (folder_path, index_name)
+        self._wal_end = wal_end
+        self._base_signature = faiss_wal.base_signature(folder_path, index_name)
+
+    @property
+    def embedding_model(self) -> Embeddings:
+        """The `Embeddings` of this store; stores built on a plain function have none."""
+        if not isinstance(self.embedding_function, Embeddings):
+            raise ValueError("This store embeds with a function, not an Embeddings model.")
+        return self.embedding_function
+
+    def _log_files(self) -> tuple[faiss_wal.WriteAheadLog, str, str]:
+        """Return the log and the (folder, index name) of the files it belongs to."""
+        if self.wal is None or self._wal_location is None:
+            raise ValueError("This store has no write-ahead log.")
+        return (self.wal, *self._wal_location)
+
+    def _reload_base(self) -> None:
+        _, folder_path, index_name = self._log_files()
+        base = FAISS.load_local(
+            folder_path,
+            self.embedding_model,
+            index_name=index_name,
+            allow_dangerous_deserialization=True,
+        )
+        self.index = base.index
+        self.docstore = base.docstore
+        self.index_to_docstore_id = base.index_to_docstore_id
+        self._metadata_index = None
+        self._base_signature = faiss_wal.base_signature(folder_path, index_name)
+        self._wal_end = 0
+
+    def _sync_with_log(self) -> bool:
+        """Apply the writes other writers logged since this store last looked.
+
+        Must run under the exclusive lock. If another writer compacted in the meantime,
+        the base files hold every write logged before, including this store's, so the
+        store is reloaded from them.
+
+        Returns:
+            bool: Whether the store was reloaded.
+        """
+        wal, folder_path, index_name = self._log_files()
+        reloaded = faiss_wal.base_signature(folder_path, index_name) != self._base_signature
+        if reloaded:
+            self._reload_base()
+        _, self._wal_end = faiss_wal.replay(self, wal, self._wal_end)
+        wal.cut(self._wal_end)
+        return reloaded
+
+    def refresh(self) -> None:
+        """Catch up with the writes other writers logged; a no-op without a log."""
+        if self.wal is None:
+            return
+        _, folder_path, index_name = self._log_files()
+        with faiss_wal.index_lock(folder_path, index_name):
+            self._sync_with_log()
+
+    def _compact_locked(self) -> None:
+        wal, folder_path, index_name = self._log_files()
+        faiss_wal.compact(self, folder_path, index_name, wal)
+        self._wal_end = 0
+        self._base_signature = faiss_wal.base_signature(folder_path, index_name)
+
+    def compact(self) -> None:
+        """Rewrite the base index files from this store and empty the log.
+
+        Raises:
+            ValueError: If the store has no write-ahead log.
+        """
+        _, folder_path, index_name = self._log_files()
+        with faiss_wal.index_lock(folder_path, index_name):
+            self._sync_with_log()
+            self._compact_locked()
+
+    def _log(self, record: faiss_wal.WalRecord) -> None:
+        if self.wal is None:
+            return
+        wal, folder_path, index_name = self._log_files()
+        with faiss_wal.index_lock(folder_path, index_name):
+            if self._sync_with_log():
+                # The reload replaced the in-memory write this record describes.
+                faiss_wal.apply_records(self, [record])
+            self._wal_end = wal.append(record)
+            if self.wal_compact_bytes is not None and self._wal_end >= self.wal_compact_bytes:
+                self._compact_locked()
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[list[dict[str, Any]]] = None,
+        ids: Optional[list[str]] = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        """Embed and add `texts`, logging them if persistence is enabled."""
+        start_row = self.index.ntotal
+        ids = super().add_texts(texts, metadatas, ids, **kwargs)
+        if self.wal is not None:
+            self._log(faiss_wal.record_added(self, start_row, ids))
+        return ids
+
+    async def aadd_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[list[dict[str, Any]]] = None,
+        ids: Optional[list[str]] = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        """Asynchronously embed and add `texts`, logging them if persistence is enabled."""
+        start_row = self.index.ntotal
+        ids = await super().aadd_texts(texts, metadatas, ids, **kwargs)
+        if self.wal is not None:
+            self._log(faiss_wal.record_added(self, start_row, ids))
+        return ids
+
+    def add_embeddings(
+        self,
+        text_embeddings: Iterable[tuple[str, list[float]]],
+        metadatas: Optional[list[dict[str, Any]]] = None,
+        ids: Optional[list[str]] = None,
+        **kwargs: Any,
+    ) -> list[str]:
+        """Add precomputed embeddings, logging them if persistence is enabled."""
+        start_row = self.index.ntotal
+        ids = super().add_embeddings(text_embeddings, metadatas, ids, **kwargs)
+        if self.wal is not None:
+            self._log(faiss_wal.record_added(self, start_row, ids))
+        return ids
+
+    def delete(self, ids: Optional[list[str]] = None, **kwargs: Any) -> Optional[bool]:
+        """Delete documents by docstore id, logging the delete if persistence is enabled.
+
+        Raises:
+            ValueError: If the index cannot remove vectors (HNSW).
+        """
+        if ids and not supports_removal(self.index):
+            raise ValueError(
+                "HNSW indexes are rebuild-only and cannot delete documents; re-index "
+                "into a flat index and rebuild with index_graph.build_index instead"
+            )
+        deleted = super().delete(ids, **kwargs)
+        if self.wal is not None and ids:
+            self._log(faiss_wal.WalRecord(op="delete", ids=list(ids)))
+        return deleted
+
+    def _load_metadata_index(self) -> MetadataIndex:
+        path = self.metadata_index_path
+        if path and os.path.exists(path):
+            source = self.metadata_source_path
+            fresh = not source or not os.path.exists(source) or (
+                os.stat(path).st_mtime_ns >= os.stat(source).st_mtime_ns
+            )
+            if fresh:
+                metadata_index = MetadataIndex.load(path)
+                if metadata_index.ntotal == self.index.ntotal and set(
+                    self.metadata_fields
+                ) <= set(metadata_index.columns):
+                    return metadata_index
+        metadata_index = MetadataIndex.build(
+            (self._doc_for_row(row).metadata for row in range(self.index.ntotal)),
+            self.metadata_fields,
+        )
+        if path:
+            metadata_index.save(path)
+        return metadata_index
+
+    def get_metadata_index(self) -> MetadataIndex:
+        """Return the metadata index, loading or building it on first use."""
+        with _metadata_lock:
+            if (
+                self._metadata_index is None
+                or self._metadata_index.ntotal != self.index.ntotal
+            ):
+                self._metadata_index = self._load_metadata_index()
+            return self._metadata_index
+
+    def prefilter_rows(self, filter: Any) -> Optional[np.ndarray]:
+        """Resolve `filter` to the matching FAISS rows, if it can be pre-filtered.
+
+        Only plain {field: value or list of values} dicts over `metadata_fields` are
+        pre-filtered. Anything else, including callables and operator dicts, returns
+        None and is left to LangChain's post-filtering.
+        """
+        if not is_prefilterable(filter, self.metadata_fields):
+            return None
+        return self.get_metadata_index().candidate_rows(filter)
+
+    def query_vectors(self, embeddings: list[list[float]]) -> np.ndarray:
+        """Stack `embeddings` as float32, normalized if the store normalizes vectors."""
+        import faiss
+
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        if self._normalize_L2:
+            faiss.normalize_L2(vectors)
+        return vectors
+
+    def _doc_for_row(self, row: int) -> Document:
+        _id = self.index_to_docstore_id[row]
+        doc = self.docstore.search(_id)
+        if not isinstance(doc, Document):
+            raise ValueError(f"Could not find document for id {_id}, got {doc}")
+        return doc
+
+    def docstore_id(self, row: int) -> str:
+        """Return the docstore id of FAISS row `row`.
+
+        Pickled docstores map rows to ids directly; a packed docstore maps rows to
+        themselves, so the id is read from the decoded document.
+        """
+        _id = self.index_to_docstore_id[row]
+        if isinstance(_id, str):
+            return _id
+        return str(self._doc_for_row(row).id)
+
+    def similarity_search_ids_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        filter: Optional[Union[MetadataFilter, dict[str, Any]]] = None,
+        fetch_k: int = 20,
+    ) -> list[str]:
+        """Return the docstore ids of the `k` nearest documents, best first.
+
+        `filter` is applied as in `similarity_search_with_score_by_vector`: searched
+        within the matching rows when it can be pre-filtered, otherwise applied to the
+        `fetch_k` nearest rows.
+        """
+        vectors = self.query_vectors([embedding])
+        rows = self.prefilter_rows(filter)
+        if rows is not None:
+            _, found = search_rows(self.index, vectors, k, rows)
+            return [self.docstore_id(int(row)) for row in found[0] if row != -1]
+        if filter is None:
+            _, found = self.index.search(vectors, k)
+            return [self.docstore_id(int(row)) for row in found[0] if row != -1]
+
+        matches = self._create_filter_func(filter)
+        _, found = self.index.search(vectors, max(k, fetch_k))
+        ids = []
+        for row in found[0]:
+            if row == -1:
+                continue
+            doc = self._doc_for_row(int(row))
+            if matches(doc.metadata):
+                ids.append(self.docstore_id(int(row)))
+                if len(ids) == k:
+                    break
+        return ids
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        filter: Optional[Union[MetadataFilter, dict[str, Any]]] = None,
+        fetch_k: int = 20,
+        **kwargs: Any,
+    ) -> list[tuple[Document, float]]:
+        """Return docs most similar to `embedding` and their scores.
+
+        A `filter` over the indexed metadata fields restricts the search to matching
+        rows, so up to `k` matches come back however rare they are. Other filters use
+        LangChain's fetch-`fetch_k`-then-filter search.
+        """
+        rows = self.prefilter_rows(filter)
+        if rows is None:
+            return super().similarity_search_with_score_by_vector(
+                embedding, k, filter=filter, fetch_k=fetch_k, **kwargs
+            )
+        scores, ids = search_rows(self.index, self.query_vectors([embedding]), k, rows)
+        docs = [
+            (self._doc_for_row(int(row)), float(score))
+            for score, row in zip(scores[0], ids[0])
+            if row != -1
+        ]
+        score_threshold = kwargs.get("score_threshold")
+        if score_threshold is not None:
+            cmp = (
+                operator.ge
+                if self.distance_strategy
+                in (DistanceStrategy.MAX_INNER_PRODUCT, DistanceStrategy.JACCARD)
+                else operator.le
+            )
+            docs = [(doc, score) for doc, score in docs if cmp(score, score_threshold)]
+        return docs
+
+    def mmr_search_batch_by_vectors(
+        self,
+        embeddings: list[list[float]],
+        *,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        rows: Optional[np.ndarray] = None,
+    ) -> list[list[tuple[Document, float]]]:
+        """Run MMR for several query embeddings with one search over all of them.
+
+        Args:
+            rows (Optional[np.ndarray]): Restrict the candidates to these FAISS rows,
+                as returned by `prefilter_rows`.
+
+        Returns:
+            list[list[tuple[Document, float]]]: Per query, the selected documents and
+                their FAISS scores, in selection order.
+        """
+        queries = self.query_vectors(embeddings)
+        if rows is None:
+            scores, ids, candidates = search_and_reconstruct(self.index, queries, fetch_k)
+        else:
+            scores, ids = search_rows(self.index, queries, fetch_k, rows)
+            candidates = np.zeros((*ids.shape, self.index.d), dtype=np.float32)
+            valid = ids >= 0
+            candidates[valid] = self.index.reconstruct_batch(ids[valid])
+        selected = mmr_select_batch(
+            queries, candidates, k, lambda_mult=lambda_mult, valid=ids >= 0
+        )
+        results = []
+        for query_scores, query_ids, positions in zip(scores, ids, selected):
+            positions = positions[positions >= 0]
+            results.append(
+                [
+                    (self._doc_for_row(int(query_ids[p])), float(query_scores[p]))
+                    for p in positions
+                ]
+            )
+        return results
+
+    def max_marginal_relevance_search_with_score_by_vector(
+        self,
+        embedding: list[float],
+        *,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Union[MetadataFilter, dict[str, Any]]] = None,
+    ) -> list[tuple[Document, float]]:
+        """Return docs and scores selected by maximal marginal relevance.
+
+        Unfiltered and pre-filterable searches use the vectorized selection; other
+        metadata filters defer to LangChain's implementation.
+        """
+        rows = self.prefilter_rows(filter)
+        if filter is not None and rows is None:
+            return super().max_marginal_relevance_search_with_score_by_vector(
+                embedding, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, filter=filter
+            )
+        try:
+            return self.mmr_search_batch_by_vectors(
+                [embedding], k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, rows=rows
+            )[0]
+        except RuntimeError:
+            # The index cannot reconstruct the pre-filtered candidates (IVF without a
+            # direct map), so fall back to post-filtering.
+            return super().max_marginal_relevance_search_with_score_by_vector(
+                embedding, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, filter=filter
+            )
+
+    async def asimilarity_search_with_score_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        filter: Optional[Union[MetadataFilter, dict[str, Any]]] = None,
+        fetch_k: int = 20,
+        **kwargs: Any,
+    ) -> list[tuple[Document, float]]:
+        """Run `similarity_search_with_score_by_vector` on the search pool."""
+        if self.search_pool is None:
+            return await super().asimilarity_search_with_score_by_vector(
+                embedding, k, filter=filter, fetch_k=fetch_k, **kwargs
+            )
+        return await self.search_pool.run(
+            self.similarity_search_with_score_by_vector,
+            embedding,
+            k,
+            filter=filter,
+            fetch_k=fetch_k,
+            **kwargs,
+        )
+
+    async def amax_marginal_relevance_search_with_score_by_vector(
+        self,
+        embedding: list[float],
+        *,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Union[MetadataFilter, dict[str, Any]]] = None,
+    ) -> list[tuple[Document, float]]:
+        """Run `max_marginal_relevance_search_with_score_by_vector` on the search pool."""
+        if self.search_pool is None:
+            return await super().amax_marginal_relevance_search_with_score_by_vector(
+                embedding, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, filter=filter
+            )
+        return await self.search_pool.run(
+            self.max_marginal_relevance_search_with_score_by_vector,
+            embedding,
+            k=k,
+            fetch_k=fetch_k,
+            lambda_mult=lambda_mult,
+            filter=filter,
+        )
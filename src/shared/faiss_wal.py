@@ -0,0 +1,379 @@
+"""Append-only persistence for writes to a local FAISS store.
+
+Documents added through a writable FAISS retriever used to live only in memory. Now
+every add or delete is appended to `<index_name>.wal` next to the index as one framed
+record holding the vectors and docstore entries, and fsynced before the call returns,
+so the I/O of a write is proportional to what was written rather than to the index.
+
+Loading a store replays the log on top of the base `.faiss`/`.pkl` files. Once the
+log grows past a threshold it is compacted into those files:
+
+1. the new base files are written to `*.compact` siblings and fsynced;
+2. the `<index_name>.compact` marker is created, committing the compaction;
+3. each `*.compact` file is renamed over its target;
+4. the log is replaced with an empty one and the marker removed.
+
+A crash before step 2 leaves the old base and log untouched (the partial files are
+discarded on the next writable open); a crash after it is rolled forward by
+`recover_compaction`. A torn record at the end of the log, from a crash mid-append, is
+ignored on replay and cut off before the next append.
+
+Writers serialize on `<index_name>.lock`: recovery, every append and every compaction
+run under its exclusive lock, and before appending or compacting a writer first
+applies the records other writers logged since it last looked (reloading the base
+files if another writer compacted them). Readers hold the lock shared while they read
+the files, so they never see a compaction half done, and never recover one
+themselves. On platforms without `fcntl` no lock is taken.
+
+Log records are framed as `length (uint32) | crc32 (uint32) | msgpack payload`.
+"""
+
+import os
+import pickle
+import struct
+import zlib
+from contextlib import contextmanager
+from types import ModuleType
+from typing import TYPE_CHECKING, Any, Iterable, Iterator, Literal, Optional, cast
+
+import msgspec
+import numpy as np
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_core.documents import Document
+
+fcntl: Optional[ModuleType]
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+if TYPE_CHECKING:
+    from shared.faiss_store import FaissStore
+
+_FRAME = struct.Struct("<II")
+COMPACT_SUFFIX = "compact"
+LOCK_SUFFIX = "lock"
+
+
+class _WalDocument(msgspec.Struct, array_like=True):
+    id: str
+    page_content: str
+    metadata: dict[str, Any]
+
+
+class WalRecord(msgspec.Struct, array_like=True):
+    """One logged write: documents added with their vectors, or ids deleted."""
+
+    op: Literal["add", "delete"]
+    ids: list[str]
+    vectors: bytes = b""
+    """float32 vectors of the added documents, row-major, `dim` values per row."""
+    dim: int = 0
+    documents: list[_WalDocument] = msgspec.field(default_factory=list)
+
+
+def _fsync_dir(path: str) -> None:
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _durable_write(path: str, data: bytes) -> None:
+    with open(path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+class WriteAheadLog:
+    """The `<index_name>.wal` file of a FAISS index folder."""
+
+    def __init__(self, path: str) -> None:
+        """Use the log at `path`; it is created on the first append."""
+        self.path = path
+        self._encoder = msgspec.msgpack.Encoder()
+        self._decoder = msgspec.msgpack.Decoder(WalRecord)
+        self._end: Optional[int] = None
+
+    @property
+    def size(self) -> int:
+        """Size of the log in bytes, 0 if it does not exist."""
+        try:
+            return os.path.getsize(self.path)
+        except FileNotFoundError:
+            return 0
+
+    def scan(self, start: int = 0) -> Iterator[tuple[int, WalRecord]]:
+        """Yield (end offset, record) for every intact record from the record at `start`.
+
+        Scanning stops at a torn tail.
+        """
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            data = f.read()
+        offset = 0
+        while offset + _FRAME.size <= len(data):
+            length, crc = _FRAME.unpack_from(data, offset)
+            payload_start = offset + _FRAME.size
+            payload = data[payload_start : payload_start + length]
+            if len(payload) < length or zlib.crc32(payload) != crc:
+                return
+            offset = payload_start + length
+            yield start + offset, self._decoder.decode(payload)
+
+    def records(self) -> Iterator[WalRecord]:
+        """Yield the intact records in append order."""
+        for _, record in self.scan():
+            yield record
+
+    def cut(self, end: int) -> None:
+        """Drop anything after `end`, the end of the last intact record, and append there."""
+        if self.size > end:
+            with open(self.path, "r+b") as f:
+                f.truncate(end)
+        self._end = end
+
+    def append(self, record: WalRecord) -> int:
+        """Durably append `record` and return the log's new end offset.
+
+        Unless `cut` was called, the first append through this instance scans the log
+        once and cuts off any torn tail; later appends only write the new record.
+        """
+        end = self._end
+        if end is None:
+            end = 0
+            for end, _ in self.scan():
+                pass
+            self.cut(end)
+        payload = self._encoder.encode(record)
+        created = not os.path.exists(self.path)
+        with open(self.path, "ab") as f:
+            f.write(_FRAME.pack(len(payload), zlib.crc32(payload)))
+            f.write(payload)
+            f.flush()
+            os.fsync(f.fileno())
+        self._end = end + _FRAME.size + len(payload)
+        if created:
+            _fsync_dir(self.path)
+        return self._end
+
+    def reset(self) -> None:
+        """Atomically replace the log with an empty one."""
+        tmp_path = f"{self.path}.tmp"
+        _durable_write(tmp_path, b"")
+        os.replace(tmp_path, self.path)
+        _fsync_dir(self.path)
+        self._end = 0
+
+
+def wal_path(folder_path: str, index_name: str) -> str:
+    """Return the path of the log of the index `index_name` in `folder_path`."""
+    return os.path.join(folder_path, f"{index_name}.wal")
+
+
+def _base_files(folder_path: str, index_name: str) -> list[str]:
+    return [
+        os.path.join(folder_path, f"{index_name}.{ext}") for ext in ("faiss", "pkl", "docs")
+    ]
+
+
+def _marker_path(folder_path: str, index_name: str) -> str:
+    return os.path.join(folder_path, f"{index_name}.{COMPACT_SUFFIX}")
+
+
+@contextmanager
+def index_lock(folder_path: str, index_name: str, shared: bool = False) -> Iterator[None]:
+    """Hold the lock of the index `index_name` in `folder_path`.
+
+    Writers take it exclusively; readers take it `shared`. A reader that cannot create
+    the lock file, e.g. in a read-only folder that no writer can use either, reads
+    without it. The lock is not reentrant: never nest two `index_lock` blocks.
+    """
+    path = os.path.join(folder_path, f"{index_name}.{LOCK_SUFFIX}")
+    try:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    except OSError:
+        if not shared:
+            raise
+        yield
+        return
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        os.close(fd)  # releases the lock
+
+
+def compaction_pending(folder_path: str, index_name: str) -> bool:
+    """Whether a committed compaction still has to be rolled forward."""
+    return os.path.exists(_marker_path(folder_path, index_name))
+
+
+BaseSignature = tuple[Optional[tuple[int, int, int]], ...]
+"""(inode, mtime, size) of each base file, None for a missing one."""
+
+
+def base_signature(folder_path: str, index_name: str) -> BaseSignature:
+    """Identify the current base files; a compaction replaces them and changes it."""
+    signature: list[Optional[tuple[int, int, int]]] = []
+    for path in _base_files(folder_path, index_name)[:2]:
+        try:
+            stat = os.stat(path)
+            signature.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+        except FileNotFoundError:
+            signature.append(None)
+    return tuple(signature)
+
+
+def index_version(folder_path: str, index_name: str) -> str:
+    """Identify the current contents of an index: its base files and log length.
+
+    Every logged write and every compaction changes it.
+    """
+    wal = WriteAheadLog(wal_path(folder_path, index_name))
+    return repr((base_signature(folder_path, index_name), wal.size))
+
+
+def recover_compaction(
+    folder_path: str, index_name: str, wal: Optional[WriteAheadLog] = None
+) -> None:
+    """Finish or discard a compaction interrupted by a crash.
+
+    Only writers may call this, holding the exclusive `index_lock`: discarding staged
+    files would otherwise destroy a compaction in progress. `wal` is the open log of
+    the index, if any, so its state follows the reset.
+    """
+    marker = _marker_path(folder_path, index_name)
+    committed = os.path.exists(marker)
+    for path in _base_files(folder_path, index_name):
+        staged = f"{path}.{COMPACT_SUFFIX}"
+        if os.path.exists(staged):
+            if committed:
+                os.replace(staged, path)
+            else:
+                os.remove(staged)
+    if committed:
+        (wal or WriteAheadLog(wal_path(folder_path, index_name))).reset()
+        os.remove(marker)
+        _fsync_dir(marker)
+
+
+def record_added(vstore: "FaissStore", start_row: int, ids: list[str]) -> WalRecord:
+    """Describe the rows `start_row:` that an add just appended to `vstore`."""
+    vectors = vstore.index.reconstruct_n(start_row, vstore.index.ntotal - start_row)
+    documents = []
+    for row, doc_id in enumerate(ids, start=start_row):
+        doc = vstore._doc_for_row(row)
+        documents.append(_WalDocument(doc_id, doc.page_content, doc.metadata or {}))
+    return WalRecord(
+        op="add",
+        ids=list(ids),
+        vectors=np.ascontiguousarray(vectors, dtype=np.float32).tobytes(),
+        dim=vstore.index.d,
+        documents=documents,
+    )
+
+
+def apply_records(vstore: "FaissStore", records: Iterable[WalRecord]) -> int:
+    """Apply logged writes to an in-memory `vstore`, without logging them again.
+
+    Adds of ids `vstore` already holds and deletes of ids it lacks are skipped, so
+    writes another writer also made, or that a reload already contains, apply cleanly.
+
+    Returns:
+        int: The number of records applied.
+    """
+    from langchain_community.vectorstores import FAISS
+
+    present = set(vstore.index_to_docstore_id.values())
+    applied = 0
+    for record in records:
+        applied += 1
+        if record.op == "add":
+            keep = [j for j, doc_id in enumerate(record.ids) if doc_id not in present]
+            if not keep:
+                continue
+            vectors = np.frombuffer(record.vectors, dtype=np.float32).reshape(-1, record.dim)
+            start_row = len(vstore.index_to_docstore_id)
+            vstore.index.add(np.ascontiguousarray(vectors[keep]))
+            cast(InMemoryDocstore, vstore.docstore).add(
+                {
+                    doc.id: Document(id=doc.id, page_content=doc.page_content, metadata=doc.metadata)
+                    for doc in (record.documents[j] for j in keep)
+                }
+            )
+            vstore.index_to_docstore_id.update(
+                {start_row + i: record.ids[j] for i, j in enumerate(keep)}
+            )
+            present.update(record.ids[j] for j in keep)
+        else:
+            ids = [doc_id for doc_id in record.ids if doc_id in present]
+            if ids:
+                # Bypass FaissStore.delete, which would log the delete again.
+                FAISS.delete(vstore, ids)
+                present.difference_update(ids)
+    return applied
+
+
+def replay(vstore: "FaissStore", wal: WriteAheadLog, start: int = 0) -> tuple[int, int]:
+    """Apply the records of `wal` from offset `start` to an in-memory `vstore`.
+
+    Returns:
+        tuple[int, int]: The number of records applied and the end offset of the last
+            intact record.
+    """
+    end = start
+
+    def records() -> Iterator[WalRecord]:
+        nonlocal end
+        for end, record in wal.scan(start):
+            yield record
+
+    applied = apply_records(vstore, records())
+    return applied, end
+
+
+def compact(
+    vstore: "FaissStore", folder_path: str, index_name: str, wal: WriteAheadLog
+) -> None:
+    """Rewrite the base files of `folder_path` from `vstore` and empty `wal`.
+
+    The caller must hold the exclusive `index_lock`, and `vstore` must hold the base
+    files plus every record of `wal`. A packed docstore
+    (`.docs`) is rewritten too when one exists, so packed readers stay in sync.
+    """
+    import faiss
+
+    from shared.docstore import write_packed_docstore
+
+    faiss_path, pkl_path, docs_path = _base_files(folder_path, index_name)
+    staged = []
+
+    faiss.write_index(vstore.index, f"{faiss_path}.{COMPACT_SUFFIX}")
+    staged.append(f"{faiss_path}.{COMPACT_SUFFIX}")
+    _durable_write(
+        f"{pkl_path}.{COMPACT_SUFFIX}",
+        pickle.dumps((vstore.docstore, vstore.index_to_docstore_id)),
+    )
+    staged.append(f"{pkl_path}.{COMPACT_SUFFIX}")
+    if os.path.exists(docs_path):
+        write_packed_docstore(
+            f"{docs_path}.{COMPACT_SUFFIX}",
+            (
+                (vstore.docstore_id(row), vstore._doc_for_row(row))
+                for row in range(vstore.index.ntotal)
+            ),
+        )
+        staged.append(f"{docs_path}.{COMPACT_SUFFIX}")
+    for path in staged:
+        with open(path, "rb+") as f:
+            os.fsync(f.fileno())
+
+    _durable_write(os.path.join(folder_path, f"{index_name}.{COMPACT_SUFFIX}"), b"")
+    _fsync_dir(faiss_path)
+    recover_compaction(folder_path, index_name, wal)
@@ -0,0 +1,236 @@
+"""Hybrid lexical + dense retriever.
+
+`HybridRetriever` ranks documents twice, once by vector similarity in the FAISS store
+and once by BM25 over the local `LexicalIndex`, and merges both rankings with
+reciprocal-rank fusion. Exact tokens such as tickers or fiscal years that dense search
+misses still surface through the lexical ranking.
+"""
+
+import asyncio
+import os
+import threading
+from contextlib import contextmanager
+from typing import Any, Iterator, Optional, Union, cast
+
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun,
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict, SkipValidation
+
+from shared import faiss_wal
+from shared.faiss_store import FaissStore, MetadataFilter
+from shared.lexical import (
+    MANIFEST_NAME,
+    LexicalIndex,
+    manifest_source_version,
+    reciprocal_rank_fusion,
+)
+from shared.retrieval import FAISS_INDEX_NAME
+from shared.store_registry import StoreRegistry
+
+LEXICAL_DIR = "lexical"
+"""Folder, inside the FAISS index folder, that holds the lexical index."""
+
+lexical_indexes = StoreRegistry()
+"""Registry of read-only lexical indexes, reloaded when their manifest changes."""
+
+_build_lock = threading.Lock()
+
+
+def build_lexical_index(
+    vstore: FaissStore, path: str, source_version: str = ""
+) -> LexicalIndex:
+    """Create the lexical index at `path` from every document in `vstore`.
+
+    An existing index at `path` is replaced.
+    """
+    index = LexicalIndex.open(path)
+    index.rebuild(
+        (
+            (vstore.docstore_id(row), vstore._doc_for_row(row).page_content)
+            for row in range(vstore.index.ntotal)
+        ),
+        source_version,
+    )
+    return index
+
+
+def _ensure_current(vstore: FaissStore, folder_path: str) -> str:
+    """Rebuild the lexical index unless it matches the current FAISS files.
+
+    Must run under the exclusive lexical lock. Returns the lexical index path.
+    """
+    path = os.path.join(os.path.abspath(folder_path), LEXICAL_DIR)
+    if manifest_source_version(path) != faiss_wal.index_version(
+        folder_path, FAISS_INDEX_NAME
+    ):
+        vstore.refresh()
+        build_lexical_index(
+            vstore, path, faiss_wal.index_version(folder_path, FAISS_INDEX_NAME)
+        )
+    return path
+
+
+def open_lexical_index(
+    vstore: FaissStore, folder_path: str, shared: bool = True
+) -> LexicalIndex:
+    """Open the lexical index stored next to the FAISS index in `folder_path`.
+
+    Its manifest records the `faiss_wal.index_version` it was written against. The
+    index is built from `vstore` the first time, and rebuilt when the FAISS files
+    changed without it, e.g. after indexing with the plain "faiss" provider. Shared
+    indexes come from `lexical_indexes` and must not be written to; pass
+    `shared=False` to get a private instance for indexing.
+    """
+    path = os.path.join(os.path.abspath(folder_path), LEXICAL_DIR)
+    manifest_path = os.path.join(path, MANIFEST_NAME)
+    if manifest_source_version(path) != faiss_wal.index_version(
+        folder_path, FAISS_INDEX_NAME
+    ):
+        with _build_lock, faiss_wal.index_lock(folder_path, LEXICAL_DIR):
+            _ensure_current(vstore, folder_path)
+    if not shared:
+        return LexicalIndex.open(path)
+    return cast(
+        LexicalIndex,
+        lexical_indexes.get(path, [manifest_path], lambda: LexicalIndex.open(path)),
+    )
+
+
+class HybridRetriever(BaseRetriever):
+    """Fuse dense FAISS and BM25 rankings with reciprocal-rank fusion."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vectorstore: FaissStore
+    lexical: SkipValidation[LexicalIndex]
+    k: int = 4
+    """Number of fused documents to return."""
+    fetch_k: int = 20
+    """Number of candidates taken from each ranking before fusion."""
+    rrf_k: int = 60
+    """Reciprocal-rank fusion constant; larger values flatten the rank weighting."""
+    filter: Optional[Union[MetadataFilter, dict[str, Any]]] = None
+    """Metadata filter both rankings are restricted to, as in FAISS `search_kwargs`."""
+    folder_path: Optional[str] = None
+    """FAISS index folder; writes then keep the lexical index in step with its files."""
+
+    def _lexical_ids(self, query: str) -> list[str]:
+        if self.filter is None:
+            return [doc_id for doc_id, _ in self.lexical.search(query, self.fetch_k)]
+        # Rank every lexical match, then keep the first `fetch_k` that pass the filter.
+        rows = self.vectorstore.prefilter_rows(self.filter)
+        allowed: Optional[set[str]] = None
+        if rows is not None:
+            allowed = {self.vectorstore.docstore_id(int(row)) for row in rows}
+        metadata_matches = self.vectorstore._create_filter_func(self.filter)
+
+        def matches(doc_id: str) -> bool:
+            if allowed is not None:
+                return doc_id in allowed
+            doc = self.vectorstore.docstore.search(doc_id)
+            return isinstance(doc, Document) and metadata_matches(doc.metadata)
+
+        ids = []
+        for doc_id, _ in self.lexical.search(query, len(self.lexical)):
+            if matches(doc_id):
+                ids.append(doc_id)
+                if len(ids) == self.fetch_k:
+                    break
+        return ids
+
+    def _fuse(self, query: str, embedding: list[float]) -> list[Document]:
+        dense_ids = self.vectorstore.similarity_search_ids_by_vector(
+            embedding, self.fetch_k, filter=self.filter, fetch_k=4 * self.fetch_k
+        )
+        lexical_ids = self._lexical_ids(query)
+        docs = []
+        for doc_id, _ in reciprocal_rank_fusion([dense_ids, lexical_ids], k=self.rrf_k):
+            doc = self.vectorstore.docstore.search(doc_id)
+            # Ids indexed lexically but missing from the store are skipped.
+            if isinstance(doc, Document):
+                docs.append(doc)
+                if len(docs) == self.k:
+                    break
+        return docs
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        return self._fuse(query, self.vectorstore.embedding_model.embed_query(query))
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> list[Document]:
+        embedding = await self.vectorstore.embedding_model.aembed_query(query)
+        pool = self.vectorstore.search_pool
+        if pool is None:
+            return await asyncio.to_thread(self._fuse, query, embedding)
+        return await pool.run(self._fuse, query, embedding)
+
+    @contextmanager
+    def _writing(self) -> Iterator[None]:
+        """Hold the lexical lock around a write and stamp the resulting FAISS version.
+
+        Another process may have rebuilt or extended the lexical index since it was
+        opened, so it is brought up to date first.
+        """
+        if self.folder_path is None:
+            yield
+            return
+        with faiss_wal.index_lock(self.folder_path, LEXICAL_DIR):
+            path = _ensure_current(self.vectorstore, self.folder_path)
+            if self.lexical.source_version != manifest_source_version(path):
+                self.lexical = LexicalIndex.open(path)
+            yield
+            version = faiss_wal.index_version(self.folder_path, FAISS_INDEX_NAME)
+            self.lexical.stamp(version)
+
+    def add_documents(self, documents: list[Document], **kwargs: Any) -> list[str]:
+        """Add documents to the vector store and the lexical index."""
+        with self._writing():
+            ids = self.vectorstore.add_documents(documents, **kwargs)
+            self.lexical.add_documents(zip(ids, (d.page_content for d in documents)))
+        return ids
+
+    async def aadd_documents(self, documents: list[Document], **kwargs: Any) -> list[str]:
+        """Asynchronously add documents to the vector store and the lexical index.
+
+        Documents are embedded asynchronously; both writes then run in a thread.
+        """
+        texts = [d.page_content for d in documents]
+        embeddings = await self.vectorstore.embedding_model.aembed_documents(texts)
+        ids = kwargs.pop("ids", None) or [d.id for d in documents]
+        return await asyncio.to_thread(
+            self.add_embeddings,
+            list(zip(texts, embeddings)),
+            metadatas=[d.metadata for d in documents],
+            ids=ids if any(ids) else None,
+        )
+
+    def add_embeddings(
+        self,
+        text_embeddings: list[tuple[str, list[float]]],
+        metadatas: Optional[list[dict[str, Any]]] = None,
+        ids: Optional[list[str]] = None,
+    ) -> list[str]:
+        """Add precomputed embeddings to the vector store and their texts lexically."""
+        with self._writing():
+            ids = self.vectorstore.add_embeddings(
+                text_embeddings, metadatas=metadatas, ids=ids
+            )
+            self.lexical.add_documents(zip(ids, (text for text, _ in text_embeddings)))
+        return ids
+
+    def delete(self, ids: list[str]) -> None:
+        """Delete documents from the vector store and the lexical index."""
+        with self._writing():
+            self.vectorstore.delete(ids)
+            self.lexical.delete(ids)
+
+    async def adelete(self, ids: list[str]) -> None:
+        """Asynchronously delete documents from both indexes."""
+        await asyncio.to_thread(self.delete, ids)
@@ -0,0 +1,413 @@
+"""Local BM25 inverted index for exact-token retrieval.
+
+Dense search misses exact tokens such as tickers, line-item names and fiscal years.
+`LexicalIndex` keeps a BM25 index over the same documents as the vector store, keyed
+by docstore id, so its rankings can be fused with the dense ones.
+
+The index is a list of immutable segments. Each segment holds its postings in CSR
+form: a term's postings are the slice `offsets[t]:offsets[t + 1]` of two flat arrays
+of document positions and term frequencies. Scoring a query gathers the postings of
+its terms and accumulates BM25 weights with `np.bincount`, so cost scales with the
+postings touched rather than with the number of documents.
+
+On disk a segment is one `.npz` file and `manifest.json` lists the live segments,
+deleted ids and the source version stamped by the last writer. Adding documents writes a new segment; `compact` merges segments and
+drops deleted documents. Every file is written to a temporary name and renamed.
+"""
+
+import os
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+import msgspec
+import numpy as np
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[.\-'][a-z0-9]+)*")
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this "
+    "to was were which will with".split()
+)
+
+MANIFEST_NAME = "manifest.json"
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercase `text` and split it into tokens, keeping forms like '10-k' and 'fy2023'."""
+    return [token for token in _TOKEN.findall(text.lower()) if token not in STOPWORDS]
+
+
+def _pack_strings(strings: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    encoded = [s.encode() for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(s) for s in encoded], out=offsets[1:])
+    return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+
+
+def _unpack_strings(blob: np.ndarray, offsets: np.ndarray) -> list[str]:
+    data = blob.tobytes()
+    return [data[offsets[i] : offsets[i + 1]].decode() for i in range(len(offsets) - 1)]
+
+
+def _csr(
+    vocab: list[str], term_ids: np.ndarray, docs: np.ndarray, tfs: np.ndarray
+) -> tuple[dict[str, int], np.ndarray, np.ndarray, np.ndarray]:
+    """Group (term, doc, tf) postings by term, dropping terms without postings."""
+    counts = np.bincount(term_ids, minlength=len(vocab))
+    used = counts > 0
+    remap = np.cumsum(used) - 1
+    term_ids = remap[term_ids]
+    order = np.lexsort((docs, term_ids))
+    offsets = np.zeros(int(used.sum()) + 1, dtype=np.int64)
+    np.cumsum(counts[used], out=offsets[1:])
+    terms = {term: i for i, term in enumerate(t for t, u in zip(vocab, used) if u)}
+    return (
+        terms,
+        offsets,
+        docs[order].astype(np.int32),
+        np.minimum(tfs[order], 65535).astype(np.uint16),
+    )
+
+
+@dataclass
+class Segment:
+    """An immutable batch of documents with CSR postings."""
+
+    doc_ids: np.ndarray
+    doc_lens: np.ndarray
+    terms: dict[str, int]
+    offsets: np.ndarray
+    postings_docs: np.ndarray
+    postings_tfs: np.ndarray
+    live: np.ndarray = field(default_factory=lambda: np.zeros(0, dtype=bool))
+
+    def __post_init__(self) -> None:
+        """Mark every document live unless a mask was given."""
+        if len(self.live) != len(self.doc_ids):
+            self.live = np.ones(len(self.doc_ids), dtype=bool)
+
+    @classmethod
+    def build(cls, docs: Iterable[tuple[str, str]]) -> "Segment":
+        """Build a segment from (docstore id, text) pairs."""
+        doc_ids, doc_lens = [], []
+        vocab: dict[str, int] = {}
+        term_ids: list[int] = []
+        positions: list[int] = []
+        tfs: list[int] = []
+        for position, (doc_id, text) in enumerate(docs):
+            tokens = tokenize(text)
+            doc_ids.append(doc_id)
+            doc_lens.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                positions.append(position)
+                tfs.append(tf)
+        terms, offsets, postings_docs, postings_tfs = _csr(
+            list(vocab),
+            np.asarray(term_ids, dtype=np.int64),
+            np.asarray(positions, dtype=np.int64),
+            np.asarray(tfs, dtype=np.int64),
+        )
+        return cls(
+            doc_ids=np.asarray(doc_ids, dtype=object),
+            doc_lens=np.asarray(doc_lens, dtype=np.int32),
+            terms=terms,
+            offsets=offsets,
+            postings_docs=postings_docs,
+            postings_tfs=postings_tfs,
+        )
+
+    @classmethod
+    def merge(cls, segments: list["Segment"]) -> "Segment":
+        """Merge segments into one, keeping only their live documents."""
+        vocab = sorted(set().union(*(s.terms for s in segments)))
+        global_ids = {term: i for i, term in enumerate(vocab)}
+        doc_ids, doc_lens, term_ids, docs, tfs = [], [], [], [], []
+        base = 0
+        for s in segments:
+            new_position = np.cumsum(s.live) - 1 + base
+            local_terms = sorted(s.terms, key=s.terms.__getitem__)
+            local_to_global = np.asarray(
+                [global_ids[t] for t in local_terms], dtype=np.int64
+            )
+            posting_terms = np.repeat(local_to_global, np.diff(s.offsets))
+            keep = s.live[s.postings_docs]
+            term_ids.append(posting_terms[keep])
+            docs.append(new_position[s.postings_docs[keep]])
+            tfs.append(s.postings_tfs[keep].astype(np.int64))
+            doc_ids.append(s.doc_ids[s.live])
+            doc_lens.append(s.doc_lens[s.live])
+            base += int(s.live.sum())
+        terms, offsets, postings_docs, postings_tfs = _csr(
+            vocab,
+            np.concatenate(term_ids) if term_ids else np.zeros(0, dtype=np.int64),
+            np.concatenate(docs) if docs else np.zeros(0, dtype=np.int64),
+            np.concatenate(tfs) if tfs else np.zeros(0, dtype=np.int64),
+        )
+        return cls(
+            doc_ids=np.concatenate(doc_ids) if doc_ids else np.zeros(0, dtype=object),
+            doc_lens=np.concatenate(doc_lens) if doc_lens else np.zeros(0, dtype=np.int32),
+            terms=terms,
+            offsets=offsets,
+            postings_docs=postings_docs,
+            postings_tfs=postings_tfs,
+        )
+
+    def mark_deleted(self, doc_ids: set[str]) -> None:
+        """Clear the live flag of any of `doc_ids` stored in this segment."""
+        if doc_ids:
+            self.live &= ~np.fromiter(
+                (doc_id in doc_ids for doc_id in self.doc_ids),
+                dtype=bool,
+                count=len(self.doc_ids),
+            )
+
+    def postings(self, term: str) -> tuple[np.ndarray, np.ndarray]:
+        """Return the (document positions, term frequencies) of `term`."""
+        i = self.terms.get(term)
+        if i is None:
+            return self.postings_docs[:0], self.postings_tfs[:0]
+        start, end = self.offsets[i], self.offsets[i + 1]
+        return self.postings_docs[start:end], self.postings_tfs[start:end]
+
+    def save(self, path: str) -> None:
+        """Write the segment to `path` (an .npz file) atomically."""
+        terms = sorted(self.terms, key=self.terms.__getitem__)
+        terms_blob, terms_offsets = _pack_strings(terms)
+        ids_blob, ids_offsets = _pack_strings(list(self.doc_ids))
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(
+            tmp_path,
+            doc_lens=self.doc_lens,
+            offsets=self.offsets,
+            postings_docs=self.postings_docs,
+            postings_tfs=self.postings_tfs,
+            terms_blob=terms_blob,
+            terms_offsets=terms_offsets,
+            ids_blob=ids_blob,
+            ids_offsets=ids_offsets,
+        )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "Segment":
+        """Read a segment written by `save`."""
+        with np.load(path) as data:
+            terms = _unpack_strings(data["terms_blob"], data["terms_offsets"])
+            return cls(
+                doc_ids=np.asarray(
+                    _unpack_strings(data["ids_blob"], data["ids_offsets"]), dtype=object
+                ),
+                doc_lens=data["doc_lens"],
+                terms={term: i for i, term in enumerate(terms)},
+                offsets=data["offsets"],
+                postings_docs=data["postings_docs"],
+                postings_tfs=data["postings_tfs"],
+            )
+
+
+class _Manifest(msgspec.Struct):
+    version: int = 1
+    next_segment: int = 0
+    segments: list[str] = msgspec.field(default_factory=list)
+    deleted: list[str] = msgspec.field(default_factory=list)
+    source_version: str = ""
+    """Version of the documents the index was last written against; see `stamp`."""
+
+
+def manifest_source_version(path: str) -> Optional[str]:
+    """Return the `source_version` of the index in `path`, or None if there is none."""
+    try:
+        with open(os.path.join(path, MANIFEST_NAME), "rb") as f:
+            return msgspec.json.decode(f.read(), type=_Manifest).source_version
+    except FileNotFoundError:
+        return None
+
+
+@dataclass
+class LexicalIndex:
+    """A BM25 index made of on-disk segments, searched with vectorized scoring."""
+
+    path: Optional[str] = None
+    k1: float = 1.2
+    b: float = 0.75
+    segments: list[Segment] = field(default_factory=list)
+    deleted: set[str] = field(default_factory=set)
+    _manifest: _Manifest = field(default_factory=_Manifest)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    @classmethod
+    def open(cls, path: str) -> "LexicalIndex":
+        """Open the index stored in the directory `path`, creating it if missing."""
+        os.makedirs(path, exist_ok=True)
+        index = cls(path=path)
+        manifest_path = os.path.join(path, MANIFEST_NAME)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, "rb") as f:
+                index._manifest = msgspec.json.decode(f.read(), type=_Manifest)
+            index.segments = [
+                Segment.load(os.path.join(path, name))
+                for name in index._manifest.segments
+            ]
+            index.deleted = set(index._manifest.deleted)
+            # Newer segments supersede older copies of the same id.
+            superseded: set[str] = set()
+            for segment in reversed(index.segments):
+                segment.mark_deleted(index.deleted | superseded)
+                superseded.update(segment.doc_ids)
+        return index
+
+    def __len__(self) -> int:
+        """Return the number of live documents."""
+        return sum(int(s.live.sum()) for s in self.segments)
+
+    @property
+    def source_version(self) -> str:
+        """Version of the documents the index was last written against."""
+        return self._manifest.source_version
+
+    def stamp(self, source_version: str) -> None:
+        """Record that the index holds the documents of `source_version` and persist it.
+
+        The version is opaque to the index; callers use it to notice documents that
+        changed without going through the index.
+        """
+        with self._lock:
+            self._manifest.source_version = source_version
+            self._write_manifest()
+
+    def _write_manifest(self) -> None:
+        if self.path is None:
+            return
+        self._manifest.deleted = sorted(self.deleted)
+        manifest_path = os.path.join(self.path, MANIFEST_NAME)
+        with open(f"{manifest_path}.tmp", "wb") as f:
+            f.write(msgspec.json.encode(self._manifest))
+        os.replace(f"{manifest_path}.tmp", manifest_path)
+
+    def _append_segment(self, segment: Segment) -> None:
+        self.segments.append(segment)
+        if self.path is None:
+            return
+        name = f"seg-{self._manifest.next_segment:06d}.npz"
+        self._manifest.next_segment += 1
+        segment.save(os.path.join(self.path, name))
+        self._manifest.segments.append(name)
+
+    def add_documents(self, docs: Iterable[tuple[str, str]]) -> int:
+        """Index (docstore id, text) pairs as a new segment and persist it.
+
+        Re-adding an id replaces the previously indexed text for it.
+
+        Returns:
+            int: The number of documents added.
+        """
+        segment = Segment.build(docs)
+        if not len(segment.doc_ids):
+            return 0
+        with self._lock:
+            # A re-added id supersedes its older copies.
+            added = set(segment.doc_ids)
+            for older in self.segments:
+                older.mark_deleted(added)
+            self.deleted.difference_update(added)
+            self._append_segment(segment)
+            self._write_manifest()
+        return len(segment.doc_ids)
+
+    def delete(self, doc_ids: Iterable[str]) -> None:
+        """Mark documents as deleted; they are dropped for good by `compact`."""
+        doc_ids = set(doc_ids)
+        with self._lock:
+            for segment in self.segments:
+                segment.mark_deleted(doc_ids)
+            self.deleted.update(doc_ids)
+            self._write_manifest()
+
+    def _replace_segments(self, segment: Segment) -> None:
+        old_names = list(self._manifest.segments)
+        self.segments, self._manifest.segments = [], []
+        self.deleted = set()
+        if len(segment.doc_ids):
+            self._append_segment(segment)
+        self._write_manifest()
+        if self.path is not None:
+            for name in old_names:
+                os.remove(os.path.join(self.path, name))
+
+    def compact(self) -> None:
+        """Merge all segments into one, dropping deleted and superseded documents."""
+        with self._lock:
+            self._replace_segments(Segment.merge(self.segments))
+
+    def rebuild(self, docs: Iterable[tuple[str, str]], source_version: str = "") -> None:
+        """Replace the whole index with the (docstore id, text) pairs in `docs`."""
+        segment = Segment.build(docs)
+        with self._lock:
+            self._manifest.source_version = source_version
+            self._replace_segments(segment)
+
+    def search(self, query: str, k: int = 10) -> list[tuple[str, float]]:
+        """Return the top `k` (docstore id, BM25 score) pairs for `query`."""
+        terms = list(dict.fromkeys(tokenize(query)))
+        segments = self.segments
+        if not terms or not segments:
+            return []
+
+        # Like Lucene, corpus statistics include deleted documents until `compact`.
+        n_docs = sum(len(s.doc_ids) for s in segments)
+        avgdl = max(sum(float(s.doc_lens.sum()) for s in segments) / n_docs, 1.0)
+        postings = [[s.postings(term) for term in terms] for s in segments]
+        df = np.sum([[len(docs) for docs, _ in seg] for seg in postings], axis=0)
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+
+        candidate_ids: list[np.ndarray] = []
+        candidate_scores: list[np.ndarray] = []
+        for segment, segment_postings in zip(segments, postings):
+            norm = self.k1 * (1 - self.b + self.b * segment.doc_lens / avgdl)
+            accumulated = np.zeros(len(segment.doc_ids), dtype=np.float32)
+            for term_idf, (docs, tfs) in zip(idf, segment_postings):
+                if len(docs):
+                    tf = tfs.astype(np.float32)
+                    weights = term_idf * tf * (self.k1 + 1) / (tf + norm[docs])
+                    accumulated += np.bincount(
+                        docs, weights=weights, minlength=len(segment.doc_ids)
+                    ).astype(np.float32)
+            accumulated *= segment.live
+            top = _top_k(accumulated, k)
+            candidate_ids.append(segment.doc_ids[top])
+            candidate_scores.append(accumulated[top])
+
+        ids = np.concatenate(candidate_ids)
+        scores = np.concatenate(candidate_scores)
+        best = _top_k(scores, k)
+        return [(str(ids[i]), float(scores[i])) for i in best]
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the `k` highest positive scores, best first."""
+    top = min(k, int(np.count_nonzero(scores > 0)))
+    if top == 0:
+        return np.zeros(0, dtype=np.int64)
+    best = np.argpartition(-scores, top - 1)[:top]
+    return best[np.argsort(-scores[best], kind="stable")]
+
+
+def reciprocal_rank_fusion(
+    rankings: Iterable[list[str]], k: int = 60
+) -> list[tuple[str, float]]:
+    """Fuse ranked id lists with reciprocal-rank fusion.
+
+    Each id scores `sum(1 / (k + rank))` over the rankings it appears in (rank from 1).
+
+    Returns:
+        list[tuple[str, float]]: Ids with fused scores, best first.
+    """
+    fused: dict[str, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda item: item[1], reverse=True)
@@ -0,0 +1,140 @@
+"""Columnar metadata index used to pre-filter vector searches.
+
+LangChain's FAISS store applies metadata filters after fetching `fetch_k` neighbours,
+so a filter scoped to one company and period drops most of its hits. The metadata
+index turns a filter into the set of matching FAISS rows up front, so the search only
+ever considers documents that pass it.
+
+Each indexed field is dictionary-encoded: every distinct value gets a code, and the
+rows are grouped by code (a stable argsort plus an offset table), so the rows holding
+a value are one contiguous, sorted slice. A filter is answered by concatenating the
+slices of the wanted values and intersecting across fields, in time proportional to
+the matching rows rather than to the corpus.
+
+Values are compared as strings, so `2023` and `"2023"` match the same documents.
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Any, Iterable, Mapping, Optional
+
+import numpy as np
+
+DEFAULT_FIELDS = ("company", "fiscal_year", "form_type")
+
+
+def is_prefilterable(filter: Any, fields: Iterable[str]) -> bool:
+    """Whether `filter` is a plain {field: value or list of values} dict over `fields`.
+
+    Callables and operator dicts such as `{"fiscal_year": {"$gte": 2022}}` are not.
+    """
+    fields = set(fields)
+    return (
+        isinstance(filter, dict)
+        and bool(filter)
+        and all(
+            name in fields and not isinstance(value, dict)
+            for name, value in filter.items()
+        )
+    )
+
+
+@dataclass
+class Column:
+    """Rows grouped by the dictionary-encoded values of one metadata field."""
+
+    values: dict[str, int]
+    """Value → code. Code 0 is reserved for rows without the field."""
+    order: np.ndarray
+    """Row numbers sorted by code; rows with the same code stay in row order."""
+    offsets: np.ndarray
+    """Rows with code `c` are `order[offsets[c]:offsets[c + 1]]`."""
+
+    @classmethod
+    def build(cls, raw_values: Iterable[Optional[Any]]) -> "Column":
+        """Encode one value (or None) per row."""
+        values: dict[str, int] = {}
+        codes = np.fromiter(
+            (0 if v is None else values.setdefault(str(v), len(values) + 1) for v in raw_values),
+            dtype=np.int64,
+        )
+        offsets = np.zeros(len(values) + 2, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=len(values) + 1), out=offsets[1:])
+        return cls(values=values, order=np.argsort(codes, kind="stable"), offsets=offsets)
+
+    def rows(self, wanted: Iterable[Any]) -> np.ndarray:
+        """Return the sorted rows whose value is any of `wanted`."""
+        codes = sorted({self.values[str(v)] for v in wanted if str(v) in self.values})
+        slices = [self.order[self.offsets[c] : self.offsets[c + 1]] for c in codes]
+        if not slices:
+            return np.zeros(0, dtype=np.int64)
+        return slices[0] if len(slices) == 1 else np.sort(np.concatenate(slices))
+
+
+@dataclass
+class MetadataIndex:
+    """Per-field columns over every row of a FAISS index."""
+
+    ntotal: int
+    columns: dict[str, Column]
+
+    @classmethod
+    def build(
+        cls, metadatas: Iterable[Mapping[str, Any]], fields: Iterable[str] = DEFAULT_FIELDS
+    ) -> "MetadataIndex":
+        """Index `fields` of one metadata mapping per FAISS row, in row order."""
+        metadatas = list(metadatas)
+        return cls(
+            ntotal=len(metadatas),
+            columns={
+                name: Column.build(m.get(name) for m in metadatas) for name in fields
+            },
+        )
+
+    def candidate_rows(self, filter: Mapping[str, Any]) -> np.ndarray:
+        """Return the sorted rows matching every field of `filter`.
+
+        A list value matches any of its elements.
+        """
+        matches = sorted(
+            (
+                self.columns[name].rows(value if isinstance(value, (list, tuple, set)) else [value])
+                for name, value in filter.items()
+            ),
+            key=len,
+        )
+        rows = matches[0]
+        for other in matches[1:]:
+            if not len(rows):
+                break
+            rows = np.intersect1d(rows, other, assume_unique=True)
+        return rows
+
+    def save(self, path: str) -> None:
+        """Write the index to `path` (an .npz file) atomically."""
+        arrays: dict[str, np.ndarray] = {"ntotal": np.asarray(self.ntotal)}
+        for i, (name, column) in enumerate(self.columns.items()):
+            values = sorted(column.values, key=column.values.__getitem__)
+            arrays[f"name_{i}"] = np.asarray(name)
+            arrays[f"values_{i}"] = np.asarray(values, dtype=str)
+            arrays[f"order_{i}"] = column.order
+            arrays[f"offsets_{i}"] = column.offsets
+        tmp_path = f"{path}.tmp.npz"
+        np.savez(tmp_path, allow_pickle=False, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "MetadataIndex":
+        """Read an index written by `save`."""
+        with np.load(path) as data:
+            columns = {}
+            i = 0
+            while f"name_{i}" in data:
+                values = [str(v) for v in data[f"values_{i}"]]
+                columns[str(data[f"name_{i}"])] = Column(
+                    values={v: code for code, v in enumerate(values, start=1)},
+                    order=data[f"order_{i}"],
+                    offsets=data[f"offsets_{i}"],
+                )
+                i += 1
+            return cls(ntotal=int(data["ntotal"]), columns=columns)
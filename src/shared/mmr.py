@@ -0,0 +1,84 @@
+"""Vectorized maximal marginal relevance (MMR) selection.
+
+MMR picks `k` of the `fetch_k` nearest candidates, trading relevance to the query
+against similarity to the candidates already picked, which removes near-duplicate
+chunks from the context. The selection here works on whole candidate matrices: the
+candidate/candidate similarities are computed once with a single matmul, and each of
+the `k` greedy steps is one vectorized update over every candidate (and every query,
+for a batch), with no per-document Python loop.
+"""
+
+from typing import Optional, cast
+
+import numpy as np
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return cast(np.ndarray, vectors / np.maximum(norms, np.finfo(np.float32).tiny))
+
+
+def mmr_select_batch(
+    queries: np.ndarray,
+    candidates: np.ndarray,
+    k: int,
+    lambda_mult: float = 0.5,
+    valid: Optional[np.ndarray] = None,
+) -> np.ndarray:
+    """Select up to `k` candidates per query by maximal marginal relevance.
+
+    Similarities are cosine similarities, matching LangChain's `maximal_marginal_relevance`.
+
+    Args:
+        queries (np.ndarray): Query embeddings of shape (q, d).
+        candidates (np.ndarray): Candidate embeddings of shape (q, fetch_k, d).
+        k (int): Number of candidates to select per query.
+        lambda_mult (float): 1 ranks purely by relevance, 0 purely by diversity.
+        valid (Optional[np.ndarray]): Boolean mask of shape (q, fetch_k); False marks
+            padding, e.g. FAISS ids of -1 when fewer than fetch_k results exist.
+
+    Returns:
+        np.ndarray: Candidate positions of shape (q, min(k, fetch_k)), in selection
+            order. Positions are -1 once a query has no valid candidates left.
+    """
+    queries = _normalize(np.asarray(queries, dtype=np.float32))
+    candidates = _normalize(np.asarray(candidates, dtype=np.float32))
+    n_queries, fetch_k, _ = candidates.shape
+    steps = min(k, fetch_k)
+
+    relevance = np.einsum("qfd,qd->qf", candidates, queries)
+    similarity = candidates @ candidates.transpose(0, 2, 1)
+    available = (
+        np.ones((n_queries, fetch_k), dtype=bool) if valid is None else valid.copy()
+    )
+    redundancy = np.zeros((n_queries, fetch_k), dtype=np.float32)
+    rows = np.arange(n_queries)
+    selected = np.full((n_queries, steps), -1, dtype=np.int64)
+
+    for step in range(steps):
+        # The first pick is the most relevant candidate whatever `lambda_mult` is.
+        scores = (
+            relevance
+            if step == 0
+            else lambda_mult * relevance - (1 - lambda_mult) * redundancy
+        )
+        scores = np.where(available, scores, -np.inf)
+        best = scores.argmax(axis=1)
+        has_candidate = available[rows, best]
+        selected[:, step] = np.where(has_candidate, best, -1)
+        available[rows, best] = False
+        best_similarity = similarity[rows, best]
+        redundancy = (
+            best_similarity if step == 0 else np.maximum(redundancy, best_similarity)
+        )
+    return selected
+
+
+def mmr_select(
+    query: np.ndarray, candidates: np.ndarray, k: int, lambda_mult: float = 0.5
+) -> np.ndarray:
+    """Select up to `k` rows of `candidates` (fetch_k, d) for a single `query` (d,)."""
+    selected = mmr_select_batch(
+        np.asarray(query)[None, :], np.asarray(candidates)[None, :, :], k, lambda_mult
+    )[0]
+    return cast(np.ndarray, selected[selected >= 0])
@@ -0,0 +1,116 @@
+"""Process-wide registry of chat models and their structured-output runnables.
+
+`init_chat_model` builds a new SDK client, with its own HTTP connection pool, on
+every call, and `with_structured_output` rebuilds the tool binding and output parser
+each time; the graph nodes did both on every invocation. The registry keeps one chat
+model per (provider/model, params) and one structured-output runnable per model and
+schema for the life of the process. Schemas are cached by identity, so they must be
+defined once at module level rather than inside the node functions.
+"""
+
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable, Iterable, Optional, Union, cast
+
+from langchain_core.language_models import BaseChatModel, LanguageModelInput
+from langchain_core.runnables import Runnable
+from pydantic import BaseModel
+
+StructuredRunnable = Runnable[LanguageModelInput, Union[dict[str, Any], BaseModel]]
+"""What `BaseChatModel.with_structured_output` returns."""
+
+
+@dataclass
+class RegistryStats:
+    """How often a model or runnable was reused rather than constructed."""
+
+    hits: int = 0
+    models_created: int = 0
+    runnables_created: int = 0
+
+
+def _params_key(params: dict[str, Any]) -> Hashable:
+    return tuple(sorted(params.items()))
+
+
+def init_model(fully_specified_name: str, **params: Any) -> BaseChatModel:
+    """Build a new chat model from a 'provider/model' name.
+
+    The 'offline' provider needs no network (see `shared.offline`); any other
+    provider goes through `init_chat_model`.
+    """
+    if "/" in fully_specified_name:
+        provider, model = fully_specified_name.split("/", maxsplit=1)
+    else:
+        provider = ""
+        model = fully_specified_name
+    if provider == "offline":
+        from shared.offline import make_offline_chat_model
+
+        return make_offline_chat_model(model)
+    from langchain.chat_models import init_chat_model
+
+    return cast(BaseChatModel, init_chat_model(model, model_provider=provider, **params))
+
+
+@dataclass
+class ModelRegistry:
+    """Hand out shared chat models and structured-output runnables."""
+
+    factory: Callable[..., BaseChatModel] = init_model
+    """Builds a model from its name and params."""
+    stats: RegistryStats = field(default_factory=RegistryStats)
+    _models: dict[Hashable, BaseChatModel] = field(default_factory=dict)
+    _runnables: dict[Hashable, StructuredRunnable] = field(default_factory=dict)
+    _lock: threading.RLock = field(default_factory=threading.RLock)
+
+    def model(self, name: str, **params: Any) -> BaseChatModel:
+        """Return the shared model for `name` and `params`, creating it once."""
+        key = (name, _params_key(params))
+        model = self._models.get(key)
+        if model is not None:
+            self.stats.hits += 1
+            return model
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                model = self._models[key] = self.factory(name, **params)
+                self.stats.models_created += 1
+            return model
+
+    def structured(self, name: str, schema: Any, **params: Any) -> StructuredRunnable:
+        """Return the shared `with_structured_output(schema)` runnable of a model."""
+        key = (name, _params_key(params), schema)
+        runnable = self._runnables.get(key)
+        if runnable is not None:
+            self.stats.hits += 1
+            return runnable
+        with self._lock:
+            runnable = self._runnables.get(key)
+            if runnable is None:
+                runnable = self.model(name, **params).with_structured_output(schema)
+                self._runnables[key] = runnable
+                self.stats.runnables_created += 1
+            return runnable
+
+    def warm_up(self, models: Iterable[tuple[str, Optional[Any]]]) -> None:
+        """Construct models, and structured runnables where a schema is given, ahead of use.
+
+        Args:
+            models (Iterable[tuple[str, Optional[Any]]]): (model name, schema or None) pairs.
+        """
+        for name, schema in models:
+            if schema is None:
+                self.model(name)
+            else:
+                self.structured(name, schema)
+
+    def clear(self) -> None:
+        """Forget every model and runnable."""
+        with self._lock:
+            self._models.clear()
+            self._runnables.clear()
+
+
+chat_models = ModelRegistry()
+"""Registry shared by every graph node in the process."""
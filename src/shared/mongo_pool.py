@@ -0,0 +1,80 @@
+"""Process-scoped pool of long-lived MongoDB clients.
+
+A `MongoClient` owns a connection pool, server monitoring threads and the TLS and
+auth state of its connections, so creating one per retrieval pays the whole
+connection setup on every query. The pool keeps one client per (URI, pool options)
+for the life of the process and closes them at exit.
+"""
+
+import atexit
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable, Optional
+
+
+def _pymongo_client(uri: str, **options: Any) -> Any:
+    from pymongo import MongoClient
+
+    return MongoClient(uri, **options)
+
+
+@dataclass
+class MongoClientPool:
+    """Hand out one shared `MongoClient` per URI and pool options."""
+
+    client_factory: Callable[..., Any] = _pymongo_client
+    """Builds a client from a URI and options; replaceable by a Mongo stand-in."""
+    created: int = 0
+    """Clients created, as opposed to reused."""
+    _clients: dict[Hashable, Any] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def get(
+        self,
+        uri: str,
+        *,
+        max_pool_size: int = 50,
+        min_pool_size: int = 0,
+        max_idle_time_ms: Optional[int] = None,
+        app_name: str = "langgraph_retrieval_agent",
+    ) -> Any:
+        """Return the pooled client for `uri`, creating it on first use.
+
+        Args:
+            uri (str): MongoDB connection string.
+            max_pool_size (int): Connections the client may open per server.
+            min_pool_size (int): Connections kept open even when idle.
+            max_idle_time_ms (Optional[int]): Close connections idle for longer.
+            app_name (str): Reported to the server, which helps attribute load.
+        """
+        options = {
+            "maxPoolSize": max_pool_size,
+            "minPoolSize": min_pool_size,
+            "maxIdleTimeMS": max_idle_time_ms,
+            "appname": app_name,
+        }
+        key = (uri, tuple(sorted(options.items())))
+        client = self._clients.get(key)
+        if client is not None:
+            return client
+        with self._lock:
+            client = self._clients.get(key)
+            if client is None:
+                client = self.client_factory(uri, **options)
+                self._clients[key] = client
+                self.created += 1
+            return client
+
+    def close(self) -> None:
+        """Close every pooled client and empty the pool."""
+        with self._lock:
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            client.close()
+
+
+mongo_clients = MongoClientPool()
+"""Pool shared by every MongoDB retriever in the process."""
+
+atexit.register(mongo_clients.close)
@@ -0,0 +1,235 @@
+"""Deterministic offline embedding and chat-model backends.
+
+Every live provider needs Azure OpenAI credentials, so the overhead of the graphs
+themselves could not be measured on a build box. These backends need no network:
+
+- `HashingEmbeddings` (`embedding_model="offline/hashing"`) maps the words and word
+  bigrams of a text to signed buckets of a fixed-size vector (feature hashing, a
+  sparse random projection of the bag of words). Vectors are stable across runs and
+  processes, and texts sharing words land close together.
+- `ScriptedChatModel` (`query_model`/`response_model="offline/scripted"`) answers
+  structured-output calls with arguments built from the requested schema, so
+  `Router`, `Plan` and query responses validate, and plain calls with a short text,
+  streamed word by word when the caller streams.
+
+Options follow the model name as a query string, e.g. `offline/hashing?size=384` or
+`offline/scripted?latency=0.2&items=3&type=general`. For the chat model, `latency`
+is the simulated seconds per call, `items` the length of generated lists, and any
+other key fixes the value of a schema field with that name.
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+import time
+from typing import Any, AsyncIterator, Optional, Sequence
+from urllib.parse import parse_qsl
+
+import numpy as np
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForLLMRun,
+    CallbackManagerForLLMRun,
+)
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+_WORD = re.compile(r"\w+")
+
+
+def parse_model_options(model: str) -> tuple[str, dict[str, str]]:
+    """Split 'name?key=value&...' into the name and its options."""
+    name, _, query = model.partition("?")
+    return name, dict(parse_qsl(query))
+
+
+class HashingEmbeddings(Embeddings):
+    """Stable, network-free embeddings by feature hashing of words and bigrams."""
+
+    def __init__(self, size: int = 1536, seed: str = "", latency: float = 0.0) -> None:
+        """Create an embedder.
+
+        Args:
+            size (int): Dimension of the vectors.
+            seed (str): Changes the hash functions, and so every vector.
+            latency (float): Simulated seconds per call.
+        """
+        self.size = size
+        self.key = seed.encode()[:64]
+        self.latency = latency
+
+    def _embed(self, text: str) -> list[float]:
+        words = _WORD.findall(text.lower())
+        bigrams = [f"{a} {b}" for a, b in zip(words, words[1:])]
+        features = (words + bigrams) or [text]
+        vector = np.zeros(self.size, dtype=np.float32)
+        for feature in features:
+            h = int.from_bytes(
+                hashlib.blake2b(feature.encode(), digest_size=8, key=self.key).digest(),
+                "little",
+            )
+            vector[h % self.size] += 1.0 if h >> 63 else -1.0
+        norm = float(np.linalg.norm(vector))
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed `texts`."""
+        if self.latency:
+            time.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        """Embed a query; queries and documents share one vector space."""
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        """Embed `texts`, sleeping without blocking the event loop."""
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        return [self._embed(text) for text in texts]
+
+    async def aembed_query(self, text: str) -> list[float]:
+        """Embed a query, sleeping without blocking the event loop."""
+        return (await self.aembed_documents([text]))[0]
+
+
+def make_offline_embeddings(model: str) -> Embeddings:
+    """Build the offline embedder named by `model` (the part after 'offline/')."""
+    name, options = parse_model_options(model)
+    if name != "hashing":
+        raise ValueError(f"Unsupported offline embedding model: {name}")
+    return HashingEmbeddings(
+        size=int(options.get("size", 1536)),
+        seed=options.get("seed", ""),
+        latency=float(options.get("latency", 0.0)),
+    )
+
+
+class ScriptedChatModel(BaseChatModel):
+    """Chat model that answers instantly (or after `latency`) from a script."""
+
+    latency: float = 0.0
+    """Simulated seconds per call."""
+    items: int = 2
+    """Length of generated lists, e.g. plan steps and search queries."""
+    values: dict[str, Any] = {"type": "sec-filings", "filters": {}}
+    """Fixed values of schema fields, by field name."""
+
+    @property
+    def _llm_type(self) -> str:
+        return "offline-scripted"
+
+    def bind_tools(
+        self, tools: Sequence[Any], *, tool_choice: Optional[Any] = None, **kwargs: Any
+    ) -> Any:
+        """Bind tool schemas; `with_structured_output` relies on this."""
+        formatted = [convert_to_openai_tool(tool) for tool in tools]
+        return self.bind(tools=formatted, tool_choice=tool_choice, **kwargs)
+
+    def _fill(self, schema: dict[str, Any], name: str, question: str) -> Any:
+        if name in self.values:
+            return self.values[name]
+        if "enum" in schema:
+            return schema["enum"][0]
+        kind = schema.get("type")
+        if kind == "object":
+            properties = schema.get("properties", {})
+            required = schema.get("required", list(properties))
+            return {key: self._fill(properties[key], key, question) for key in required}
+        if kind == "array":
+            return [
+                self._fill(schema.get("items", {}), f"{name} {i + 1}", question)
+                for i in range(self.items)
+            ]
+        if kind == "integer":
+            return 0
+        if kind == "number":
+            return 0.0
+        if kind == "boolean":
+            return False
+        return f"{name}: {question}"
+
+    def _respond(
+        self, messages: list[BaseMessage], tools: Optional[list[dict[str, Any]]]
+    ) -> AIMessage:
+        question = next(
+            (str(m.content) for m in reversed(messages) if m.type == "human"), ""
+        )
+        if not tools:
+            return AIMessage(content=f"Scripted answer to: {question}")
+        function = tools[0]["function"]
+        args = self._fill(function.get("parameters", {}), function["name"], question)
+        return AIMessage(
+            content="",
+            tool_calls=[{"name": function["name"], "args": args, "id": "call_scripted"}],
+        )
+
+    def _generate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.latency:
+            time.sleep(self.latency)
+        message = self._respond(messages, kwargs.get("tools"))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> ChatResult:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        message = self._respond(messages, kwargs.get("tools"))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _astream(
+        self,
+        messages: list[BaseMessage],
+        stop: Optional[list[str]] = None,
+        run_manager: Optional[AsyncCallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[ChatGenerationChunk]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        message = self._respond(messages, kwargs.get("tools"))
+        if message.tool_calls:
+            call = message.tool_calls[0]
+            yield ChatGenerationChunk(
+                message=AIMessageChunk(
+                    content="",
+                    tool_call_chunks=[
+                        {
+                            "name": call["name"],
+                            "args": json.dumps(call["args"]),
+                            "id": call["id"],
+                            "index": 0,
+                        }
+                    ],
+                )
+            )
+            return
+        for token in re.findall(r"\S+\s*", str(message.content)):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+
+
+def make_offline_chat_model(model: str) -> BaseChatModel:
+    """Build the offline chat model named by `model` (the part after 'offline/')."""
+    name, options = parse_model_options(model)
+    if name != "scripted":
+        raise ValueError(f"Unsupported offline chat model: {name}")
+    latency = float(options.pop("latency", 0.0))
+    items = int(options.pop("items", 2))
+    return ScriptedChatModel(
+        latency=latency,
+        items=items,
+        values={**ScriptedChatModel.model_fields["values"].default, **options},
+    )
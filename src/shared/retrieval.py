@@ -4,36 +4,155 @@ This module provides functionality to create and manage retrievers for different
 vector store backends, specifically Elasticsearch, Pinecone, and MongoDB.
 """
 
+import asyncio
 import os
 from contextlib import contextmanager
-from typing import Generator
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Generator,
+    Hashable,
+    Optional,
+    Union,
+    cast,
+    get_args,
+    get_type_hints,
+)
 
+from dotenv import find_dotenv, load_dotenv
+from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
 from langchain_core.runnables import RunnableConfig
 from langchain_core.vectorstores import VectorStoreRetriever
 
 from shared.configuration import BaseConfiguration
-from dotenv import load_dotenv, find_dotenv
+from shared.embedding_cache import get_cached_embeddings
+from shared.encoder_pool import HttpClients, encoders
+from shared.search_pool import get_search_pool
+from shared.store_registry import faiss_stores, file_signature
+
+if TYPE_CHECKING:
+    from shared.faiss_store import FaissStore
+    from shared.sharding import ShardedVectorStore
 
 load_dotenv(find_dotenv())
 
+FAISS_INDEX_NAME = "index"
+
+FAISS_INDEX_PARAMS = ("nprobe", "efSearch")
+"""`search_kwargs` keys that tune the FAISS index itself rather than the search call."""
+
+
+def search_call_kwargs(configuration: BaseConfiguration) -> dict[str, Any]:
+    """Return `search_kwargs` without the `FAISS_INDEX_PARAMS`.
+
+    These are what a retriever passes to its vector store's search call; other
+    providers would reject or misread the FAISS index parameters.
+    """
+    return {
+        k: v for k, v in configuration.search_kwargs.items() if k not in FAISS_INDEX_PARAMS
+    }
+
 
 ## Encoder constructors
-def make_text_encoder() -> Embeddings:
-    """Connect to the configured text encoder."""
-
-    from langchain_openai import AzureOpenAIEmbeddings
-    model = "text-embedding-ada-002" 
-    
-    embedding_function = AzureOpenAIEmbeddings(
-        openai_api_key = os.environ["AZURE_OPENAI_API_KEY"],
-        azure_endpoint = os.environ["AZURE_EMBEDDINGS_ENDPOINT"],
-        model = model,
-        chunk_size = 16,
-        max_retries = 3,
-        # show_progress_bar = True,
+def make_text_encoder(
+    model: str = "azure-openai/text-embedding-ada-002",
+    *,
+    max_connections: int = 20,
+    max_keepalive_connections: int = 10,
+    chunk_size: int = 16,
+    max_retries: int = 3,
+) -> Embeddings:
+    """Connect to the configured text encoder.
+
+    Encoders are pooled per (provider, model, endpoint, chunk_size, max_retries) and
+    reuse keep-alive HTTP connections, so repeated calls return the same client
+    instead of a new one.
+
+    Args:
+        model (str): Embedding model in the form 'provider/model-name'. The
+            'offline' provider needs no network (see `shared.offline`).
+        max_connections (int): Connection limit of the pooled HTTP clients.
+        max_keepalive_connections (int): Idle connections kept open for reuse.
+        chunk_size (int): Inputs per request sent by the client.
+        max_retries (int): Retries the client makes on its own.
+    """
+    provider, model = model.split("/", maxsplit=1)
+    match provider:
+        case "azure-openai":
+            from langchain_openai import AzureOpenAIEmbeddings
+
+            endpoint = os.environ["AZURE_EMBEDDINGS_ENDPOINT"]
+
+            def factory(clients: HttpClients) -> Embeddings:
+                return AzureOpenAIEmbeddings(
+                    openai_api_key = os.environ["AZURE_OPENAI_API_KEY"],
+                    azure_endpoint = endpoint,
+                    model = model,
+                    chunk_size = chunk_size,
+                    max_retries = max_retries,
+                    http_client = clients.sync_client,
+                    http_async_client = clients.async_client,
+                    # show_progress_bar = True,
+                )
+
+            return encoders.get(
+                (provider, model, endpoint, chunk_size, max_retries),
+                factory,
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+            )
+        case "offline":
+            from shared.offline import make_offline_embeddings
+
+            return make_offline_embeddings(model)
+        case _:
+            raise ValueError(f"Unsupported embedding provider: {provider}")
+
+
+def make_configured_encoder(
+    configuration: BaseConfiguration, *, cached: bool = True
+) -> Embeddings:
+    """Build the text encoder described by `configuration`.
+
+    The pooled encoder from `make_text_encoder` is wrapped in the process-wide
+    embedding cache unless `cached` is False or `embedding_cache_size` is 0.
+    Indexing passes `cached=False` so document embeddings do not evict queries;
+    with `embedding_adaptive_batching` its requests go through the shared
+    `AdaptiveEmbeddingBatcher` instead, which does its own packing and retries.
+    """
+    if not cached and configuration.embedding_adaptive_batching:
+        from shared.embedding_batcher import get_embedding_batcher
+
+        return get_embedding_batcher(
+            make_text_encoder(
+                configuration.embedding_model,
+                max_connections=configuration.embedding_max_connections,
+                max_keepalive_connections=configuration.embedding_max_keepalive_connections,
+                chunk_size=configuration.embedding_max_batch_size,
+                max_retries=0,
+            ),
+            configuration.embedding_model,
+            max_batch_tokens=configuration.embedding_batch_tokens,
+            max_batch_size=configuration.embedding_max_batch_size,
+            requests_per_minute=configuration.embedding_requests_per_minute,
+            tokens_per_minute=configuration.embedding_tokens_per_minute,
+            target_latency=configuration.embedding_target_latency,
+        )
+    embedding_model = make_text_encoder(
+        configuration.embedding_model,
+        max_connections=configuration.embedding_max_connections,
+        max_keepalive_connections=configuration.embedding_max_keepalive_connections,
+    )
+    if not cached or configuration.embedding_cache_size <= 0:
+        return embedding_model
+    return get_cached_embeddings(
+        embedding_model,
+        configuration.embedding_model,
+        maxsize=configuration.embedding_cache_size,
+        path=configuration.embedding_cache_path,
     )
-    return embedding_function
 
 
 ## Retriever constructors
@@ -42,58 +161,554 @@ def make_text_encoder() -> Embeddings:
 def make_mongodb_retriever(
     configuration: BaseConfiguration, embedding_model: Embeddings
 ) -> Generator[VectorStoreRetriever, None, None]:
-    """Configure this agent to connect to a specific MongoDB Atlas index & namespaces."""
+    """Configure this agent to connect to a specific MongoDB Atlas index & namespaces.
+
+    The collection comes from the process-wide `MongoClient` in `shared.mongo_pool`,
+    so its connection pool is reused by every retrieval instead of rebuilt per call.
+    """
     from langchain_mongodb.vectorstores import MongoDBAtlasVectorSearch
 
-    vstore = MongoDBAtlasVectorSearch.from_connection_string(
-        os.environ["MONGODB_URI"],
-        namespace="langgraph_retrieval_agent.default",
+    from shared.mongo_pool import mongo_clients
+
+    client = mongo_clients.get(
+        configuration.mongodb_uri or os.environ["MONGODB_URI"],
+        max_pool_size=configuration.mongodb_max_pool_size,
+        min_pool_size=configuration.mongodb_min_pool_size,
+        max_idle_time_ms=configuration.mongodb_max_idle_time_ms,
+    )
+    db_name, collection_name = configuration.mongodb_namespace.split(".", maxsplit=1)
+    vstore = MongoDBAtlasVectorSearch(
+        collection=client[db_name][collection_name],
         embedding=embedding_model,
+        index_name=configuration.mongodb_index_name,
     )
-    yield vstore.as_retriever(search_kwargs=configuration.search_kwargs)
+    yield vstore.as_retriever(search_kwargs=search_call_kwargs(configuration))
+
+def prefetch_file(path: str, chunk_size: int = 1 << 24) -> None:
+    """Pull a file into the OS page cache without keeping it in process memory."""
+    with open(path, "rb") as f:
+        if hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+            return
+        while f.read(chunk_size):
+            pass
+
+
+def faiss_io_flags(load_mode: str) -> int:
+    """Return the `faiss.read_index` flags for a `faiss_load_mode`."""
+    if load_mode != "mmap":
+        return 0
+    import faiss
+
+    # IO_FLAG_MMAP_IFC also maps flat (IndexFlatCodes) storage; older faiss only maps IVF lists.
+    mmap_flag = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP)
+    return mmap_flag | faiss.IO_FLAG_READ_ONLY
 
-@contextmanager
-def make_faiss_retriever(
-    configuration: BaseConfiguration, embedding_model: Embeddings
-) -> Generator[VectorStoreRetriever, None, None]:
-    """Configure this agent to connect to load local faiss store."""
 
+def tune_faiss_index(index: Any, search_kwargs: dict[str, Any]) -> None:
+    """Apply the `FAISS_INDEX_PARAMS` in `search_kwargs` that fit `index`.
+
+    `nprobe` is set on IVF indexes and `efSearch` on HNSW indexes; parameters that
+    do not apply to the index type are ignored.
+    """
+    import faiss
+
+    if "nprobe" in search_kwargs:
+        try:
+            faiss.extract_index_ivf(index).nprobe = int(search_kwargs["nprobe"])
+        except RuntimeError:
+            pass
+    if "efSearch" in search_kwargs and hasattr(index, "hnsw"):
+        index.hnsw.efSearch = int(search_kwargs["efSearch"])
+
+
+def _read_faiss_files(
+    configuration: BaseConfiguration, embedding_model: Embeddings, writable: bool
+) -> tuple["FaissStore", int, int]:
+    """Load the index files and replay the log; returns (store, records replayed, log end)."""
     from langchain_community.vectorstores import FAISS
 
-    # load an already created in memory faiss index
-    # print("cwd:::", os.getcwd() )
+    from shared import faiss_wal
+    from shared.faiss_store import FaissStore, supports_removal
+
+    folder_path = configuration.faiss_index_path
+    wal = faiss_wal.WriteAheadLog(faiss_wal.wal_path(folder_path, FAISS_INDEX_NAME))
+    in_memory = writable or wal.size > 0
+
+    load_mode = "memory" if in_memory else configuration.faiss_load_mode
+    index_path = os.path.join(folder_path, f"{FAISS_INDEX_NAME}.faiss")
+    if load_mode == "mmap" and configuration.faiss_prefetch:
+        prefetch_file(index_path)
+
+    if configuration.faiss_docstore == "packed" and not in_memory:
+        import faiss
+
+        from shared.docstore import PackedDocstore
+
+        docstore = PackedDocstore(
+            os.path.join(folder_path, f"{FAISS_INDEX_NAME}.docs")
+        )
+        index = faiss.read_index(index_path, faiss_io_flags(load_mode))
+        vstore = FaissStore(embedding_model, index, docstore, docstore.row_ids())
+    else:
+        base = FAISS.load_local(
+            folder_path=folder_path,
+            index_name=FAISS_INDEX_NAME,
+            embeddings=embedding_model,
+            allow_dangerous_deserialization=True,
+            io_flags=faiss_io_flags(load_mode),
+        )
+        vstore = FaissStore(
+            embedding_model, base.index, base.docstore, base.index_to_docstore_id
+        )
+    if writable and not supports_removal(vstore.index):
+        raise ValueError(
+            f"The FAISS index in {folder_path} is HNSW, which is rebuild-only. Index "
+            "into a flat index and rebuild it with index_graph.build_index instead."
+        )
+    replayed, wal_end = faiss_wal.replay(vstore, wal)
+    return vstore, replayed, wal_end
+
+
+def load_faiss_store(
+    configuration: BaseConfiguration,
+    embedding_model: Embeddings,
+    writable: bool = False,
+) -> "FaissStore":
+    """Load the local FAISS store from `configuration.faiss_index_path`.
 
-    vstore = FAISS.load_local(
-        folder_path="./notebooks/faiss_index",
-        index_name= "index", 
-        embeddings = embedding_model,
-        allow_dangerous_deserialization=True,
+    In "mmap" mode the vector index is mapped read-only, and with the "packed"
+    docstore documents are decoded lazily from index.docs. Writable stores always use
+    the in-memory index and pickled docstore, since neither alternative can be added to.
+
+    Writes logged to index.wal since the last compaction are replayed on top of the
+    index files, which also requires the in-memory index and pickled docstore.
+    Writable stores append their own writes to that log.
+
+    Only writable loads recover an interrupted compaction, holding the index lock
+    exclusively; reads hold it shared and never touch staged compaction files.
+
+    Raises:
+        ValueError: If `writable` is set and the index cannot remove vectors (HNSW),
+            since updates and pruning delete documents.
+        RuntimeError: If a read finds a committed compaction that a crashed writer
+            did not finish; a writable load recovers it.
+    """
+    from shared import faiss_wal
+
+    folder_path = configuration.faiss_index_path
+    # Writers recover and register under the exclusive lock; readers hold it shared
+    # so a compaction in progress is never seen half done, nor touched.
+    with faiss_wal.index_lock(folder_path, FAISS_INDEX_NAME, shared=not writable):
+        if writable:
+            faiss_wal.recover_compaction(folder_path, FAISS_INDEX_NAME)
+        elif faiss_wal.compaction_pending(folder_path, FAISS_INDEX_NAME):
+            raise RuntimeError(
+                f"A compaction of the FAISS index in {folder_path} was interrupted. "
+                "Open the index writable (e.g. run the index graph) to recover it."
+            )
+        vstore, replayed, wal_end = _read_faiss_files(
+            configuration, embedding_model, writable
+        )
+        if writable:
+            vstore.use_write_ahead_log(
+                folder_path,
+                FAISS_INDEX_NAME,
+                compact_bytes=configuration.faiss_wal_compact_bytes,
+                wal_end=wal_end,
+            )
+    index_path = os.path.join(folder_path, f"{FAISS_INDEX_NAME}.faiss")
+    tune_faiss_index(vstore.index, configuration.search_kwargs)
+    vstore.search_pool = get_search_pool(
+        configuration.search_threads, configuration.search_max_in_flight
+    )
+    # Logged writes are not reflected in index.faiss, so a persisted metadata index
+    # could not be told apart from a stale one; keep it in memory until compaction.
+    vstore.use_metadata_index(
+        tuple(configuration.metadata_filter_fields),
+        path=None
+        if replayed or writable
+        else os.path.join(folder_path, f"{FAISS_INDEX_NAME}.meta.npz"),
+        source_path=index_path,
+    )
+    return vstore
+
+
+def get_faiss_store(
+    configuration: BaseConfiguration, embedding_model: Embeddings
+) -> "FaissStore":
+    """Return the process-wide FAISS store, loading it only when the files change.
+
+    The store is shared by every concurrent retrieval and must not be mutated.
+    """
+    folder_path = os.path.abspath(configuration.faiss_index_path)
+    docstore_ext = "docs" if configuration.faiss_docstore == "packed" else "pkl"
+    paths = [
+        os.path.join(folder_path, f"{FAISS_INDEX_NAME}.faiss"),
+        os.path.join(folder_path, f"{FAISS_INDEX_NAME}.{docstore_ext}"),
+    ]
+    wal_path = os.path.join(folder_path, f"{FAISS_INDEX_NAME}.wal")
+    if os.path.exists(wal_path):
+        # Appends and compactions both change the log, so readers pick them up.
+        paths.append(wal_path)
+    key = (
+        folder_path,
+        FAISS_INDEX_NAME,
+        configuration.embedding_model,
+        configuration.faiss_load_mode,
+        configuration.faiss_docstore,
+        # The tuning parameters are applied at load time, so they are part of the key.
+        tuple(configuration.search_kwargs.get(p) for p in FAISS_INDEX_PARAMS),
+        tuple(configuration.metadata_filter_fields),
     )
+    return cast(
+        "FaissStore",
+        faiss_stores.get(key, paths, lambda: load_faiss_store(configuration, embedding_model)),
+    )
+
+
+def index_version(configuration: BaseConfiguration) -> Optional[Hashable]:
+    """Describe the on-disk state of the configured index, or None if it is remote.
 
-    faiss_kwargs = configuration.search_kwargs  #get default from config or define your own dict
+    The value changes whenever the FAISS files (or a shard's) are rewritten or the
+    write-ahead log grows, so caches derived from search results can be invalidated.
+    """
+    if configuration.retriever_provider not in ("faiss", "hybrid"):
+        return None
+    from shared.sharding import MANIFEST_NAME, is_sharded, read_manifest
+
+    folder_path = os.path.abspath(configuration.faiss_index_path)
+    folders = [folder_path]
+    if is_sharded(folder_path):
+        folders += [
+            os.path.join(folder_path, spec.path) for spec in read_manifest(folder_path).shards
+        ]
+    names = [f"{FAISS_INDEX_NAME}.{ext}" for ext in ("faiss", "pkl", "docs", "wal")]
+    paths = [
+        path
+        for folder in folders
+        for path in (os.path.join(folder, name) for name in [MANIFEST_NAME, *names])
+        if os.path.exists(path)
+    ]
+    return file_signature(paths)
+
+
+def get_sharded_store(
+    configuration: BaseConfiguration, embedding_model: Embeddings
+) -> "ShardedVectorStore":
+    """Return the process-wide sharded store, reopening it when shards.json changes.
+
+    The shards themselves are cached by `get_faiss_store`, so a rebuilt shard is
+    reloaded on its own without touching the others.
+    """
+    from shared.sharding import MANIFEST_NAME, open_sharded_store
+
+    folder_path = os.path.abspath(configuration.faiss_index_path)
+    key = (
+        folder_path,
+        MANIFEST_NAME,
+        configuration.embedding_model,
+        configuration.faiss_load_mode,
+        configuration.faiss_docstore,
+        tuple(configuration.search_kwargs.get(p) for p in FAISS_INDEX_PARAMS),
+        tuple(configuration.metadata_filter_fields),
+        configuration.faiss_shard_threads,
+    )
+    return cast(
+        "ShardedVectorStore",
+        faiss_stores.get(
+            key,
+            [os.path.join(folder_path, MANIFEST_NAME)],
+            lambda: open_sharded_store(configuration, embedding_model),
+        ),
+    )
+
+
+@contextmanager
+def make_faiss_retriever(
+    configuration: BaseConfiguration,
+    embedding_model: Embeddings,
+    writable: bool = False,
+) -> Generator[VectorStoreRetriever, None, None]:
+    """Configure this agent to connect to load local faiss store.
+
+    Read-only retrievers share the cached store from `get_faiss_store`. Writers get a
+    private copy loaded from disk so they never mutate the store concurrent searches use.
+    A folder holding a shard manifest is searched across all of its shards.
+    """
+    from shared.faiss_store import FaissStore
+    from shared.sharding import ShardedVectorStore, is_sharded
+
+    vstore: Union[FaissStore, ShardedVectorStore]
+    if is_sharded(configuration.faiss_index_path):
+        if writable:
+            raise ValueError(
+                f"{configuration.faiss_index_path} is a sharded index; "
+                "index documents into one of its shard folders instead."
+            )
+        vstore = get_sharded_store(configuration, embedding_model)
+    elif writable:
+        vstore = load_faiss_store(configuration, embedding_model, writable=True)
+    else:
+        vstore = get_faiss_store(configuration, embedding_model)
+
+    faiss_kwargs = search_call_kwargs(configuration)
 
     yield vstore.as_retriever(
-        search_type  = "similarity",
+        search_type  = configuration.search_type,
         search_kwargs = faiss_kwargs
         )
 
+@contextmanager
+def make_hybrid_retriever(
+    configuration: BaseConfiguration,
+    embedding_model: Embeddings,
+    writable: bool = False,
+) -> Generator[BaseRetriever, None, None]:
+    """Fuse the local FAISS store with a BM25 index kept next to it.
+
+    The lexical index is built from the FAISS docstore on first use. Writable
+    retrievers add documents to both indexes. A `filter` in `search_kwargs` restricts
+    both rankings.
+
+    Raises:
+        ValueError: If `search_type` is not "similarity" or `search_kwargs` holds a
+            parameter the fused search does not use.
+    """
+    from shared.hybrid import HybridRetriever, open_lexical_index
+
+    if configuration.search_type != "similarity":
+        raise ValueError(
+            "The hybrid retriever ranks by reciprocal-rank fusion; "
+            f"search_type={configuration.search_type!r} is not supported."
+        )
+    search_kwargs = configuration.search_kwargs
+    supported = {"k", "fetch_k", "rrf_k", "filter", *FAISS_INDEX_PARAMS}
+    unsupported = set(search_kwargs) - supported
+    if unsupported:
+        raise ValueError(
+            f"Unsupported search_kwargs for the hybrid retriever: {sorted(unsupported)}"
+        )
+    if writable:
+        vstore = load_faiss_store(configuration, embedding_model, writable=True)
+    else:
+        vstore = get_faiss_store(configuration, embedding_model)
+    lexical = open_lexical_index(
+        vstore, configuration.faiss_index_path, shared=not writable
+    )
+    yield HybridRetriever(
+        vectorstore=vstore,
+        lexical=lexical,
+        k=search_kwargs.get("k", 4),
+        fetch_k=search_kwargs.get("fetch_k", 20),
+        rrf_k=search_kwargs.get("rrf_k", 60),
+        filter=search_kwargs.get("filter"),
+        folder_path=configuration.faiss_index_path,
+    )
+
+
+def retriever_providers() -> tuple[str, ...]:
+    """Return the values `BaseConfiguration.retriever_provider` accepts."""
+    hint = get_type_hints(BaseConfiguration, include_extras=True)["retriever_provider"]
+    return get_args(get_args(hint)[0])
+
+
 @contextmanager
 def make_retriever(
-    config: RunnableConfig,
-) -> Generator[VectorStoreRetriever, None, None]:
-    """Create a retriever for the agent, based on the current configuration."""
+    config: RunnableConfig, *, writable: bool = False
+) -> Generator[BaseRetriever, None, None]:
+    """Create a retriever for the agent, based on the current configuration.
+
+    Args:
+        config (RunnableConfig): Configuration selecting the provider and search parameters.
+        writable (bool): Set when the caller will add documents through the retriever.
+    """
     configuration = BaseConfiguration.from_runnable_config(config)
-    embedding_model = make_text_encoder()
+    embedding_model = make_configured_encoder(configuration, cached=not writable)
 
     match configuration.retriever_provider:
-        
+        case "mongodb":
+            with make_mongodb_retriever(configuration, embedding_model) as retriever:
+                yield retriever
+
         case "faiss":
-            with make_faiss_retriever(configuration, embedding_model) as retriever:
+            with make_faiss_retriever(
+                configuration, embedding_model, writable=writable
+            ) as retriever:
+                yield retriever
+
+        case "hybrid":
+            with make_hybrid_retriever(
+                configuration, embedding_model, writable=writable
+            ) as retriever:
                 yield retriever
 
         case _:
             raise ValueError(
                 "Unrecognized retriever_provider in configuration. "
-                f"Expected one of: {', '.join(BaseConfiguration.__annotations__['retriever_provider'].__args__)}\n"
+                f"Expected one of: {', '.join(retriever_providers())}\n"
                 f"Got: {configuration.retriever_provider}"
-            )
\ No newline at end of file
+            )
+
+
+def with_metadata_filter(
+    config: RunnableConfig, filters: Optional[dict[str, Any]]
+) -> RunnableConfig:
+    """Return `config` with `filters` merged into `search_kwargs["filter"]`.
+
+    Empty values in `filters` are dropped, and a field already set in the configured
+    filter keeps its configured value. A configured filter that is not a dict (e.g. a
+    callable) is left as is. The original config is not modified.
+    """
+    filters = {name: value for name, value in (filters or {}).items() if value}
+    if not filters:
+        return config
+    configurable = dict(config.get("configurable") or {})
+    search_kwargs = dict(
+        configurable.get("search_kwargs")
+        or BaseConfiguration.from_runnable_config(config).search_kwargs
+    )
+    configured = search_kwargs.get("filter") or {}
+    if not isinstance(configured, dict):
+        return config
+    search_kwargs["filter"] = {**filters, **configured}
+    configurable["search_kwargs"] = search_kwargs
+    return {**config, "configurable": configurable}
+
+
+## Batched retrieval
+
+def faiss_batch_search(
+    vstore: "FaissStore",
+    embeddings: list[list[float]],
+    k: int,
+    search_type: str = "similarity",
+    fetch_k: int = 20,
+    lambda_mult: float = 0.5,
+    filter: Optional[dict[str, Any]] = None,
+) -> list[list[Document]]:
+    """Run one k-NN (or MMR) search for a stack of query vectors.
+
+    Args:
+        vstore (FaissStore): The store to search.
+        embeddings (list[list[float]]): One embedding per query.
+        k (int): Number of documents to return per query.
+        search_type (str): "similarity" or "mmr".
+        fetch_k (int): Candidates fetched per query before MMR selection.
+        lambda_mult (float): MMR trade-off between relevance and diversity.
+        filter (Optional[dict[str, Any]]): Metadata filter applied to every query. It
+            must be pre-filterable (see `FaissStore.prefilter_rows`).
+
+    Returns:
+        list[list[Document]]: The top-k documents of each query, in query order.
+    """
+    import faiss
+    import numpy as np
+
+    from shared.faiss_store import search_rows
+
+    rows = vstore.prefilter_rows(filter) if filter else None
+    if filter and rows is None:
+        raise ValueError(f"Metadata filter cannot be applied to a batch: {filter}")
+
+    if search_type == "mmr":
+        return [
+            [doc for doc, _ in docs_and_scores]
+            for docs_and_scores in vstore.mmr_search_batch_by_vectors(
+                embeddings, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, rows=rows
+            )
+        ]
+
+    vectors = np.asarray(embeddings, dtype=np.float32)
+    if getattr(vstore, "_normalize_L2", False):
+        faiss.normalize_L2(vectors)
+    if rows is None:
+        _, indices = vstore.index.search(vectors, k)
+    else:
+        _, indices = search_rows(vstore.index, vectors, k, rows)
+
+    results = []
+    for row in indices:
+        docs = []
+        for i in row:
+            if i == -1:
+                continue
+            doc = vstore.docstore.search(vstore.index_to_docstore_id[i])
+            if isinstance(doc, Document):
+                docs.append(doc)
+        results.append(docs)
+    return results
+
+
+async def aretrieve_batch(
+    config: RunnableConfig, queries: list[str]
+) -> list[list[Document]]:
+    """Retrieve documents for several queries with one embedding call and one search.
+
+    For a FAISS similarity or MMR retriever whose metadata filter, if any, can be
+    pre-filtered, all queries are embedded through a single `aembed_documents` call
+    and searched as one matrix; a sharded index sends that matrix to every shard
+    once. Any other configuration falls back to one `ainvoke` per query.
+
+    Args:
+        config (RunnableConfig): Configuration selecting the provider and search parameters.
+        queries (list[str]): The search queries.
+
+    Returns:
+        list[list[Document]]: The retrieved documents of each query, in query order.
+    """
+    from shared.faiss_store import FaissStore
+    from shared.metadata_index import is_prefilterable
+    from shared.sharding import ShardedVectorStore
+
+    if not queries:
+        return []
+
+    with make_retriever(config) as retriever:
+        vstore = getattr(retriever, "vectorstore", None)
+        search_kwargs = getattr(retriever, "search_kwargs", {})
+        if (
+            isinstance(retriever, VectorStoreRetriever)
+            and isinstance(vstore, FaissStore)
+            and retriever.search_type in ("similarity", "mmr")
+            and (
+                not search_kwargs.get("filter")
+                or is_prefilterable(search_kwargs["filter"], vstore.metadata_fields)
+            )
+        ):
+            embeddings = await vstore.embedding_model.aembed_documents(queries)
+            configuration = BaseConfiguration.from_runnable_config(config)
+            pool = vstore.search_pool or get_search_pool(
+                configuration.search_threads, configuration.search_max_in_flight
+            )
+            return await pool.run(
+                faiss_batch_search,
+                vstore,
+                embeddings,
+                search_kwargs.get("k", 4),
+                retriever.search_type,
+                search_kwargs.get("fetch_k", 20),
+                search_kwargs.get("lambda_mult", 0.5),
+                search_kwargs.get("filter"),
+            )
+        if (
+            isinstance(retriever, VectorStoreRetriever)
+            and isinstance(vstore, ShardedVectorStore)
+            and retriever.search_type in ("similarity", "mmr")
+        ):
+            embeddings = await vstore.embeddings.aembed_documents(queries)
+            results = await vstore._arun(
+                vstore.search_batch_by_vectors,
+                embeddings,
+                k=search_kwargs.get("k", 4),
+                fetch_k=search_kwargs.get("fetch_k", 20),
+                filter=search_kwargs.get("filter"),
+                search_type=retriever.search_type,
+                lambda_mult=search_kwargs.get("lambda_mult", 0.5),
+            )
+            return [[doc for doc, _ in docs] for docs in results]
+
+        responses = await asyncio.gather(
+            *(retriever.ainvoke(query, config) for query in queries)
+        )
+        return list(responses)
@@ -0,0 +1,160 @@
+"""Dedicated thread pool for blocking vector searches called from async code.
+
+LangChain runs the synchronous FAISS search of `ainvoke` in the event loop's default
+executor, where it competes with every other blocking call in the process (file
+reads, `asyncio.to_thread`, client libraries). `SearchPool` gives search and
+docstore decoding their own named threads and caps the searches in flight: callers
+beyond the cap wait, without blocking their event loop, until a search finishes.
+Queue depth and wait times are recorded so search latency under load can be
+separated into waiting and searching.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+@dataclass
+class SearchPoolStats:
+    """Counters of a search pool; times are in seconds."""
+
+    submitted: int = 0
+    completed: int = 0
+    in_flight: int = 0
+    """Searches admitted and not yet finished."""
+    running: int = 0
+    """Searches executing on a pool thread."""
+    waiting: int = 0
+    """Searches waiting for admission under the in-flight cap."""
+    max_queue_depth: int = 0
+    wait_seconds: float = 0.0
+    """Total time between a call and the start of its search."""
+    max_wait_seconds: float = 0.0
+    search_seconds: float = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        """Searches waiting for admission or for a free thread."""
+        return self.waiting + self.in_flight - self.running
+
+    @property
+    def mean_wait_seconds(self) -> float:
+        """Average time a search waited before it started."""
+        return self.wait_seconds / self.completed if self.completed else 0.0
+
+
+class SearchPool:
+    """A sized, named thread pool with a cap on searches in flight."""
+
+    def __init__(
+        self, max_workers: int = 8, max_in_flight: int = 32, name: str = "vector-search"
+    ) -> None:
+        """Create the pool; threads are started on demand.
+
+        Args:
+            max_workers (int): Threads running searches.
+            max_in_flight (int): Searches admitted at once, running or queued for a
+                thread. Further callers wait for admission.
+            name (str): Prefix of the thread names.
+        """
+        self.max_in_flight = max(max_in_flight, max_workers)
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._waiters: deque[tuple[asyncio.AbstractEventLoop, asyncio.Future[None]]] = deque()
+        self._stats = SearchPoolStats()
+
+    def stats(self) -> SearchPoolStats:
+        """Return a snapshot of the pool's counters."""
+        with self._lock:
+            return SearchPoolStats(**self._stats.__dict__)
+
+    def _note_depth(self) -> None:
+        self._stats.max_queue_depth = max(self._stats.max_queue_depth, self._stats.queue_depth)
+
+    async def _admit(self) -> None:
+        with self._lock:
+            self._stats.submitted += 1
+            if self._stats.in_flight < self.max_in_flight and not self._waiters:
+                self._stats.in_flight += 1
+                self._note_depth()
+                return
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append((asyncio.get_running_loop(), waiter))
+            self._stats.waiting += 1
+            self._note_depth()
+        try:
+            # The releasing caller hands its slot over, so in_flight is not touched.
+            await waiter
+        except asyncio.CancelledError:
+            with self._lock:
+                try:
+                    self._waiters.remove((asyncio.get_running_loop(), waiter))
+                    self._stats.waiting -= 1
+                    handed_over = False
+                except ValueError:
+                    handed_over = True
+            if handed_over:
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        with self._lock:
+            while self._waiters:
+                loop, waiter = self._waiters.popleft()
+                self._stats.waiting -= 1
+                if loop.is_closed():
+                    continue
+                loop.call_soon_threadsafe(_hand_over, waiter)
+                return
+            self._stats.in_flight -= 1
+
+    def _run(self, called: float, fn: Callable[..., T], args: Any, kwargs: Any) -> T:
+        started = time.perf_counter()
+        with self._lock:
+            wait = started - called
+            self._stats.running += 1
+            self._stats.wait_seconds += wait
+            self._stats.max_wait_seconds = max(self._stats.max_wait_seconds, wait)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._stats.running -= 1
+                self._stats.completed += 1
+                self._stats.search_seconds += time.perf_counter() - started
+
+    async def run(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Run `fn(*args, **kwargs)` on the pool once admitted, and await its result."""
+        called = time.perf_counter()
+        await self._admit()
+        try:
+            future: Future[T] = self.executor.submit(self._run, called, fn, args, kwargs)
+            return await asyncio.wrap_future(future)
+        finally:
+            self._release()
+
+
+def _hand_over(waiter: asyncio.Future[None]) -> None:
+    # Runs on the waiter's loop. A waiter cancelled meanwhile releases the slot
+    # itself when its cancellation is delivered.
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+_pools: dict[tuple[int, int], SearchPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_search_pool(max_workers: int, max_in_flight: int) -> SearchPool:
+    """Return the process-wide search pool of the given size, creating it once."""
+    with _pools_lock:
+        pool = _pools.get((max_workers, max_in_flight))
+        if pool is None:
+            pool = _pools[(max_workers, max_in_flight)] = SearchPool(max_workers, max_in_flight)
+        return pool
@@ -0,0 +1,639 @@
+"""Sharded FAISS index searched with a parallel fan-out.
+
+A sharded index is a folder holding a `shards.json` manifest and one ordinary FAISS
+index folder per shard, e.g. one per company group or range of fiscal years. Each
+shard is loaded, cached and reloaded on its own through `retrieval.get_faiss_store`,
+so rebuilding one shard only reloads that shard.
+
+A search is sent to every shard that can match its metadata filter. The shard searches
+run concurrently on a thread pool (FAISS releases the GIL while searching), each shard
+returns its own sorted top-k, and the per-shard lists are merged with a k-way heap
+merge that stops after the global top-k.
+
+Shards are reached through the `Shard` interface. `LocalShard` searches an index in
+this process; `RemoteShard` sends msgpack-encoded requests through a transport
+callable. The "loopback" transport serves a local shard through that same encoding,
+standing in for an RPC server until shards are spread across machines.
+"""
+
+import asyncio
+import heapq
+import itertools
+import operator
+import os
+import pickle
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Iterable,
+    Literal,
+    NamedTuple,
+    Optional,
+    Protocol,
+    TypeVar,
+)
+
+import msgspec
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from shared.mmr import mmr_select_batch
+from shared.search_pool import SearchPool, get_search_pool
+
+if TYPE_CHECKING:
+    from shared.configuration import BaseConfiguration
+    from shared.faiss_store import FaissStore
+
+T = TypeVar("T")
+
+MANIFEST_NAME = "shards.json"
+
+
+class ShardSpec(msgspec.Struct):
+    """One shard of a sharded index."""
+
+    name: str
+    path: str
+    """Index folder of the shard, relative to the manifest."""
+    transport: Literal["local", "loopback"] = "local"
+    metadata: dict[str, list[str]] = msgspec.field(default_factory=dict)
+    """Every value a metadata field takes in this shard, e.g. {"company": ["ACME"]}.
+    Filters on a listed field skip shards that hold none of the wanted values."""
+
+
+class ShardManifest(msgspec.Struct):
+    """Contents of `shards.json`."""
+
+    version: int = 1
+    metric: Literal["inner_product", "l2"] = "inner_product"
+    """Metric shared by every shard, deciding whether higher or lower scores win."""
+    shards: list[ShardSpec] = msgspec.field(default_factory=list)
+
+
+def is_sharded(folder_path: str) -> bool:
+    """Whether `folder_path` holds a shard manifest rather than a single index."""
+    return os.path.exists(os.path.join(folder_path, MANIFEST_NAME))
+
+
+def read_manifest(folder_path: str) -> ShardManifest:
+    """Read the shard manifest in `folder_path`."""
+    with open(os.path.join(folder_path, MANIFEST_NAME), "rb") as f:
+        return msgspec.json.decode(f.read(), type=ShardManifest)
+
+
+def write_manifest(folder_path: str, manifest: ShardManifest) -> None:
+    """Write the shard manifest in `folder_path` atomically."""
+    path = os.path.join(folder_path, MANIFEST_NAME)
+    with open(f"{path}.tmp", "wb") as f:
+        f.write(msgspec.json.format(msgspec.json.encode(manifest)))
+    os.replace(f"{path}.tmp", path)
+
+
+def shard_can_match(spec: ShardSpec, filter: Any) -> bool:
+    """Whether a shard may hold documents passing `filter`, judging by its metadata."""
+    if not isinstance(filter, dict):
+        return True
+    for name, value in filter.items():
+        held = spec.metadata.get(name)
+        if held is None or isinstance(value, dict):
+            continue
+        wanted = value if isinstance(value, (list, tuple, set)) else [value]
+        if not {str(v) for v in wanted} & set(held):
+            return False
+    return True
+
+
+## Shards
+
+class SearchRequest(msgspec.Struct, array_like=True):
+    """A k-NN search for a batch of query vectors."""
+
+    queries: list[list[float]]
+    k: int
+    fetch_k: int = 20
+    filter: Any = None
+    with_vectors: bool = False
+
+
+class ShardHit(NamedTuple):
+    """One result of a shard search."""
+
+    score: float
+    document: Document
+    vector: Optional[np.ndarray] = None
+
+
+class Shard(Protocol):
+    """A searchable part of a sharded index."""
+
+    name: str
+
+    def search(self, request: SearchRequest) -> list[list[ShardHit]]:
+        """Return up to `request.k` hits per query, best first."""
+        ...
+
+
+class LocalShard:
+    """Shard backed by a FAISS index folder loaded in this process."""
+
+    def __init__(
+        self,
+        name: str,
+        configuration: "BaseConfiguration",
+        embedding_model: Embeddings,
+    ) -> None:
+        """Serve the index at `configuration.faiss_index_path`."""
+        self.name = name
+        self.configuration = configuration
+        self.embedding_model = embedding_model
+
+    def store(self) -> "FaissStore":
+        """Return the shard's cached store, reloading it if its files changed."""
+        from shared.retrieval import get_faiss_store
+
+        return get_faiss_store(self.configuration, self.embedding_model)
+
+    def search(self, request: SearchRequest) -> list[list[ShardHit]]:
+        """Search the shard, pre-filtering on indexed metadata where possible.
+
+        Filters the metadata index cannot resolve are applied to the first
+        `request.fetch_k` hits, like LangChain's FAISS store does.
+        """
+        from shared.faiss_store import search_rows
+
+        store = self.store()
+        queries = store.query_vectors(request.queries)
+        rows = store.prefilter_rows(request.filter) if request.filter else None
+        post_filter = None
+        if request.filter and rows is None:
+            post_filter = store._create_filter_func(request.filter)
+        n = max(request.k, request.fetch_k) if post_filter else request.k
+        if rows is None:
+            scores, ids = store.index.search(queries, n)
+        else:
+            scores, ids = search_rows(store.index, queries, n, rows)
+
+        results = []
+        for query_scores, query_ids in zip(scores, ids):
+            hits = []
+            for score, row in zip(query_scores, query_ids):
+                if row == -1:
+                    continue
+                doc = store._doc_for_row(int(row))
+                if post_filter is not None and not post_filter(doc.metadata):
+                    continue
+                hits.append((float(score), int(row), doc))
+                if len(hits) == request.k:
+                    break
+            results.append(hits)
+
+        vectors: dict[int, np.ndarray] = {}
+        if request.with_vectors:
+            hit_rows = np.asarray(
+                sorted({row for hits in results for _, row, _ in hits}), dtype=np.int64
+            )
+            try:
+                if len(hit_rows):
+                    vectors = dict(
+                        zip(hit_rows.tolist(), store.index.reconstruct_batch(hit_rows))
+                    )
+            except RuntimeError:
+                # IVF indexes without a direct map cannot reconstruct; MMR then
+                # falls back to relevance order.
+                pass
+        return [
+            [ShardHit(score, doc, vectors.get(row)) for score, row, doc in hits]
+            for hits in results
+        ]
+
+
+class _WireHit(msgspec.Struct, array_like=True):
+    score: float
+    id: Optional[str]
+    page_content: str
+    metadata: dict[str, Any]
+    vector: Optional[list[float]] = None
+
+
+class _WireResponse(msgspec.Struct, array_like=True):
+    hits: list[list[_WireHit]]
+
+
+class ShardServer:
+    """Answer msgpack-encoded `SearchRequest`s for a shard.
+
+    This is the server half of the shard RPC protocol; a network server only has to
+    move the request and response bytes.
+    """
+
+    def __init__(self, shard: Shard) -> None:
+        """Serve `shard`."""
+        self.shard = shard
+        self._decoder = msgspec.msgpack.Decoder(SearchRequest)
+        self._encoder = msgspec.msgpack.Encoder()
+
+    def handle(self, payload: bytes) -> bytes:
+        """Decode a request, search the shard and encode the hits."""
+        results = self.shard.search(self._decoder.decode(payload))
+        return self._encoder.encode(
+            _WireResponse(
+                [
+                    [
+                        _WireHit(
+                            hit.score,
+                            hit.document.id,
+                            hit.document.page_content,
+                            hit.document.metadata,
+                            None if hit.vector is None else hit.vector.tolist(),
+                        )
+                        for hit in hits
+                    ]
+                    for hits in results
+                ]
+            )
+        )
+
+
+class RemoteShard:
+    """Shard searched by sending encoded requests through `transport`."""
+
+    def __init__(self, name: str, transport: Callable[[bytes], bytes]) -> None:
+        """Search through `transport`, which maps request bytes to response bytes."""
+        self.name = name
+        self.transport = transport
+        self._encoder = msgspec.msgpack.Encoder()
+        self._decoder = msgspec.msgpack.Decoder(_WireResponse)
+
+    def search(self, request: SearchRequest) -> list[list[ShardHit]]:
+        """Send `request` and decode the hits."""
+        if request.filter is not None and not isinstance(request.filter, dict):
+            raise ValueError(f"Shard {self.name} only accepts dict metadata filters.")
+        response = self._decoder.decode(self.transport(self._encoder.encode(request)))
+        return [
+            [
+                ShardHit(
+                    hit.score,
+                    Document(id=hit.id, page_content=hit.page_content, metadata=hit.metadata),
+                    None if hit.vector is None else np.asarray(hit.vector, dtype=np.float32),
+                )
+                for hit in hits
+            ]
+            for hits in response.hits
+        ]
+
+
+## Fan-out
+
+_executors: dict[int, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def shard_executor(max_workers: int) -> ThreadPoolExecutor:
+    """Return the process-wide thread pool for shard searches of the given size."""
+    with _executors_lock:
+        executor = _executors.get(max_workers)
+        if executor is None:
+            executor = _executors[max_workers] = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="faiss-shard"
+            )
+        return executor
+
+
+def merge_top_k(
+    ranked: Iterable[list[ShardHit]], k: int, higher_is_better: bool = True
+) -> list[ShardHit]:
+    """Merge per-shard hit lists, each sorted best first, into the global top `k`.
+
+    The k-way heap merge only advances through as many hits as it returns.
+    """
+    merged = heapq.merge(
+        *ranked, key=lambda hit: hit.score, reverse=higher_is_better
+    )
+    return list(itertools.islice(merged, k))
+
+
+class ShardedVectorStore(VectorStore):
+    """Read-only vector store searching every shard of a sharded index concurrently."""
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        shards: list[tuple[ShardSpec, Shard]],
+        *,
+        executor: Optional[ThreadPoolExecutor] = None,
+        search_pool: Optional[SearchPool] = None,
+        higher_is_better: bool = True,
+    ) -> None:
+        """Search `shards`, fanning out on `executor` when there is more than one.
+
+        Async searches are coordinated from `search_pool` when one is given.
+        """
+        self.embedding = embedding
+        self.shards = shards
+        self.executor = executor
+        self.search_pool = search_pool
+        self.higher_is_better = higher_is_better
+
+    @property
+    def embeddings(self) -> Embeddings:
+        """Embedding model shared by the shards."""
+        return self.embedding
+
+    def add_texts(self, texts: Iterable[str], metadatas: Any = None, **kwargs: Any) -> list[str]:
+        """Not supported: shards are rebuilt individually."""
+        raise NotImplementedError(
+            "Sharded indexes are read-only; rebuild or index into a shard folder instead."
+        )
+
+    @classmethod
+    def from_texts(cls, texts: list[str], embedding: Embeddings, metadatas: Any = None, **kwargs: Any) -> "ShardedVectorStore":
+        """Not supported: build the shard folders and their manifest instead."""
+        raise NotImplementedError("Build shards with `split_faiss_index`.")
+
+    def _fan_out(self, request: SearchRequest) -> list[list[list[ShardHit]]]:
+        shards = [shard for spec, shard in self.shards if shard_can_match(spec, request.filter)]
+        if len(shards) <= 1 or self.executor is None:
+            return [shard.search(request) for shard in shards]
+        futures = [self.executor.submit(shard.search, request) for shard in shards]
+        return [future.result() for future in futures]
+
+    def search_batch_by_vectors(
+        self,
+        embeddings: list[list[float]],
+        *,
+        k: int = 4,
+        fetch_k: int = 20,
+        filter: Any = None,
+        search_type: str = "similarity",
+        lambda_mult: float = 0.5,
+    ) -> list[list[tuple[Document, float]]]:
+        """Search every matching shard once for all `embeddings` and merge the hits.
+
+        Args:
+            embeddings (list[list[float]]): One embedding per query.
+            k (int): Number of documents to return per query.
+            fetch_k (int): Hits fetched per shard before post-filtering or MMR.
+            filter (Any): Metadata filter, applied by each shard.
+            search_type (str): "similarity" or "mmr".
+            lambda_mult (float): MMR trade-off between relevance and diversity.
+
+        Returns:
+            list[list[tuple[Document, float]]]: Per query, documents and scores.
+        """
+        mmr = search_type == "mmr"
+        per_shard = self._fan_out(
+            SearchRequest(
+                queries=[list(map(float, e)) for e in embeddings],
+                k=fetch_k if mmr else k,
+                fetch_k=fetch_k,
+                filter=filter,
+                with_vectors=mmr,
+            )
+        )
+        results = []
+        for i, embedding in enumerate(embeddings):
+            hits = merge_top_k(
+                (shard_hits[i] for shard_hits in per_shard),
+                fetch_k if mmr else k,
+                self.higher_is_better,
+            )
+            vectors = [hit.vector for hit in hits if hit.vector is not None]
+            if mmr and hits and len(vectors) == len(hits):
+                selected = mmr_select_batch(
+                    np.asarray([embedding], dtype=np.float32),
+                    np.stack(vectors)[None, :, :],
+                    k,
+                    lambda_mult=lambda_mult,
+                )[0]
+                hits = [hits[p] for p in selected if p >= 0]
+            results.append([(hit.document, hit.score) for hit in hits[:k]])
+        return results
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        filter: Any = None,
+        fetch_k: int = 20,
+        **kwargs: Any,
+    ) -> list[tuple[Document, float]]:
+        """Return the `k` best documents over all shards, with their scores."""
+        docs = self.search_batch_by_vectors([embedding], k=k, fetch_k=fetch_k, filter=filter)[0]
+        score_threshold = kwargs.get("score_threshold")
+        if score_threshold is not None:
+            keep = operator.ge if self.higher_is_better else operator.le
+            docs = [(doc, score) for doc, score in docs if keep(score, score_threshold)]
+        return docs
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> list[tuple[Document, float]]:
+        """Embed `query` and return the `k` best documents with their scores."""
+        return self.similarity_search_with_score_by_vector(
+            self.embedding.embed_query(query), k, **kwargs
+        )
+
+    def similarity_search_by_vector(
+        self, embedding: list[float], k: int = 4, **kwargs: Any
+    ) -> list[Document]:
+        """Return the `k` best documents for `embedding`."""
+        return [
+            doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, **kwargs)
+        ]
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> list[Document]:
+        """Return the `k` best documents for `query`."""
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def max_marginal_relevance_search_by_vector(
+        self,
+        embedding: list[float],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        **kwargs: Any,
+    ) -> list[Document]:
+        """Pick `k` of the global top `fetch_k` by maximal marginal relevance."""
+        return [
+            doc
+            for doc, _ in self.search_batch_by_vectors(
+                [embedding],
+                k=k,
+                fetch_k=fetch_k,
+                filter=kwargs.get("filter"),
+                search_type="mmr",
+                lambda_mult=lambda_mult,
+            )[0]
+        ]
+
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        **kwargs: Any,
+    ) -> list[Document]:
+        """Embed `query` and pick `k` documents by maximal marginal relevance."""
+        return self.max_marginal_relevance_search_by_vector(
+            self.embedding.embed_query(query), k, fetch_k, lambda_mult, **kwargs
+        )
+
+    async def _arun(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        if self.search_pool is None:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+        return await self.search_pool.run(fn, *args, **kwargs)
+
+    async def asimilarity_search_with_score(
+        self, query: str, k: int = 4, **kwargs: Any
+    ) -> list[tuple[Document, float]]:
+        """Embed `query` asynchronously, then search on the search pool."""
+        embedding = await self.embedding.aembed_query(query)
+        return await self._arun(self.similarity_search_with_score_by_vector, embedding, k, **kwargs)
+
+    async def asimilarity_search(self, query: str, k: int = 4, **kwargs: Any) -> list[Document]:
+        """Asynchronously return the `k` best documents for `query`."""
+        return [doc for doc, _ in await self.asimilarity_search_with_score(query, k, **kwargs)]
+
+    async def amax_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        **kwargs: Any,
+    ) -> list[Document]:
+        """Embed `query` asynchronously, then run MMR on the search pool."""
+        embedding = await self.embedding.aembed_query(query)
+        return await self._arun(
+            self.max_marginal_relevance_search_by_vector, embedding, k, fetch_k, lambda_mult, **kwargs
+        )
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        if self.higher_is_better:
+            return self._max_inner_product_relevance_score_fn
+        return self._euclidean_relevance_score_fn
+
+
+def open_sharded_store(
+    configuration: "BaseConfiguration",
+    embedding_model: Embeddings,
+) -> ShardedVectorStore:
+    """Open the shards listed in the manifest at `configuration.faiss_index_path`.
+
+    Each shard is served with `configuration`, pointed at the shard's folder.
+    """
+    folder_path = configuration.faiss_index_path
+    manifest = read_manifest(folder_path)
+    shards: list[tuple[ShardSpec, Shard]] = []
+    for spec in manifest.shards:
+        local = LocalShard(
+            spec.name,
+            replace(configuration, faiss_index_path=os.path.join(folder_path, spec.path)),
+            embedding_model,
+        )
+        if spec.transport == "loopback":
+            shards.append((spec, RemoteShard(spec.name, ShardServer(local).handle)))
+        else:
+            shards.append((spec, local))
+    return ShardedVectorStore(
+        embedding_model,
+        shards,
+        executor=shard_executor(configuration.faiss_shard_threads),
+        search_pool=get_search_pool(
+            configuration.search_threads, configuration.search_max_in_flight
+        ),
+        higher_is_better=manifest.metric == "inner_product",
+    )
+
+
+## Building shards
+
+def _shard_name(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", value).strip("_") or "_"
+
+
+def split_faiss_index(
+    source_folder: str,
+    dest_folder: str,
+    field: str,
+    index_name: str = "index",
+) -> ShardManifest:
+    """Split a single FAISS index into one shard per value of the metadata `field`.
+
+    Each shard is written as an ordinary index folder (`<index_name>.faiss` and
+    `.pkl`), so it can later be rebuilt or re-indexed on its own. Documents without
+    the field go to a shard named "_". Only run this on pickles you created yourself.
+
+    Returns:
+        ShardManifest: The manifest written to `dest_folder`.
+    """
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+
+    index = faiss.read_index(os.path.join(source_folder, f"{index_name}.faiss"))
+    with open(os.path.join(source_folder, f"{index_name}.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)  # noqa: S301
+
+    groups: dict[str, list[tuple[int, str, Document]]] = {}
+    for row in range(index.ntotal):
+        doc_id = index_to_docstore_id[row]
+        doc = docstore.search(doc_id)
+        if not isinstance(doc, Document):
+            raise ValueError(f"Could not find document for id {doc_id}, got {doc}")
+        value = doc.metadata.get(field)
+        groups.setdefault("_" if value is None else str(value), []).append((row, doc_id, doc))
+
+    manifest = ShardManifest(
+        metric="inner_product" if index.metric_type == faiss.METRIC_INNER_PRODUCT else "l2"
+    )
+    for value, members in sorted(groups.items()):
+        name = _shard_name(value)
+        shard_path = os.path.join(dest_folder, name)
+        os.makedirs(shard_path, exist_ok=True)
+        shard_index = faiss.IndexFlat(index.d, index.metric_type)
+        shard_index.add(
+            index.reconstruct_batch(np.asarray([row for row, _, _ in members], dtype=np.int64))
+        )
+        faiss.write_index(shard_index, os.path.join(shard_path, f"{index_name}.faiss"))
+        with open(os.path.join(shard_path, f"{index_name}.pkl"), "wb") as f:
+            pickle.dump(
+                (
+                    InMemoryDocstore({doc_id: doc for _, doc_id, doc in members}),
+                    {i: doc_id for i, (_, doc_id, _) in enumerate(members)},
+                ),
+                f,
+            )
+        manifest.shards.append(
+            ShardSpec(
+                name=name,
+                path=name,
+                metadata={} if value == "_" else {field: [value]},
+            )
+        )
+    write_manifest(dest_folder, manifest)
+    return manifest
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(
+        description="Split a FAISS index into shards by a metadata field."
+    )
+    parser.add_argument("source_folder")
+    parser.add_argument("dest_folder")
+    parser.add_argument("--field", default="company")
+    parser.add_argument("--index-name", default="index")
+    args = parser.parse_args()
+    manifest = split_faiss_index(
+        args.source_folder, args.dest_folder, args.field, args.index_name
+    )
+    print(f"Wrote {len(manifest.shards)} shards to {args.dest_folder}")
@@ -0,0 +1,110 @@
+"""Process-wide registry of loaded vector stores.
+
+Loading a FAISS store from disk means reading the vector index and unpickling the
+docstore, which is far more expensive than the search itself. The registry keeps one
+loaded instance per (index path, embedding model) key and only reloads it when the
+files backing it change on disk.
+
+Stores handed out by the registry are shared snapshots and must be treated as
+read-only. A reload swaps in a new instance under the registry lock; callers that
+still hold the previous instance keep using it safely until they release it.
+"""
+
+import os
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Hashable, Iterable, Optional
+
+FileSignature = tuple[tuple[str, int, int, int], ...]
+
+
+def file_signature(paths: Iterable[str]) -> FileSignature:
+    """Describe the on-disk state of a set of files.
+
+    Args:
+        paths (Iterable[str]): Files backing a store.
+
+    Returns:
+        FileSignature: (path, inode, mtime in ns, size) for every file, so any rewrite,
+            replacement or atomic rename of a file produces a different signature.
+    """
+    signature = []
+    for path in paths:
+        st = os.stat(path)
+        signature.append((path, st.st_ino, st.st_mtime_ns, st.st_size))
+    return tuple(signature)
+
+
+@dataclass
+class _Entry:
+    signature: FileSignature
+    store: Any
+
+
+@dataclass
+class RegistryStats:
+    """Counters describing how often the registry avoided a reload."""
+
+    hits: int = 0
+    loads: int = 0
+    reloads: int = 0
+
+
+@dataclass
+class StoreRegistry:
+    """Cache loaded stores by key and reload them when their files change."""
+
+    _entries: dict[Hashable, _Entry] = field(default_factory=dict)
+    _key_locks: dict[Hashable, threading.Lock] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock)
+    stats: RegistryStats = field(default_factory=RegistryStats)
+
+    def _lock_for(self, key: Hashable) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def get(self, key: Hashable, paths: list[str], loader: Callable[[], Any]) -> Any:
+        """Return the store for `key`, loading it if missing or stale.
+
+        Args:
+            key (Hashable): Identifies the store, e.g. (index path, embedding model).
+            paths (list[str]): Files whose signature decides whether the store is stale.
+            loader (Callable[[], Any]): Builds a fresh store from disk.
+
+        Returns:
+            Any: The shared store instance. Callers must not mutate it.
+        """
+        signature = file_signature(paths)
+        entry = self._entries.get(key)
+        if entry is not None and entry.signature == signature:
+            self.stats.hits += 1
+            return entry.store
+
+        # Only one thread loads a given key; the others wait and reuse its result.
+        with self._lock_for(key):
+            signature = file_signature(paths)
+            entry = self._entries.get(key)
+            if entry is not None and entry.signature == signature:
+                self.stats.hits += 1
+                return entry.store
+
+            store = loader()
+            with self._lock:
+                self._entries[key] = _Entry(signature=signature, store=store)
+                if entry is None:
+                    self.stats.loads += 1
+                else:
+                    self.stats.reloads += 1
+            return store
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Drop one cached store, or all of them when no key is given."""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+
+faiss_stores = StoreRegistry()
+"""Registry shared by every FAISS retriever in the process."""
@@ -0,0 +1,27 @@
+"""Token counting for embedding batches and context budgets.
+
+Counts use tiktoken's `cl100k_base`, the encoding of the OpenAI embedding and chat
+models this agent targets. When tiktoken or its encoding file is unavailable, a
+four-characters-per-token estimate is used instead.
+"""
+
+from functools import lru_cache
+from typing import Any, Optional
+
+
+@lru_cache(maxsize=1)
+def _encoding() -> Optional[Any]:
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception:
+        return None
+
+
+def count_tokens(text: str) -> int:
+    """Return the number of tokens in `text` (at least 1)."""
+    encoding = _encoding()
+    if encoding is None:
+        return max(1, (len(text) + 3) // 4)
+    return max(1, len(encoding.encode(text, disallowed_special=())))
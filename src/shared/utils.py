@@ -3,14 +3,17 @@
 Functions:
     format_docs: Convert documents to an xml-formatted string.
     load_chat_model: Load a chat model from a model name.
+    load_structured_model: Load a chat model's structured-output runnable.
 """
 
-from typing import Optional
+from typing import Any, Optional
 
-from langchain.chat_models import init_chat_model
 from langchain_core.documents import Document
 from langchain_core.language_models import BaseChatModel
 
+from shared.model_registry import StructuredRunnable, chat_models
+
+
 def _format_doc(doc: Document) -> str:
     """Format a single document as XML.
 
@@ -62,15 +65,28 @@ def format_docs(docs: Optional[list[Document]]) -> str:
 </documents>"""
 
 
-def load_chat_model(fully_specified_name: str) -> BaseChatModel:
+def load_chat_model(fully_specified_name: str, **params: Any) -> BaseChatModel:
     """Load a chat model from a fully specified name.
 
+    Models are shared process-wide through `shared.model_registry.chat_models`, so
+    repeated calls return the same client.
+
+    Args:
+        fully_specified_name (str): String in the format 'provider/model'. The
+            'offline' provider needs no network (see `shared.offline`).
+        **params: Extra model parameters, part of the registry key.
+    """
+    return chat_models.model(fully_specified_name, **params)
+
+
+def load_structured_model(
+    fully_specified_name: str, schema: Any, **params: Any
+) -> StructuredRunnable:
+    """Load the shared `with_structured_output(schema)` runnable of a chat model.
+
     Args:
         fully_specified_name (str): String in the format 'provider/model'.
+        schema (Any): Output schema, defined once at module level.
+        **params: Extra model parameters, part of the registry key.
     """
-    if "/" in fully_specified_name:
-        provider, model = fully_specified_name.split("/", maxsplit=1)
-    else:
-        provider = ""
-        model = fully_specified_name
-    return init_chat_model(model, model_provider=provider)
+    return chat_models.structured(fully_specified_name, schema, **params)
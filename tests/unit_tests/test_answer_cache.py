@@ -0,0 +1,69 @@
+import os
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.messages import HumanMessage
+
+from retrieval_graph.answer_cache import SemanticAnswerCache
+from retrieval_graph.graph import graph
+
+from .test_offline import offline_config
+
+
+def test_cache_threshold_ttl_lru_and_invalidation() -> None:
+    now = [0.0]
+    cache = SemanticAnswerCache(max_entries=2, ttl_seconds=10, threshold=0.9, clock=lambda: now[0])
+    doc = Document(page_content="10-K")
+    cache.store([1.0, 0.0, 0.0], "q1", "a1", [doc], version="v1")
+    cache.store([0.0, 1.0, 0.0], "q2", "a2", [], version="v1")
+
+    hit = cache.lookup([0.99, 0.05, 0.0], version="v1")
+    assert hit is not None and hit.answer == "a1" and hit.documents == [doc]
+    assert cache.lookup([0.5, 0.5, 0.7], version="v1") is None
+
+    cache.store([0.0, 0.0, 1.0], "q3", "a3", [], version="v1")  # evicts q2, used least recently
+    assert cache.lookup([0.0, 1.0, 0.0], version="v1") is None
+    assert cache.stats.evictions == 1
+
+    now[0] = 11.0
+    assert cache.lookup([1.0, 0.0, 0.0], version="v1") is None
+    assert cache.stats.expired == 2 and len(cache) == 0
+
+    cache.store([0.0, 0.0, 1.0], "q3", "a3", [], version="v1")
+    cache.lookup([0.0, 0.0, 1.0], version="v2")
+    assert len(cache) == 0 and cache.stats.invalidations == 1
+
+
+def test_expired_nearest_entry_does_not_hide_a_fresh_match() -> None:
+    now = [0.0]
+    cache = SemanticAnswerCache(max_entries=4, ttl_seconds=10, threshold=0.9, clock=lambda: now[0])
+    cache.store([1.0, 0.0], "old", "stale", [])
+    now[0] = 5.0
+    cache.store([1.0, 0.1], "new", "fresh", [])
+    now[0] = 12.0
+    hit = cache.lookup([1.0, 0.0])
+    assert hit is not None and hit.answer == "fresh"
+    assert cache.stats.expired == 1 and len(cache) == 1
+
+
+@pytest.mark.asyncio
+async def test_graph_answers_repeated_question_from_cache(tmp_path) -> None:
+    question = {"messages": [HumanMessage(content="What was ACME's revenue?")]}
+    first = await graph.ainvoke(
+        question, offline_config(str(tmp_path), answer_cache=True, thread_id="first")
+    )
+    assert not first["answered_from_cache"]
+
+    second = await graph.ainvoke(
+        question, offline_config(str(tmp_path), answer_cache=True, thread_id="second")
+    )
+    assert second["answered_from_cache"]
+    assert second["messages"][-1].content == first["messages"][-1].content
+    assert second["documents"]
+
+    # Rewriting the index invalidates the cached answer.
+    os.remove(tmp_path / "index.faiss")
+    third = await graph.ainvoke(
+        question, offline_config(str(tmp_path), answer_cache=True, thread_id="third")
+    )
+    assert not third["answered_from_cache"]
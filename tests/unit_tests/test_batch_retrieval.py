@@ -0,0 +1,20 @@
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from shared.retrieval import faiss_batch_search
+
+
+def test_faiss_batch_search_matches_per_query_search() -> None:
+    embeddings = DeterministicFakeEmbedding(size=16)
+    texts = [f"document {i}" for i in range(20)]
+    vstore = FAISS.from_texts(texts, embeddings)
+    queries = ["document 3", "something else", "document 17"]
+
+    vectors = embeddings.embed_documents(queries)
+    batched = faiss_batch_search(vstore, vectors, k=3)
+
+    expected = [vstore.similarity_search_by_vector(v, k=3) for v in vectors]
+    assert [[d.page_content for d in docs] for docs in batched] == [
+        [d.page_content for d in docs] for docs in expected
+    ]
+    assert batched[0][0].page_content == "document 3"
@@ -0,0 +1,60 @@
+import faiss
+import numpy as np
+import pytest
+
+from index_graph.build_index import build_faiss_index
+from shared.retrieval import tune_faiss_index
+
+
+@pytest.mark.parametrize(
+    ("index_type", "params"),
+    [("ivf_flat", {"nprobe": 4}), ("hnsw", {"efSearch": 32}), ("flat", {"nprobe": 4})],
+)
+def test_built_index_finds_exact_neighbours(index_type, params) -> None:
+    vectors = np.random.default_rng(0).standard_normal((400, 16)).astype(np.float32)
+    index = build_faiss_index(vectors, index_type, nlist=8, hnsw_m=8)
+    tune_faiss_index(index, params)
+    assert index.ntotal == 400
+    _, ids = index.search(vectors[:20], 1)
+    assert (ids[:, 0] == np.arange(20)).mean() >= 0.9
+    if index_type == "ivf_flat":
+        assert faiss.extract_index_ivf(index).nprobe == 4
+
+
+def test_unknown_index_type_is_rejected() -> None:
+    with pytest.raises(ValueError):
+        build_faiss_index(np.zeros((4, 4), dtype=np.float32), "lsh")
+
+
+def test_ivf_pq_parameters_are_validated() -> None:
+    vectors = np.random.default_rng(0).standard_normal((200, 16)).astype(np.float32)
+    with pytest.raises(ValueError, match="at least 256 vectors"):
+        build_faiss_index(vectors, "ivf_pq", nlist=2, pq_m=4)
+    with pytest.raises(ValueError, match="must divide"):
+        build_faiss_index(vectors, "ivf_pq", nlist=2, pq_m=5)
+
+
+def test_hnsw_store_is_rebuild_only(tmp_path) -> None:
+    from langchain_community.vectorstores import FAISS
+    from langchain_core.embeddings import DeterministicFakeEmbedding
+
+    from shared.configuration import BaseConfiguration
+    from shared.faiss_store import FaissStore
+    from shared.retrieval import FAISS_INDEX_NAME, load_faiss_store
+
+    embeddings = DeterministicFakeEmbedding(size=8)
+    flat = FAISS.from_texts([f"filing {i}" for i in range(20)], embeddings)
+    store = FaissStore(
+        embeddings,
+        build_faiss_index(flat.index.reconstruct_n(0, 20), "hnsw", hnsw_m=8),
+        flat.docstore,
+        flat.index_to_docstore_id,
+    )
+    store.save_local(str(tmp_path), FAISS_INDEX_NAME)
+    with pytest.raises(ValueError, match="rebuild-only"):
+        store.delete([flat.index_to_docstore_id[0]])
+
+    configuration = BaseConfiguration(faiss_index_path=str(tmp_path))
+    assert load_faiss_store(configuration, embeddings).similarity_search("filing 3", k=1)
+    with pytest.raises(ValueError, match="rebuild-only"):
+        load_faiss_store(configuration, embeddings, writable=True)
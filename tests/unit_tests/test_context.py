@@ -0,0 +1,45 @@
+from langchain_core.documents import Document
+
+from shared.context import assemble_context
+
+FILLER = " ".join(f"word{i}" for i in range(200))
+
+
+def test_context_dedupes_ranks_whitelists_and_fits_budget() -> None:
+    docs = [
+        Document(page_content="Globex headcount grew in 2023.", metadata={"company": "Globex"}),
+        Document(
+            page_content="ACME revenue was $5B in fiscal 2023.",
+            metadata={"company": "ACME", "embedding_debug": [0.1] * 50},
+        ),
+        Document(page_content="ACME revenue was $5B in fiscal 2023!", metadata={"company": "ACME"}),
+        Document(page_content=FILLER),
+    ]
+    context, stats = assemble_context(
+        docs, "ACME revenue", max_tokens=60, metadata_fields=["company"]
+    )
+    assert context.index("ACME revenue") < context.index("Globex")
+    assert "company='ACME'" in context and "embedding_debug" not in context
+    assert (stats.candidates, stats.duplicates, stats.over_budget, stats.included) == (4, 1, 1, 2)
+    assert stats.tokens <= 60
+
+
+def test_metadata_scores_take_precedence_and_empty_input() -> None:
+    docs = [
+        Document(page_content="low", metadata={"relevance_score": 0.1}),
+        Document(page_content="high", metadata={"relevance_score": 0.9}),
+    ]
+    context, _ = assemble_context(docs, "low")
+    assert context.index("high") < context.index("low")
+    assert assemble_context([], "q")[0] == "<documents></documents>"
+
+
+def test_over_budget_document_does_not_suppress_its_duplicate() -> None:
+    text = "ACME revenue was $5B in fiscal 2023."
+    docs = [
+        Document(page_content=text, metadata={"relevance_score": 0.9, "company": FILLER}),
+        Document(page_content=text, metadata={"relevance_score": 0.5}),
+    ]
+    context, stats = assemble_context(docs, "", max_tokens=40, metadata_fields=["company"])
+    assert (stats.over_budget, stats.duplicates, stats.included) == (1, 0, 1)
+    assert text in context
@@ -0,0 +1,65 @@
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from shared.embedding_batcher import AdaptiveEmbeddingBatcher, SlidingWindow
+
+
+class RateLimitError(Exception):
+    def __init__(self) -> None:
+        super().__init__("429")
+        self.status_code = 429
+        self.response = type("Response", (), {"headers": {"retry-after-ms": "1"}})()
+
+
+class FlakyEmbeddings(DeterministicFakeEmbedding):
+    """Reject every request of more than `limit` inputs with a 429."""
+
+    limit: int = 6
+    calls: list = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls.append(len(texts))
+        if len(texts) > self.limit:
+            raise RateLimitError()
+        return super().embed_documents(texts)
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.embed_documents(texts)
+
+
+def test_sliding_window_delays_until_capacity_frees() -> None:
+    window = SlidingWindow(limit=10, period=60.0)
+    window.add(6, now=0.0)
+    window.add(4, now=30.0)
+    assert window.delay(3, now=40.0) == pytest.approx(20.0)
+    assert window.delay(3, now=61.0) == 0.0
+    assert window.used(61.0) == 4
+
+
+@pytest.mark.asyncio
+async def test_batcher_shrinks_on_429_and_grows_back() -> None:
+    underlying = FlakyEmbeddings(size=4, calls=[])
+    batcher = AdaptiveEmbeddingBatcher(underlying, max_batch_size=64, max_batch_tokens=1000)
+    texts = [f"text {i}" for i in range(40)]
+
+    vectors = batcher.embed_documents(texts)
+    assert vectors == [DeterministicFakeEmbedding(size=4).embed_query(t) for t in texts]
+    metrics = batcher.metrics()
+    assert metrics.throttled >= 1 and metrics.inputs == 40
+    assert batcher.batch_size <= 6 + 6 // 4
+
+    underlying.limit = 1000
+    assert len(await batcher.aembed_documents(texts * 5)) == 200
+    assert batcher.metrics().batch_size > 16
+
+
+def test_batcher_packs_by_tokens_and_respects_rpm() -> None:
+    now = [0.0]
+    underlying = FlakyEmbeddings(size=4, calls=[], limit=1000)
+    batcher = AdaptiveEmbeddingBatcher(
+        underlying, max_batch_tokens=10, requests_per_minute=2, clock=lambda: now[0]
+    )
+    batcher.embed_documents(["x" * 16] * 4)  # 4 tokens each
+    assert underlying.calls == [2, 2]
+    assert batcher._reservation_delay(4) == pytest.approx(60.0)
+    assert batcher.metrics().requests_last_minute == 2
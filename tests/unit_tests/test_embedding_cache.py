@@ -0,0 +1,56 @@
+from langchain_core.embeddings import Embeddings
+
+from shared.embedding_cache import CachedEmbeddings, get_cached_embeddings
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self) -> None:
+        self.calls: list[list[str]] = []
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls.append(list(texts))
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        return self.embed_documents([text])[0]
+
+
+def test_repeated_query_skips_model_call() -> None:
+    underlying = CountingEmbeddings()
+    cache = CachedEmbeddings(underlying, "m", maxsize=8)
+    first = cache.embed_query("Apple  revenue FY2023")
+    assert cache.embed_query(" Apple revenue\nFY2023 ") == first
+    assert len(underlying.calls) == 1
+    assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+
+
+def test_embed_documents_only_embeds_misses_and_evicts_lru() -> None:
+    underlying = CountingEmbeddings()
+    cache = CachedEmbeddings(underlying, "m", maxsize=2)
+    cache.embed_documents(["a"])
+    vectors = cache.embed_documents(["a", "bb", "ccc"])
+    assert vectors == [[1.0, 1.0], [2.0, 1.0], [3.0, 1.0]]
+    assert underlying.calls == [["a"], ["bb", "ccc"]]
+    assert cache.stats.evictions == 1
+
+
+def test_sqlite_tier_survives_new_instance(tmp_path) -> None:
+    path = str(tmp_path / "cache.sqlite")
+    CachedEmbeddings(CountingEmbeddings(), "m", path=path).embed_query("hello")
+    underlying = CountingEmbeddings()
+    cache = CachedEmbeddings(underlying, "m", path=path)
+    assert cache.embed_query("hello") == [5.0, 1.0]
+    assert underlying.calls == []
+    assert cache.stats.disk_hits == 1
+    assert CachedEmbeddings(underlying, "other", path=path).embed_query("hello")
+    assert underlying.calls == [["hello"]]
+
+
+def test_queries_documents_and_clients_do_not_share_entries() -> None:
+    underlying = CountingEmbeddings()
+    cache = get_cached_embeddings(underlying, "m", maxsize=8)
+    cache.embed_query("a")
+    cache.embed_documents(["a"])
+    assert underlying.calls == [["a"], ["a"]]
+    assert get_cached_embeddings(underlying, "m", maxsize=8) is cache
+    assert get_cached_embeddings(CountingEmbeddings(), "m", maxsize=8) is not cache
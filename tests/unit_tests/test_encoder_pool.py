@@ -0,0 +1,66 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from langchain_core.embeddings import FakeEmbeddings
+
+from shared.encoder_pool import EncoderPool, make_http_clients
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def server_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/"
+    server.shutdown()
+    server.server_close()
+
+
+def test_http_clients_count_connection_reuse(server_url) -> None:
+    clients = make_http_clients(max_connections=1, max_keepalive_connections=1)
+    for _ in range(3):
+        clients.sync_client.get(server_url)
+    clients.close()
+    assert clients.stats.requests == 3
+    assert clients.stats.new_connections == 1
+    assert clients.stats.reused_connections == 2
+
+
+@pytest.mark.asyncio
+async def test_async_client_counts_connection_reuse(server_url) -> None:
+    clients = make_http_clients()
+    for _ in range(3):
+        await clients.async_client.get(server_url)
+    await clients.aclose()
+    assert (clients.stats.requests, clients.stats.new_connections) == (3, 1)
+
+
+def test_encoder_pool_returns_same_encoder_per_key() -> None:
+    pool = EncoderPool()
+    created = []
+
+    def factory(clients):
+        created.append(clients)
+        return FakeEmbeddings(size=4)
+
+    first = pool.get(("fake", "m", "endpoint"), factory)
+    assert pool.get(("fake", "m", "endpoint"), factory) is first
+    assert pool.get(("fake", "m", "other"), factory) is not first
+    assert len(created) == 2
+    pool.close()
+    assert all(clients.sync_client.is_closed for clients in created)
+    assert pool.stats() == {}
@@ -0,0 +1,47 @@
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from shared.configuration import BaseConfiguration
+from shared.retrieval import FAISS_INDEX_NAME, load_faiss_store
+
+
+def test_mmap_load_matches_in_memory_load(tmp_path) -> None:
+    embeddings = DeterministicFakeEmbedding(size=8)
+    texts = [f"filing {i}" for i in range(10)]
+    FAISS.from_texts(texts, embeddings).save_local(str(tmp_path), FAISS_INDEX_NAME)
+
+    in_memory = load_faiss_store(
+        BaseConfiguration(faiss_index_path=str(tmp_path)), embeddings
+    )
+    mapped = load_faiss_store(
+        BaseConfiguration(
+            faiss_index_path=str(tmp_path), faiss_load_mode="mmap", faiss_prefetch=True
+        ),
+        embeddings,
+    )
+    expected = [d.page_content for d in in_memory.similarity_search("filing 4", k=3)]
+    assert [d.page_content for d in mapped.similarity_search("filing 4", k=3)] == expected
+    assert expected[0] == "filing 4"
+
+
+def test_packed_docstore_matches_pickle(tmp_path) -> None:
+    from shared.docstore import PackedDocstore, convert_pickle_docstore
+
+    embeddings = DeterministicFakeEmbedding(size=8)
+    texts = [f"filing {i}" for i in range(10)]
+    metadatas = [{"company": "ACME", "year": 2020 + i} for i in range(10)]
+    FAISS.from_texts(texts, embeddings, metadatas=metadatas).save_local(
+        str(tmp_path), FAISS_INDEX_NAME
+    )
+    docstore = PackedDocstore(convert_pickle_docstore(str(tmp_path)))
+    assert len(docstore) == 10
+    assert docstore.search(3).metadata == {"company": "ACME", "year": 2023}
+    assert docstore.search(docstore.search(3).id).page_content == "filing 3"
+
+    packed = load_faiss_store(
+        BaseConfiguration(faiss_index_path=str(tmp_path), faiss_docstore="packed"),
+        embeddings,
+    )
+    hits = packed.similarity_search("filing 7", k=2)
+    assert hits[0].page_content == "filing 7"
+    assert hits[0].metadata["year"] == 2027
@@ -0,0 +1,93 @@
+import os
+
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from shared.configuration import BaseConfiguration
+from shared.faiss_wal import WriteAheadLog, wal_path
+from shared.retrieval import FAISS_INDEX_NAME, load_faiss_store
+
+
+def _setup(tmp_path, **kwargs):
+    embeddings = DeterministicFakeEmbedding(size=8)
+    FAISS.from_texts([f"filing {i}" for i in range(5)], embeddings).save_local(
+        str(tmp_path), FAISS_INDEX_NAME
+    )
+    return embeddings, BaseConfiguration(faiss_index_path=str(tmp_path), **kwargs)
+
+
+def test_writes_survive_reload_without_rewriting_index(tmp_path) -> None:
+    embeddings, configuration = _setup(tmp_path)
+    index_file = tmp_path / f"{FAISS_INDEX_NAME}.faiss"
+    before = index_file.stat().st_mtime_ns
+
+    writer = load_faiss_store(configuration, embeddings, writable=True)
+    writer.add_documents([Document(id="a", page_content="new filing a")])
+    writer.add_documents([Document(id="b", page_content="new filing b")])
+    writer.delete(["a"])
+    assert index_file.stat().st_mtime_ns == before
+
+    reader = load_faiss_store(configuration, embeddings)
+    assert reader.index.ntotal == 6
+    assert reader.similarity_search("new filing b", k=1)[0].page_content == "new filing b"
+    assert "a" not in reader.index_to_docstore_id.values()
+
+
+def test_torn_tail_is_ignored_and_compaction_empties_log(tmp_path) -> None:
+    embeddings, configuration = _setup(tmp_path, faiss_wal_compact_bytes=1 << 30)
+    writer = load_faiss_store(configuration, embeddings, writable=True)
+    writer.add_documents([Document(id="a", page_content="new filing a")])
+    path = wal_path(str(tmp_path), FAISS_INDEX_NAME)
+    with open(path, "ab") as f:
+        f.write(b"\x10\x00\x00\x00partial")
+    assert len(list(WriteAheadLog(path).records())) == 1
+
+    writer = load_faiss_store(configuration, embeddings, writable=True)
+    assert writer.index.ntotal == 6
+    writer.add_documents([Document(id="b", page_content="new filing b")])
+    assert len(list(WriteAheadLog(path).records())) == 2
+
+    writer.compact()
+    assert os.path.getsize(path) == 0
+    reader = load_faiss_store(
+        BaseConfiguration(faiss_index_path=str(tmp_path), faiss_load_mode="mmap"),
+        embeddings,
+    )
+    assert reader.index.ntotal == 7
+
+
+def test_only_writers_recover_interrupted_compactions(tmp_path) -> None:
+    embeddings, configuration = _setup(tmp_path)
+    staged = tmp_path / f"{FAISS_INDEX_NAME}.faiss.compact"
+    staged.write_bytes(b"a writer is still staging this")
+    assert load_faiss_store(configuration, embeddings).index.ntotal == 5
+    assert staged.exists()
+
+    marker = tmp_path / f"{FAISS_INDEX_NAME}.compact"
+    marker.write_bytes(b"")
+    with pytest.raises(RuntimeError, match="interrupted"):
+        load_faiss_store(configuration, embeddings)
+    assert staged.exists()
+
+    marker.unlink()
+    load_faiss_store(configuration, embeddings, writable=True)
+    assert not staged.exists()
+
+
+def test_concurrent_writers_never_drop_each_others_writes(tmp_path) -> None:
+    embeddings, configuration = _setup(tmp_path)
+    first = load_faiss_store(configuration, embeddings, writable=True)
+    second = load_faiss_store(configuration, embeddings, writable=True)
+    first.add_documents([Document(id="a", page_content="new filing a")])
+    second.add_documents([Document(id="b", page_content="new filing b")])
+    second.compact()  # picks up "a" before rewriting the base files
+    first.add_documents([Document(id="c", page_content="new filing c")])  # reloads first
+    first.delete(["b"])
+    first.compact()
+
+    reader = load_faiss_store(configuration, embeddings)
+    ids = set(reader.index_to_docstore_id.values())
+    assert reader.index.ntotal == 7 and {"a", "c"} <= ids and "b" not in ids
+    assert os.path.getsize(wal_path(str(tmp_path), FAISS_INDEX_NAME)) == 0
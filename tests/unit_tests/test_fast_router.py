@@ -0,0 +1,58 @@
+import json
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from retrieval_graph.fast_router import FAST_ROUTES, FastRouter, load_examples
+from retrieval_graph.graph import graph
+from shared.offline import HashingEmbeddings
+
+from .test_offline import offline_config
+
+EXAMPLES = {
+    "general": ["hello there", "thanks a lot"],
+    "sec-filings": ["ACME annual revenue 10-K", "Globex quarterly net income 10-Q"],
+    "more-info": ["what was the revenue"],
+}
+
+
+@pytest.mark.asyncio
+async def test_fast_router_decides_clear_questions_and_defers_the_rest() -> None:
+    router = FastRouter(HashingEmbeddings(size=256), EXAMPLES, threshold=0.1, min_similarity=0.3)
+    routed = await router.classify("ACME revenue in the 10-K")
+    assert routed == {"type": "sec-filings", "logic": FAST_ROUTES["sec-filings"]}
+    assert (await router.classify("hello there"))["type"] == "general"
+    assert await router.classify("something unrelated entirely") is None  # not similar enough
+    assert await router.classify("what was the revenue?") is None  # more-info goes to the LLM
+    assert router.stats.decided == {"sec-filings": 1, "general": 1}
+    assert router.stats.fallbacks == 2
+    assert router.stats.fast_path_rate == pytest.approx(1 / 2)
+
+    router.min_similarity = 0.5
+    assert await router.classify("ACME revenue in the 10-K") is None
+
+
+def test_examples_file_labels_are_validated(tmp_path) -> None:
+    path = tmp_path / "examples.json"
+    path.write_text(json.dumps({"general": ["hi"], "sec_filings": ["10-K revenue"]}))
+    with pytest.raises(ValueError, match="sec_filings"):
+        load_examples(str(path))
+    path.write_text(json.dumps({"general": ["hi"], "sec-filings": ["10-K revenue"]}))
+    assert set(load_examples(str(path))) == {"general", "sec-filings"}
+
+
+@pytest.mark.asyncio
+async def test_graph_fast_paths_opening_questions_only(tmp_path) -> None:
+    # The scripted query model would route everything to "sec-filings".
+    config = offline_config(
+        str(tmp_path),
+        fast_router=True,
+        fast_router_threshold=0.05,
+        fast_router_min_similarity=0.3,
+        thread_id="fast-router",
+    )
+    result = await graph.ainvoke({"messages": [HumanMessage(content="thank you!")]}, config)
+    assert result["router"]["type"] == "general"
+
+    follow_up = await graph.ainvoke({"messages": [HumanMessage(content="thank you!")]}, config)
+    assert follow_up["router"]["type"] == "sec-filings"
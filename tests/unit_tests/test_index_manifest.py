@@ -0,0 +1,66 @@
+import json
+
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from index_graph.manifest import IndexManifest, plan_index_update
+from shared import retrieval
+from shared.retrieval import FAISS_INDEX_NAME
+from shared.state import reduce_docs
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    calls: int = 0
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        self.calls += len(texts)
+        return super().embed_documents(texts)
+
+
+def test_plan_skips_unchanged_and_detects_changes() -> None:
+    docs = reduce_docs([], ["a", "b", "c"])
+    first = plan_index_update(IndexManifest(), docs, embedding_model="m", chunking_version="1")
+    assert len(first.add) == 3 and not first.delete
+
+    changed = reduce_docs([], ["a", "c", "d"])
+    changed[0].metadata["company"] = "ACME"
+    second = plan_index_update(first.manifest, changed, embedding_model="m", chunking_version="1")
+    assert second.unchanged == 1
+    assert sorted(d.page_content for d in second.add) == ["a", "d"]
+    assert len(second.delete) == 2  # the old "a" and the vanished "b"
+
+    rechunked = plan_index_update(
+        second.manifest, changed, embedding_model="m", chunking_version="2"
+    )
+    assert len(rechunked.add) == 3 and len(rechunked.delete) == 3
+
+
+@pytest.mark.asyncio
+async def test_reindexing_unchanged_corpus_embeds_nothing(tmp_path, monkeypatch) -> None:
+    from index_graph.graph import index_docs
+    from index_graph.state import IndexState
+
+    embeddings = CountingEmbeddings(size=8)
+    monkeypatch.setattr(retrieval, "make_configured_encoder", lambda *a, **kw: embeddings)
+    index_path = tmp_path / "index"
+    FAISS.from_texts(["seed"], embeddings).save_local(str(index_path), FAISS_INDEX_NAME)
+    docs_file = tmp_path / "docs.json"
+    docs_file.write_text(json.dumps([{"page_content": f"filing {i}"} for i in range(5)]))
+    config = {
+        "configurable": {"faiss_index_path": str(index_path), "docs_file": str(docs_file)}
+    }
+
+    embeddings.calls = 0
+    await index_docs(IndexState(docs=[]), config=config)
+    assert embeddings.calls == 5
+    await index_docs(IndexState(docs=[]), config=config)
+    assert embeddings.calls == 5
+
+    docs_file.write_text(json.dumps([{"page_content": f"filing {i}"} for i in range(1, 6)]))
+    await index_docs(IndexState(docs=[]), config=config)
+    assert embeddings.calls == 6
+    store = retrieval.load_faiss_store(
+        retrieval.BaseConfiguration(faiss_index_path=str(index_path)), embeddings
+    )
+    assert store.index.ntotal == 6  # seed + filings 1..5
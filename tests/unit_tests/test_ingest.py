@@ -0,0 +1,61 @@
+import json
+
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from index_graph.ingest import (
+    batch_by_tokens,
+    iter_documents,
+    iter_json_array,
+    stream_ingest,
+)
+from index_graph.manifest import IndexManifest, ManifestUpdate
+from shared.configuration import BaseConfiguration
+from shared.retrieval import FAISS_INDEX_NAME, load_faiss_store
+from shared.state import reduce_docs
+
+
+def test_json_array_is_split_across_chunks() -> None:
+    items = ['plain "quoted" [text]', {"page_content": "a {b} \\\\", "metadata": {"x": [1, 2]}}]
+    data = json.dumps(items).encode()
+    chunks = [data[i : i + 3] for i in range(0, len(data), 3)]
+    assert [json.loads(e) for e in iter_json_array(chunks)] == items
+
+
+def test_iter_documents_matches_reduce_docs(tmp_path) -> None:
+    items = ["a", {"page_content": "b", "metadata": {"company": "ACME"}}]
+    array_file = tmp_path / "docs.json"
+    array_file.write_text(json.dumps(items))
+    lines_file = tmp_path / "docs.jsonl"
+    lines_file.write_text("\n".join(json.dumps(item) for item in items))
+
+    expected = [(d.page_content, d.metadata) for d in reduce_docs([], items)]
+    for path in (array_file, lines_file):
+        docs = iter_documents(str(path), chunk_size=4)
+        assert [(d.page_content, d.metadata) for d in docs] == expected
+
+    batches = list(batch_by_tokens(reduce_docs([], ["x" * 40] * 5), max_tokens=25, max_docs=10))
+    assert [len(batch) for batch, _ in batches] == [2, 2, 1]
+
+
+@pytest.mark.asyncio
+async def test_stream_ingest_writes_every_batch(tmp_path) -> None:
+    embeddings = DeterministicFakeEmbedding(size=8)
+    FAISS.from_texts(["seed"], embeddings).save_local(str(tmp_path), FAISS_INDEX_NAME)
+    configuration = BaseConfiguration(faiss_index_path=str(tmp_path))
+    store = load_faiss_store(configuration, embeddings, writable=True)
+    docs = reduce_docs([], [f"filing {i}" for i in range(50)] * 2)
+    update = ManifestUpdate(IndexManifest(), embedding_model="m", chunking_version="1")
+
+    retriever = store.as_retriever()
+    stats = await stream_ingest(
+        iter(docs), retriever, update=update, max_tokens=10, max_docs=8, max_concurrency=3
+    )
+    assert stats.documents == 50 and stats.batches >= 7
+    assert stats.docs_per_second > 0
+    assert load_faiss_store(configuration, embeddings).index.ntotal == 51
+
+    again = ManifestUpdate(update.manifest, embedding_model="m", chunking_version="1")
+    stats = await stream_ingest(iter(docs), retriever, update=again)
+    assert stats.documents == 0 and stats.skipped == 50
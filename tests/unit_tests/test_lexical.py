@@ -0,0 +1,134 @@
+import warnings
+
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from shared.configuration import BaseConfiguration
+from shared.faiss_store import FaissStore
+from shared.hybrid import LEXICAL_DIR, HybridRetriever, open_lexical_index
+from shared.lexical import (
+    LexicalIndex,
+    manifest_source_version,
+    reciprocal_rank_fusion,
+    tokenize,
+)
+from shared.retrieval import FAISS_INDEX_NAME, load_faiss_store, make_hybrid_retriever
+
+DOCS = [
+    ("a", "Apple (AAPL) reported FY2023 net sales of $383 billion in its 10-K."),
+    ("b", "Microsoft revenue grew in fiscal year 2023."),
+    ("c", "Net sales by category: iPhone, Mac, iPad, Services."),
+]
+
+
+def test_tokenize_keeps_filing_tokens() -> None:
+    assert tokenize("AAPL's FY2023 10-K, Item 7.") == ["aapl's", "fy2023", "10-k", "item", "7"]
+
+
+def test_search_ranks_exact_token_matches(tmp_path) -> None:
+    index = LexicalIndex.open(str(tmp_path))
+    index.add_documents(DOCS[:2])
+    index.add_documents(DOCS[2:])
+    assert [doc_id for doc_id, _ in index.search("AAPL net sales", k=2)] == ["a", "c"]
+    assert index.search("unknown tokens") == []
+
+    index.delete(["a"])
+    reopened = LexicalIndex.open(str(tmp_path))
+    assert [doc_id for doc_id, _ in reopened.search("net sales")] == ["c"]
+
+    reopened.add_documents([("c", "Cash flow statement")])
+    reopened.compact()
+    compacted = LexicalIndex.open(str(tmp_path))
+    assert len(compacted.segments) == 1
+    assert len(compacted) == 2
+    assert compacted.search("net sales") == []
+    assert [doc_id for doc_id, _ in compacted.search("cash")] == ["c"]
+    assert [doc_id for doc_id, _ in compacted.search("microsoft")] == ["b"]
+
+
+def test_reciprocal_rank_fusion_rewards_agreement() -> None:
+    fused = reciprocal_rank_fusion([["x", "y", "z"], ["y", "w"]], k=60)
+    assert fused[0][0] == "y"
+    assert {doc_id for doc_id, _ in fused} == {"x", "y", "z", "w"}
+
+
+@pytest.mark.asyncio
+async def test_hybrid_retriever_surfaces_lexical_hits(tmp_path) -> None:
+    embeddings = DeterministicFakeEmbedding(size=8)
+    store = FaissStore.from_documents(
+        [Document(page_content=text) for _, text in DOCS], embeddings, ids=[i for i, _ in DOCS]
+    )
+    lexical = open_lexical_index(store, str(tmp_path), shared=False)
+    assert len(lexical) == 3
+    retriever = HybridRetriever(vectorstore=store, lexical=lexical, k=1, fetch_k=1)
+    docs = await retriever.ainvoke("AAPL")
+    assert docs[0].page_content == DOCS[0][1]
+
+    await retriever.aadd_documents([Document(page_content="Tesla TSLA deliveries")])
+    retriever.k = 2
+    docs = await retriever.ainvoke("TSLA deliveries")
+    assert "Tesla TSLA deliveries" in [d.page_content for d in docs]
+
+
+def test_hybrid_retriever_schema_builds_without_warnings() -> None:
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+
+        class Subclass(HybridRetriever):
+            pass
+
+
+@pytest.mark.parametrize(
+    "filter",
+    [{"company": "MSFT"}, lambda metadata: metadata["company"] == "MSFT"],
+)
+def test_hybrid_filter_restricts_both_rankings(tmp_path, filter) -> None:
+    embeddings = DeterministicFakeEmbedding(size=8)
+    companies = {"a": "AAPL", "b": "MSFT", "c": "AAPL"}
+    store = FaissStore.from_documents(
+        [Document(page_content=text, metadata={"company": companies[i]}) for i, text in DOCS],
+        embeddings,
+        ids=[i for i, _ in DOCS],
+    )
+    lexical = open_lexical_index(store, str(tmp_path), shared=False)
+    retriever = HybridRetriever(
+        vectorstore=store, lexical=lexical, k=3, fetch_k=1, filter=filter
+    )
+    docs = retriever.invoke("AAPL net sales")
+    assert [d.metadata["company"] for d in docs] == ["MSFT"]
+
+
+def test_hybrid_retriever_rejects_unsupported_search_options(tmp_path) -> None:
+    embeddings = DeterministicFakeEmbedding(size=8)
+    for options in (
+        {"search_type": "mmr"},
+        {"search_kwargs": {"k": 2, "score_threshold": 0.2}},
+    ):
+        configuration = BaseConfiguration(faiss_index_path=str(tmp_path), **options)
+        with pytest.raises(ValueError):
+            with make_hybrid_retriever(configuration, embeddings):
+                pass
+
+
+def test_lexical_index_follows_writes_made_without_it(tmp_path) -> None:
+    embeddings = DeterministicFakeEmbedding(size=8)
+    texts, ids = [text for _, text in DOCS], [i for i, _ in DOCS]
+    FAISS.from_texts(texts, embeddings, ids=ids).save_local(str(tmp_path), FAISS_INDEX_NAME)
+    configuration = BaseConfiguration(faiss_index_path=str(tmp_path))
+    with make_hybrid_retriever(configuration, embeddings, writable=True) as retriever:
+        retriever.add_documents([Document(id="d", page_content="Nvidia NVDA guidance")])
+    # Writes through the hybrid retriever keep the lexical index current.
+    stamp = manifest_source_version(str(tmp_path / LEXICAL_DIR))
+    reader = load_faiss_store(configuration, embeddings)
+    assert [i for i, _ in open_lexical_index(reader, str(tmp_path)).search("NVDA")] == ["d"]
+    assert manifest_source_version(str(tmp_path / LEXICAL_DIR)) == stamp
+
+    # A plain FAISS writer leaves it behind; the next open rebuilds it.
+    writer = load_faiss_store(configuration, embeddings, writable=True)
+    writer.add_documents([Document(id="e", page_content="Tesla TSLA deliveries")])
+    writer.delete(["d"])
+    reader = load_faiss_store(configuration, embeddings)
+    lexical = open_lexical_index(reader, str(tmp_path))
+    assert [i for i, _ in lexical.search("TSLA NVDA")] == ["e"]
@@ -0,0 +1,77 @@
+import os
+
+import faiss
+import numpy as np
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from shared.configuration import BaseConfiguration
+from shared.faiss_store import search_rows
+from shared.metadata_index import MetadataIndex
+from shared.retrieval import FAISS_INDEX_NAME, load_faiss_store, with_metadata_filter
+
+
+def test_candidate_rows_intersect_fields() -> None:
+    metadatas = [
+        {"company": ["ACME", "GLOBEX"][i % 2], "fiscal_year": 2020 + i % 3}
+        for i in range(12)
+    ]
+    index = MetadataIndex.build(metadatas, ["company", "fiscal_year", "form_type"])
+    expected = [
+        i for i, m in enumerate(metadatas) if m["company"] == "ACME" and m["fiscal_year"] == 2022
+    ]
+    assert index.candidate_rows({"company": "ACME", "fiscal_year": "2022"}).tolist() == expected
+    assert len(index.candidate_rows({"company": ["ACME", "GLOBEX"]})) == 12
+    assert len(index.candidate_rows({"company": "INITECH"})) == 0
+    assert len(index.candidate_rows({"form_type": "10-K"})) == 0
+
+
+def test_prefiltered_search_returns_rare_matches(tmp_path) -> None:
+    embeddings = DeterministicFakeEmbedding(size=16)
+    texts = [f"filing {i}" for i in range(200)]
+    metadatas = [
+        {"company": "ACME" if i % 50 == 0 else "GLOBEX", "form_type": "10-K"}
+        for i in range(200)
+    ]
+    FAISS.from_texts(texts, embeddings, metadatas=metadatas).save_local(
+        str(tmp_path), FAISS_INDEX_NAME
+    )
+    vstore = load_faiss_store(BaseConfiguration(faiss_index_path=str(tmp_path)), embeddings)
+
+    hits = vstore.similarity_search("filing 7", k=3, filter={"company": "ACME"}, fetch_k=5)
+    assert len(hits) == 3
+    assert {d.metadata["company"] for d in hits} == {"ACME"}
+    assert os.path.exists(tmp_path / f"{FAISS_INDEX_NAME}.meta.npz")
+
+    # Same ranking as post-filtering over the whole corpus.
+    post = vstore.similarity_search(
+        "filing 7", k=3, filter=lambda m: m["company"] == "ACME", fetch_k=200
+    )
+    assert [d.page_content for d in hits] == [d.page_content for d in post]
+
+    mmr = vstore.max_marginal_relevance_search("filing 7", k=2, filter={"company": "ACME"})
+    assert len(mmr) == 2 and {d.metadata["company"] for d in mmr} == {"ACME"}
+
+
+def test_search_rows_with_id_selector() -> None:
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((2000, 8)).astype(np.float32)
+    quantizer = faiss.IndexFlatL2(8)
+    index = faiss.IndexIVFPQ(quantizer, 8, 16, 4, 8)
+    index.train(vectors)
+    index.add(vectors)
+    rows = np.arange(0, 2000, 100)
+    _, ids = search_rows(index, vectors[:2], 5, rows)
+    assert set(ids[ids >= 0].tolist()) <= set(rows.tolist())
+    assert (ids >= 0).sum(axis=1).tolist() == [5, 5]
+
+
+def test_with_metadata_filter_keeps_configured_fields() -> None:
+    config = {"configurable": {"search_kwargs": {"k": 2, "filter": {"company": "ACME"}}}}
+    merged = with_metadata_filter(config, {"company": "GLOBEX", "fiscal_year": "2023", "form_type": ""})
+    assert merged["configurable"]["search_kwargs"] == {
+        "k": 2,
+        "filter": {"company": "ACME", "fiscal_year": "2023"},
+    }
+    assert config["configurable"]["search_kwargs"]["filter"] == {"company": "ACME"}
+    assert with_metadata_filter(config, {}) is config
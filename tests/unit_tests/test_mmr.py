@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_community.vectorstores.utils import maximal_marginal_relevance
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from shared.faiss_store import FaissStore
+from shared.mmr import mmr_select, mmr_select_batch
+
+
+def test_mmr_select_matches_langchain_reference() -> None:
+    rng = np.random.default_rng(0)
+    for lambda_mult in (0.0, 0.3, 0.5, 1.0):
+        query = rng.standard_normal(32).astype(np.float32)
+        candidates = rng.standard_normal((50, 32)).astype(np.float32)
+        expected = maximal_marginal_relevance(
+            query[None, :], list(candidates), lambda_mult=lambda_mult, k=8
+        )
+        assert list(mmr_select(query, candidates, 8, lambda_mult)) == expected
+
+
+def test_mmr_select_batch_skips_invalid_candidates() -> None:
+    rng = np.random.default_rng(1)
+    queries = rng.standard_normal((2, 8)).astype(np.float32)
+    candidates = rng.standard_normal((2, 5, 8)).astype(np.float32)
+    valid = np.array([[True] * 5, [True, False, True, False, False]])
+    selected = mmr_select_batch(queries, candidates, 4, valid=valid)
+    assert sorted(selected[0]) == sorted(set(selected[0]))
+    assert sorted(selected[1][:2]) == [0, 2]
+    assert list(selected[1][2:]) == [-1, -1]
+
+
+def test_faiss_store_mmr_matches_langchain_store() -> None:
+    embeddings = DeterministicFakeEmbedding(size=16)
+    texts = [f"chunk {i % 7} of filing" for i in range(30)]
+    reference = FAISS.from_texts(texts, embeddings)
+    store = FaissStore(
+        embeddings, reference.index, reference.docstore, reference.index_to_docstore_id
+    )
+    expected = reference.max_marginal_relevance_search("chunk 3", k=4, fetch_k=20)
+    found = store.max_marginal_relevance_search("chunk 3", k=4, fetch_k=20)
+    assert [d.page_content for d in found] == [d.page_content for d in expected]
+
+
+def test_batch_mmr_normalizes_queries_on_normalized_stores() -> None:
+    embeddings = DeterministicFakeEmbedding(size=16)
+    texts = [f"chunk {i % 7} of filing" for i in range(30)]
+    reference = FAISS.from_texts(texts, embeddings, normalize_L2=True)
+    store = FaissStore(
+        embeddings,
+        reference.index,
+        reference.docstore,
+        reference.index_to_docstore_id,
+        normalize_L2=True,
+    )
+    query = np.asarray(embeddings.embed_query("chunk 3"), dtype=np.float32)
+    query /= np.linalg.norm(query)
+    expected = reference.max_marginal_relevance_search_with_score_by_vector(
+        list(query), k=4, fetch_k=20
+    )
+    [found] = store.mmr_search_batch_by_vectors([list(3.0 * query)], k=4, fetch_k=20)
+    assert [d.page_content for d, _ in found] == [d.page_content for d, _ in expected]
+    assert [s for _, s in found] == pytest.approx([s for _, s in expected], rel=1e-5)
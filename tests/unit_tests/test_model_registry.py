@@ -0,0 +1,30 @@
+from retrieval_graph.graph import warm_up
+from retrieval_graph.state import Plan, Router
+from shared.model_registry import ModelRegistry, chat_models
+from shared.utils import load_chat_model, load_structured_model
+
+
+def test_registry_shares_models_and_structured_runnables() -> None:
+    registry = ModelRegistry()
+    model = registry.model("offline/scripted")
+    assert registry.model("offline/scripted") is model
+    assert registry.model("offline/scripted", temperature=0) is not model
+    router = registry.structured("offline/scripted", Router)
+    assert registry.structured("offline/scripted", Router) is router
+    assert registry.structured("offline/scripted", Plan) is not router
+    assert (registry.stats.models_created, registry.stats.runnables_created) == (2, 2)
+    assert router.invoke("hello")["type"] == "sec-filings"
+
+
+def test_warm_up_leaves_nothing_to_build_per_request() -> None:
+    config = {
+        "configurable": {
+            "query_model": "offline/scripted?items=1",
+            "response_model": "offline/scripted",
+        }
+    }
+    warm_up(config)
+    created = (chat_models.stats.models_created, chat_models.stats.runnables_created)
+    load_chat_model("offline/scripted?items=1")
+    load_structured_model("offline/scripted?items=1", Plan)
+    assert (chat_models.stats.models_created, chat_models.stats.runnables_created) == created
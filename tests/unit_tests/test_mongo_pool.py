@@ -0,0 +1,63 @@
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from shared import retrieval
+from shared.mongo_pool import MongoClientPool
+
+
+class _FakeClient:
+    def __init__(self, uri: str, **options: object) -> None:
+        self.uri, self.options, self.closed = uri, options, False
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def test_mongo_pool_reuses_one_client_per_uri_and_options() -> None:
+    pool = MongoClientPool(client_factory=_FakeClient)
+    first = pool.get("mongodb://a", max_pool_size=10)
+    assert pool.get("mongodb://a", max_pool_size=10) is first
+    assert pool.get("mongodb://a", max_pool_size=20) is not first
+    assert first.options["maxPoolSize"] == 10 and pool.created == 2
+    pool.close()
+    assert first.closed
+
+
+def test_unknown_provider_lists_the_supported_ones(monkeypatch) -> None:
+    monkeypatch.setattr(
+        retrieval, "make_configured_encoder", lambda *a, **kw: DeterministicFakeEmbedding(size=8)
+    )
+    config = {"configurable": {"retriever_provider": "pinecone"}}
+    with pytest.raises(ValueError, match="mongodb, faiss, hybrid"):
+        with retrieval.make_retriever(config):
+            pass
+
+
+def test_mongodb_retriever_shares_a_client(monkeypatch) -> None:
+    # mongomock stands in for a local server; it cannot run $vectorSearch, so only
+    # the wiring and writes are exercised here.
+    mongomock = pytest.importorskip("mongomock")
+    pytest.importorskip("langchain_mongodb")
+    from shared import mongo_pool
+
+    pool = MongoClientPool(client_factory=lambda uri, **options: mongomock.MongoClient(uri))
+    monkeypatch.setattr(mongo_pool, "mongo_clients", pool)
+    monkeypatch.setattr(
+        retrieval, "make_configured_encoder", lambda *a, **kw: DeterministicFakeEmbedding(size=8)
+    )
+    config = {
+        "configurable": {
+            "retriever_provider": "mongodb",
+            "mongodb_uri": "mongodb://localhost:27017",
+            "mongodb_namespace": "test_db.filings",
+        }
+    }
+    with retrieval.make_retriever(config, writable=True) as retriever:
+        retriever.vectorstore.add_texts(["a", "b"], metadatas=[{"company": "ACME"}] * 2)
+        first = retriever.vectorstore.collection
+    with retrieval.make_retriever(config) as retriever:
+        assert retriever.vectorstore.collection.database.client is first.database.client
+        # FAISS index parameters are not search arguments of other providers.
+        assert not set(retriever.search_kwargs) & set(retrieval.FAISS_INDEX_PARAMS)
+    assert pool.created == 1
+    assert first.count_documents({}) == 2
@@ -0,0 +1,104 @@
+import os
+import time
+
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.messages import HumanMessage
+
+from retrieval_graph.graph import graph
+from retrieval_graph.state import Router
+from shared.offline import HashingEmbeddings
+from shared.retrieval import FAISS_INDEX_NAME, make_text_encoder
+from shared.utils import load_chat_model
+
+
+def test_hashing_embeddings_are_stable_and_lexical() -> None:
+    embeddings = make_text_encoder("offline/hashing?size=64")
+    again = HashingEmbeddings(size=64)
+    revenue = embeddings.embed_query("ACME revenue in 2023")
+    assert revenue == again.embed_query("ACME revenue in 2023")
+    assert len(revenue) == 64
+    similar = sum(a * b for a, b in zip(revenue, again.embed_query("ACME revenue")))
+    unrelated = sum(a * b for a, b in zip(revenue, again.embed_query("weather today")))
+    assert similar > unrelated
+
+
+@pytest.mark.asyncio
+async def test_scripted_model_returns_valid_structured_output() -> None:
+    model = load_chat_model("offline/scripted?items=3&type=general")
+    router = await model.with_structured_output(Router).ainvoke("hello")
+    assert router["type"] == "general" and isinstance(router["logic"], str)
+    reply = await model.ainvoke([HumanMessage(content="hi")])
+    assert "hi" in reply.content
+
+
+def offline_config(index_path: str, **configurable: object) -> dict:
+    embedding_model = "offline/hashing?size=32"
+    if not os.path.exists(os.path.join(index_path, f"{FAISS_INDEX_NAME}.faiss")):
+        FAISS.from_texts(
+            ["ACME revenue grew", "Globex filed a 10-K"], make_text_encoder(embedding_model)
+        ).save_local(index_path, FAISS_INDEX_NAME)
+    return {
+        "configurable": {
+            "thread_id": "offline",
+            "query_model": "offline/scripted",
+            "response_model": "offline/scripted",
+            "embedding_model": embedding_model,
+            "faiss_index_path": index_path,
+            **configurable,
+        }
+    }
+
+
+@pytest.mark.asyncio
+async def test_retrieval_graph_runs_offline(tmp_path) -> None:
+    config = offline_config(str(tmp_path))
+    result = await graph.ainvoke({"messages": [HumanMessage(content="ACME revenue?")]}, config)
+    assert result["messages"][-1].content == "Scripted answer to: ACME revenue?"
+    assert result["documents"]
+
+
+@pytest.mark.asyncio
+async def test_parallel_research_takes_about_one_step(tmp_path) -> None:
+    model = "offline/scripted?latency=0.2&items=3"
+    elapsed, documents = {}, {}
+    for mode in ("sequential", "parallel"):
+        config = offline_config(
+            str(tmp_path), query_model=model, research_mode=mode, thread_id=mode
+        )
+        start = time.perf_counter()
+        result = await graph.ainvoke({"messages": [HumanMessage(content="ACME?")]}, config)
+        elapsed[mode] = time.perf_counter() - start
+        documents[mode] = {doc.page_content for doc in result["documents"]}
+    assert documents["parallel"] == documents["sequential"]
+    # Three plan steps: the sequential run waits for three query generations, two
+    # more than the parallel run; half of that margin absorbs scheduling noise.
+    assert elapsed["parallel"] < elapsed["sequential"] - 0.2
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("research_mode", ["sequential", "parallel"])
+async def test_route_and_plan_skips_separate_planning_call(tmp_path, research_mode) -> None:
+    config = offline_config(
+        str(tmp_path),
+        query_model="offline/scripted?items=2",
+        route_and_plan=True,
+        research_mode=research_mode,
+        thread_id=f"route-and-plan-{research_mode}",
+    )
+    nodes = []
+    async for update in graph.astream(
+        {"messages": [HumanMessage(content="ACME revenue?")]}, config, stream_mode="updates"
+    ):
+        nodes.extend(update)
+    assert "create_research_plan" not in nodes
+    assert nodes[-1] == "respond"
+    research = "research_lane" if research_mode == "parallel" else "conduct_research"
+    assert nodes.count(research) == 2
+
+
+def test_hashing_one_word_text_is_hashed_once() -> None:
+    embeddings = HashingEmbeddings(size=1024)
+    vector = embeddings.embed_query("Revenue")
+    assert sum(1 for x in vector if x) == 1
+    assert vector == embeddings.embed_query("revenue")
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from shared.faiss_store import FaissStore
+from shared.search_pool import SearchPool
+
+
+@pytest.mark.asyncio
+async def test_search_pool_caps_in_flight_and_records_waits() -> None:
+    pool = SearchPool(max_workers=2, max_in_flight=2, name="test-search")
+    active, peak, names = [0], [0], set()
+    lock = threading.Lock()
+
+    def search(i: int) -> int:
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+            names.add(threading.current_thread().name.split("_")[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return i
+
+    assert await asyncio.gather(*(pool.run(search, i) for i in range(6))) == list(range(6))
+    stats = pool.stats()
+    assert peak[0] == 2 and names == {"test-search"}
+    assert (stats.submitted, stats.completed, stats.in_flight, stats.waiting) == (6, 6, 0, 0)
+    assert stats.max_queue_depth >= 4 and stats.max_wait_seconds >= 0.02
+
+
+@pytest.mark.asyncio
+async def test_cancelled_waiter_gives_its_slot_back() -> None:
+    pool = SearchPool(max_workers=1, max_in_flight=1)
+    release = threading.Event()
+    first = asyncio.create_task(pool.run(release.wait))
+    await asyncio.sleep(0.01)
+    waiter = asyncio.create_task(pool.run(lambda: "late"))
+    await asyncio.sleep(0.01)
+    waiter.cancel()
+    release.set()
+    await first
+    assert await pool.run(lambda: "next") == "next"
+    assert pool.stats().in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_faiss_store_searches_on_its_pool() -> None:
+    store = FaissStore.from_texts(["a", "b", "c"], DeterministicFakeEmbedding(size=8))
+    store.search_pool = SearchPool(max_workers=1, max_in_flight=4)
+    docs = await store.as_retriever(search_kwargs={"k": 2}).ainvoke("a")
+    mmr = await store.amax_marginal_relevance_search("a", k=2, fetch_k=3)
+    assert len(docs) == len(mmr) == 2
+    assert store.search_pool.stats().completed == 2
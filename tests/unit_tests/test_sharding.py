@@ -0,0 +1,68 @@
+import os
+import time
+
+import faiss
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import DeterministicFakeEmbedding
+
+from shared.configuration import BaseConfiguration
+from shared.retrieval import FAISS_INDEX_NAME, load_faiss_store, make_faiss_retriever
+from shared.sharding import (
+    open_sharded_store,
+    read_manifest,
+    split_faiss_index,
+    write_manifest,
+)
+
+
+def _build(tmp_path, embeddings):
+    texts = [f"filing {i}" for i in range(60)]
+    metadatas = [{"company": ["ACME", "GLOBEX", "INITECH"][i % 3]} for i in range(60)]
+    source = tmp_path / "single"
+    store = FAISS.from_texts(
+        texts, embeddings, metadatas=metadatas, distance_strategy="MAX_INNER_PRODUCT"
+    )
+    assert store.index.metric_type == faiss.METRIC_INNER_PRODUCT
+    store.save_local(str(source), FAISS_INDEX_NAME)
+    split_faiss_index(str(source), str(tmp_path / "sharded"), "company")
+    return source, tmp_path / "sharded"
+
+
+def test_sharded_search_matches_single_index(tmp_path) -> None:
+    embeddings = DeterministicFakeEmbedding(size=16)
+    source, sharded = _build(tmp_path, embeddings)
+    assert [s.name for s in read_manifest(str(sharded)).shards] == ["ACME", "GLOBEX", "INITECH"]
+
+    single = load_faiss_store(BaseConfiguration(faiss_index_path=str(source)), embeddings)
+    configuration = BaseConfiguration(faiss_index_path=str(sharded))
+    with make_faiss_retriever(configuration, embeddings) as retriever:
+        vstore = retriever.vectorstore
+        expected = [d.page_content for d in single.similarity_search("filing 7", k=5)]
+        assert [d.page_content for d in vstore.similarity_search("filing 7", k=5)] == expected
+
+        hits = vstore.similarity_search("filing 7", k=4, filter={"company": "GLOBEX"})
+        assert len(hits) == 4 and {d.metadata["company"] for d in hits} == {"GLOBEX"}
+        assert len(vstore.max_marginal_relevance_search("filing 7", k=3)) == 3
+
+
+def test_loopback_shards_and_independent_rebuild(tmp_path) -> None:
+    embeddings = DeterministicFakeEmbedding(size=16)
+    _, sharded = _build(tmp_path, embeddings)
+    manifest = read_manifest(str(sharded))
+    for spec in manifest.shards:
+        spec.transport = "loopback"
+    write_manifest(str(sharded), manifest)
+
+    configuration = BaseConfiguration(faiss_index_path=str(sharded))
+    vstore = open_sharded_store(configuration, embeddings)
+    assert vstore.similarity_search("filing 7", k=1)[0].page_content == "filing 7"
+
+    # Rebuild one shard; only its store is reloaded and the new document is found.
+    time.sleep(0.01)
+    FAISS.from_texts(
+        ["filing 7", "new filing"],
+        embeddings,
+        metadatas=[{"company": "GLOBEX"}] * 2,
+        distance_strategy="MAX_INNER_PRODUCT",
+    ).save_local(os.path.join(sharded, "GLOBEX"), FAISS_INDEX_NAME)
+    assert vstore.similarity_search("new filing", k=1)[0].page_content == "new filing"
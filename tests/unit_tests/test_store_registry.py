@@ -0,0 +1,35 @@
+import os
+
+from shared.store_registry import StoreRegistry
+
+
+def test_registry_reuses_store_until_files_change(tmp_path) -> None:
+    path = tmp_path / "index.faiss"
+    path.write_bytes(b"v1")
+    registry = StoreRegistry()
+    loads = []
+
+    def loader() -> object:
+        loads.append(path.read_bytes())
+        return object()
+
+    first = registry.get("key", [str(path)], loader)
+    assert registry.get("key", [str(path)], loader) is first
+    assert loads == [b"v1"]
+
+    path.write_bytes(b"v2-longer")
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    second = registry.get("key", [str(path)], loader)
+    assert second is not first
+    assert loads == [b"v1", b"v2-longer"]
+    assert (registry.stats.hits, registry.stats.loads, registry.stats.reloads) == (1, 1, 1)
+
+
+def test_registry_invalidate_forces_load(tmp_path) -> None:
+    path = tmp_path / "index.pkl"
+    path.write_bytes(b"x")
+    registry = StoreRegistry()
+    first = registry.get("key", [str(path)], object)
+    registry.invalidate("key")
+    assert registry.get("key", [str(path)], object) is not first
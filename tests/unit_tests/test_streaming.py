@@ -0,0 +1,38 @@
+import pytest
+from langchain_core.messages import HumanMessage
+
+from retrieval_graph.graph import graph
+from retrieval_graph.streaming import astream_answer
+
+from .test_offline import offline_config
+
+
+@pytest.mark.asyncio
+async def test_answer_streams_token_by_token_after_node_progress(tmp_path) -> None:
+    config = offline_config(str(tmp_path), thread_id="streaming")
+    updates = [
+        update
+        async for update in astream_answer(
+            graph, {"messages": [HumanMessage(content="ACME revenue?")]}, config
+        )
+    ]
+    nodes = [u.node for u in updates if u.kind == "node"]
+    assert nodes[0] == "check_answer_cache" and "respond" in nodes
+    tokens = [u for u in updates if u.kind == "token"]
+    assert len(tokens) > 1 and {u.node for u in tokens} == {"respond"}
+
+    end = updates[-1]
+    assert end.kind == "end" and end.text == "Scripted answer to: ACME revenue?"
+    assert end.timing.tokens == len(tokens)
+    assert 0 < end.timing.first_token == tokens[0].elapsed <= end.timing.total
+
+
+@pytest.mark.asyncio
+async def test_cached_answer_is_returned_without_tokens(tmp_path) -> None:
+    question = {"messages": [HumanMessage(content="Globex 10-K?")]}
+    await graph.ainvoke(question, offline_config(str(tmp_path), answer_cache=True, thread_id="a"))
+    config = offline_config(str(tmp_path), answer_cache=True, thread_id="b")
+    updates = [update async for update in astream_answer(graph, question, config)]
+    assert not [u for u in updates if u.kind == "token"]
+    assert updates[-1].text == "Scripted answer to: Globex 10-K?"
+    assert updates[-1].timing.first_token is None